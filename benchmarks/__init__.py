@@ -0,0 +1,7 @@
+"""Synthetic data generator and benchmark harness.
+
+    python -m benchmarks.generate --stores 20 --accounts 60 --snapshots 365
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --users 16
+"""
@@ -0,0 +1,213 @@
+"""Generate a synthetic database at production scale.
+
+The schema and reference data (account types, banks and the seed stores and
+accounts) come from the app itself; additional stores, accounts, completed
+snapshots, drafts and their balances are written with plain sqlite3
+``executemany`` calls in one transaction, which keeps millions of balance
+rows to well under a minute. The app then builds the stored summaries of
+the completed snapshots, as saving them would. The same ``--seed`` always
+produces the same database.
+
+Usage:
+    python -m benchmarks.generate --stores 20 --accounts 60 --snapshots 365
+    python -m benchmarks.generate --database /tmp/big.db --stores 50 --accounts 80 --snapshots 730
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(__file__), "bench.db")
+
+# Snapshots are dated back from this fixed day so runs are reproducible
+END_DATE = date(2025, 12, 31)
+
+TIMESTAMP = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def create_schema(path):
+    """Create tables, indexes and reference data through the app"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from src.main import app
+    from src.database import db
+    from src.migrations import run_migrations
+    from src.routes.data_import import seed_database
+
+    with app.app_context():
+        db.create_all()
+        run_migrations(db.engine)
+        seed_database()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def generate(path, stores, accounts, snapshots, drafts, interval_days, seed):
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1).strftime(TIMESTAMP)
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("PRAGMA journal_mode = MEMORY")
+    cursor = connection.cursor()
+
+    account_types = cursor.execute("SELECT id, category FROM account_types").fetchall()
+    bank_ids = [row[0] for row in cursor.execute("SELECT id FROM banks")]
+
+    # Stores: the seed stores first, then generated ones up to --stores
+    store_ids = [row[0] for row in cursor.execute("SELECT id FROM stores ORDER BY id")]
+    for index in range(len(store_ids), stores):
+        cursor.execute(
+            "INSERT INTO stores (name, code, is_active, created_at, updated_at) VALUES (?, ?, 1, ?, ?)",
+            (f"Store {index + 1:04d}", f"S{index + 1:04d}", now, now)
+        )
+        store_ids.append(cursor.lastrowid)
+    store_ids = store_ids[:stores]
+
+    # Accounts: top every store up to --accounts
+    account_rows = []
+    for store_id in store_ids:
+        existing = cursor.execute(
+            "SELECT COUNT(*) FROM accounts WHERE store_id = ?", (store_id,)
+        ).fetchone()[0]
+        for index in range(existing, accounts):
+            account_type_id, _ = rng.choice(account_types)
+            account_rows.append((
+                store_id, account_type_id, rng.choice(bank_ids + [None]),
+                f"Generated Account {index + 1:04d}", f"{rng.randrange(10000):04d}", now, now
+            ))
+    cursor.executemany(
+        "INSERT INTO accounts (store_id, account_type_id, bank_id, account_name, account_number, "
+        "available_credit, total_credit, is_active, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, 0, 0, 1, ?, ?)",
+        account_rows
+    )
+
+    categories = dict(account_types)
+    accounts_by_store = {store_id: [] for store_id in store_ids}
+    for account_id, store_id, account_type_id in cursor.execute(
+        "SELECT id, store_id, account_type_id FROM accounts WHERE is_active = 1"
+    ):
+        if store_id in accounts_by_store:
+            accounts_by_store[store_id].append((account_id, categories.get(account_type_id)))
+
+    next_snapshot_id = (cursor.execute("SELECT MAX(id) FROM snapshots").fetchone()[0] or 0) + 1
+    snapshot_rows = []
+    balance_rows = []
+
+    for store_id in store_ids:
+        store_accounts = accounts_by_store[store_id]
+        # Each account follows a random walk so history endpoints see realistic series
+        levels = {account_id: rng.uniform(100, 250000) for account_id, _ in store_accounts}
+        total = snapshots + drafts
+
+        for index in range(total):
+            snapshot_date = END_DATE - timedelta(days=(total - 1 - index) * interval_days)
+            status = "completed" if index < snapshots else "draft"
+            snapshot_id = next_snapshot_id
+            next_snapshot_id += 1
+
+            total_assets = 0.0
+            total_liabilities = 0.0
+            for account_id, category in store_accounts:
+                levels[account_id] = max(0.0, levels[account_id] * rng.uniform(0.97, 1.03) + rng.uniform(-500, 500))
+                balance = round(levels[account_id], 2)
+                balance_rows.append((snapshot_id, account_id, balance, now, now))
+                if category == "Asset":
+                    total_assets += balance
+                elif category == "Liability":
+                    total_liabilities += balance
+
+            day_of_year = snapshot_date.timetuple().tm_yday
+            ytd_sales = round(day_of_year * rng.uniform(2000, 4000), 2)
+            ytd_profit = round(ytd_sales * rng.uniform(0.05, 0.2), 2)
+            snapshot_rows.append((
+                snapshot_id, store_id, datetime.combine(snapshot_date, datetime.min.time()).strftime(TIMESTAMP),
+                round(total_assets - total_liabilities, 2), round(total_assets, 2), round(total_liabilities, 2),
+                ytd_sales, ytd_profit, round(ytd_profit / ytd_sales * 100, 2),
+                "generator", status, now, now
+            ))
+
+            if len(balance_rows) >= 100000:
+                flush(cursor, snapshot_rows, balance_rows)
+
+    flush(cursor, snapshot_rows, balance_rows)
+    connection.commit()
+    cursor.execute("ANALYZE")
+    connection.commit()
+
+    counts = {
+        table: cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("stores", "accounts", "snapshots", "account_balances")
+    }
+    connection.close()
+    return counts
+
+
+def build_summaries():
+    """Build snapshot_summaries for the generated snapshots, which bypassed the app's write paths"""
+    from sqlalchemy import text
+    from src.main import app
+    from src.database import db
+    from src.summaries import rebuild_summaries
+
+    with app.app_context():
+        rebuilt = rebuild_summaries(batch_size=5000)
+        db.session.execute(text("ANALYZE snapshot_summaries"))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+    return rebuilt
+
+
+def flush(cursor, snapshot_rows, balance_rows):
+    cursor.executemany(
+        "INSERT INTO snapshots (id, store_id, snapshot_date, net_position, total_assets, total_liabilities, "
+        "ytd_sales, ytd_profit, profit_margin, created_by, status, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        snapshot_rows
+    )
+    cursor.executemany(
+        "INSERT INTO account_balances (snapshot_id, account_id, balance, points, created_at, updated_at) "
+        "VALUES (?, ?, ?, 0, ?, ?)",
+        balance_rows
+    )
+    snapshot_rows.clear()
+    balance_rows.clear()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="output SQLite file (replaced if it exists)")
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--accounts", type=int, default=60, help="active accounts per store")
+    parser.add_argument("--snapshots", type=int, default=365, help="completed snapshots per store")
+    parser.add_argument("--drafts", type=int, default=2, help="draft snapshots per store")
+    parser.add_argument("--interval-days", type=int, default=1, help="days between snapshots")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    path = os.path.abspath(args.database)
+    if os.path.exists(path):
+        os.remove(path)
+
+    started = time.perf_counter()
+    create_schema(path)
+    counts = generate(
+        path, args.stores, args.accounts, args.snapshots, args.drafts, args.interval_days, args.seed
+    )
+    counts["snapshot_summaries"] = build_summaries()
+    elapsed = time.perf_counter() - started
+
+    print(f"✓ Generated {path} in {elapsed:.1f}s")
+    for table, count in counts.items():
+        print(f"  {table}: {count:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
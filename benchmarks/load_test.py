@@ -0,0 +1,269 @@
+"""Concurrent wizard load against a running server.
+
+Each virtual user replays the wizard the way a bookkeeper uses it:
+``POST /initialize``, ``GET /accounts/<store>``, a series of autosaves
+(``POST /save-draft``, the first creating the draft and the rest updating
+it with a few changed amounts) and finally ``POST /save-snapshot``
+publishing the draft. Users run as threads, optionally spread over several
+processes, against any server URL, so the numbers include the real WSGI
+server and its worker model.
+
+The report gives throughput, p50/p95/p99/max latency per operation and the
+error rate, with "database is locked" failures counted separately.
+
+Every session writes a completed snapshot, so point the server at a
+scratch database, for example one made by ``benchmarks.generate``:
+
+    DATABASE_URL=sqlite:///$PWD/benchmarks/bench.db gunicorn -w 4 -b 127.0.0.1:5000 src.main:app
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --users 16 --sessions 5 --saves 10
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date
+
+from benchmarks.run import percentile
+
+OPERATIONS = ("initialize", "accounts", "save_draft", "save_snapshot")
+
+# Amounts changed per autosave, as when a user edits a couple of cells between saves
+EDITS_PER_SAVE = 3
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        """Return (status, parsed body or None, error kind or None, elapsed seconds)"""
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={"Content-Type": "application/json"} if data is not None else {}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError) as e:
+            return None, None, f"network: {e}", time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+
+        try:
+            parsed = json.loads(body) if body else None
+        except ValueError:
+            parsed = None
+        error = None
+        if status >= 400 or (isinstance(parsed, dict) and parsed.get("success") is False):
+            message = parsed.get("error", "") if isinstance(parsed, dict) else body[:200].decode(errors="replace")
+            error = "locked" if "locked" in str(message).lower() else f"http {status}: {str(message)[:120]}"
+        return status, parsed, error, elapsed
+
+
+def run_session(client, store_id, saves, think, rng, record):
+    """Replay one wizard session, calling record(operation, elapsed, error) per request"""
+    def call(operation, method, path, payload=None):
+        status, body, error, elapsed = client.request(method, path, payload)
+        record(operation, elapsed, error)
+        return body if error is None else None
+
+    if call("initialize", "POST", "/api/wizard/initialize") is None:
+        return
+    body = call("accounts", "GET", f"/api/wizard/accounts/{store_id}")
+    if body is None:
+        return
+
+    account_ids = [account["id"] for group in body["accounts"].values() for account in group]
+    amounts = {account_id: round(rng.uniform(0, 50000), 2) for account_id in account_ids}
+    snapshot_date = date.today().isoformat()
+    draft_id = None
+    version = None
+
+    for _ in range(saves):
+        for account_id in rng.sample(account_ids, min(EDITS_PER_SAVE, len(account_ids))):
+            amounts[account_id] = round(rng.uniform(0, 50000), 2)
+        payload = {
+            "store_id": store_id,
+            "snapshot_date": snapshot_date,
+            "balances": [{"account_id": a, "amount": v} for a, v in amounts.items()],
+        }
+        if draft_id:
+            payload["draft_id"] = draft_id
+            payload["version"] = version
+        body = call("save_draft", "POST", "/api/wizard/save-draft", payload)
+        if body is not None:
+            draft_id = body["draft_id"]
+            version = body.get("version")
+        if think:
+            time.sleep(rng.uniform(0.5, 1.5) * think)
+
+    payload = {
+        "store_id": store_id,
+        "snapshot_date": snapshot_date,
+        "balances": [{"account_id": a, "amount": v} for a, v in amounts.items()],
+    }
+    if draft_id:
+        payload["draft_id"] = draft_id
+        payload["version"] = version
+    call("save_snapshot", "POST", "/api/wizard/save-snapshot", payload)
+
+
+def run_process(options):
+    """Run ``users`` threads in this process and return their samples"""
+    client = Client(options["url"], options["timeout"])
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + options["duration"] if options["duration"] else None
+
+    def record(operation, elapsed, error):
+        with lock:
+            samples.append((operation, elapsed, error))
+
+    def user(index):
+        rng = random.Random(options["seed"] * 1000 + index)
+        stores = options["stores"]
+        session = 0
+        while True:
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    break
+            elif session >= options["sessions"]:
+                break
+            run_session(client, stores[(index + session) % len(stores)], options["saves"], options["think"], rng, record)
+            session += 1
+
+    threads = [
+        threading.Thread(target=user, args=(options["first_user"] + index,), daemon=True)
+        for index in range(options["users"])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def fetch_stores(url, timeout):
+    status, body, error, _ = Client(url, timeout).request("POST", "/api/wizard/initialize")
+    if error or not body:
+        raise SystemExit(f"✗ Could not initialize against {url}: {error}")
+    return [store["id"] for store in body["stores"]]
+
+
+def summarize(samples, wall_time):
+    report = {
+        "wall_time_s": round(wall_time, 3),
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / wall_time, 2) if wall_time else 0,
+        "errors": sum(1 for _, _, error in samples if error),
+        "lock_errors": sum(1 for _, _, error in samples if error == "locked"),
+        "operations": {},
+    }
+    report["error_rate"] = round(report["errors"] / len(samples), 4) if samples else 0
+    report["lock_error_rate"] = round(report["lock_errors"] / len(samples), 4) if samples else 0
+
+    error_samples = []
+    for operation in OPERATIONS:
+        rows = [(elapsed, error) for op, elapsed, error in samples if op == operation]
+        if not rows:
+            continue
+        latencies = [elapsed * 1000 for elapsed, _ in rows]
+        errors = [error for _, error in rows if error]
+        report["operations"][operation] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / wall_time, 2) if wall_time else 0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies), 2),
+            "errors": len(errors),
+            "lock_errors": errors.count("locked"),
+        }
+        error_samples.extend(error for error in errors if error != "locked")
+    report["error_samples"] = sorted(set(error_samples))[:5]
+    return report
+
+
+def print_report(report, file=sys.stderr):
+    print(f"\n{report['requests']} requests in {report['wall_time_s']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s)", file=file)
+    print(f"  {'operation':<14} {'req':>6} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7} {'locked':>7}",
+          file=file)
+    for operation, stats in report["operations"].items():
+        print(
+            f"  {operation:<14} {stats['requests']:>6} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms {stats['max_ms']:>7.1f}ms "
+            f"{stats['errors']:>7} {stats['lock_errors']:>7}",
+            file=file
+        )
+    print(f"  error rate {report['error_rate']:.2%}, lock error rate {report['lock_error_rate']:.2%}", file=file)
+    for error in report["error_samples"]:
+        print(f"  ✗ {error}", file=file)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=8, help="concurrent users per process")
+    parser.add_argument("--processes", type=int, default=1, help="client processes (users each)")
+    parser.add_argument("--sessions", type=int, default=3, help="wizard sessions per user")
+    parser.add_argument("--duration", type=float, default=0, help="run for this many seconds instead of --sessions")
+    parser.add_argument("--saves", type=int, default=10, help="autosaves per session before publishing")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds between autosaves")
+    parser.add_argument("--stores", help="comma-separated store ids (default: every active store)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    stores = [int(s) for s in args.stores.split(",")] if args.stores else fetch_stores(args.url, args.timeout)
+    if not stores:
+        print("✗ No stores to load", file=sys.stderr)
+        return 2
+
+    options = [{
+        "url": args.url,
+        "users": args.users,
+        "first_user": index * args.users,
+        "sessions": args.sessions,
+        "duration": args.duration,
+        "saves": args.saves,
+        "think": args.think,
+        "stores": stores,
+        "timeout": args.timeout,
+        "seed": args.seed,
+    } for index in range(max(args.processes, 1))]
+
+    print(f"Running {args.users * len(options)} users against {args.url}...", file=sys.stderr)
+    started = time.perf_counter()
+    if len(options) == 1:
+        samples = run_process(options[0])
+    else:
+        with multiprocessing.Pool(len(options)) as pool:
+            samples = [sample for result in pool.map(run_process, options) for sample in result]
+    report = summarize(samples, time.perf_counter() - started)
+    report["config"] = {
+        "url": args.url, "users": args.users * len(options), "processes": len(options),
+        "sessions": args.sessions, "duration": args.duration, "saves": args.saves, "think": args.think,
+    }
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
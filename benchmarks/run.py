@@ -0,0 +1,596 @@
+"""Benchmark every API and wizard endpoint against a generated database.
+
+Each scenario drives one route through the Flask test client on a private
+copy of the database. Per scenario it records p50/p95/p99 latency (response
+body included), the SQL statements issued by the request and the peak
+Python allocation (tracemalloc) of a few extra requests. Setup work such as
+creating the draft a DELETE removes runs outside the timed window.
+
+Results can be saved as a JSON baseline; ``--baseline`` compares a run with
+one and exits non-zero when a scenario's median got slower than
+``--threshold`` (relative, plus a small absolute slack for noise), its
+allocation peak grew as much, or it issues more queries. Slower p95s are
+reported as warnings.
+
+Usage:
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.run --only balance_sheet --only compare -n 50
+    python -m benchmarks.run --compare-profiles default,tuned
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(__file__), "bench.db")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Absolute slack added to the relative threshold so sub-millisecond routes do not flap
+LATENCY_SLACK_MS = 1.0
+MEMORY_SLACK_KB = 64
+
+# Traced requests per scenario for the allocation peak
+MEMORY_SAMPLES = 3
+
+# Completed snapshots rotated through by read scenarios, so per-snapshot caches see mostly misses
+ROTATION = 50
+
+
+class Scenario:
+    """One benchmarked request.
+
+    ``request(fixtures, state, i)`` returns ``(path, kwargs)`` for the test
+    client; ``setup(client, fixtures, i)`` runs untimed before each request
+    and its return value is passed as ``state``.
+    """
+
+    def __init__(self, name, endpoint, method, request, setup=None, expect=(200,)):
+        self.name = name
+        self.endpoint = endpoint
+        self.method = method
+        self.request = request
+        self.setup = setup
+        self.expect = expect
+
+
+def unique(prefix, i):
+    return f"{prefix} {os.getpid()}-{time.perf_counter_ns()}-{i}"
+
+
+def nth(items, i):
+    return items[i % len(items)]
+
+
+def draft_balances(fixtures, i, size=None):
+    accounts = fixtures["accounts"][:size] if size else fixtures["accounts"]
+    return [{"account_id": account_id, "amount": round(1000 + account_id * 3.5 + i, 2)} for account_id in accounts]
+
+
+def create_draft(client, fixtures, i):
+    response = client.post("/api/wizard/save-draft", json={
+        "store_id": fixtures["store_id"],
+        "snapshot_date": fixtures["today"],
+        "balances": draft_balances(fixtures, i)
+    })
+    return response.get_json()["draft_id"]
+
+
+def add_account(client, fixtures, i):
+    response = client.post("/api/wizard/add-account", json={
+        "store_id": fixtures["store_id"],
+        "account_name": unique("Bench Account", i),
+        "account_type_id": fixtures["account_type_id"]
+    })
+    return response.get_json()["account"]["id"]
+
+
+def create_account_type(client, fixtures, i):
+    response = client.post("/api/wizard/account-type", json={
+        "name": unique("Bench Type", i), "category": "Asset", "sort_order": 999
+    })
+    return response.get_json()["account_type"]["id"]
+
+
+def create_session(client, fixtures, i):
+    session_id = unique("bench-session", i)
+    client.post("/api/wizard/session", json={
+        "session_id": session_id, "store_id": fixtures["store_id"], "snapshot_date": fixtures["today"]
+    })
+    return session_id
+
+
+def snapshot_date(fixtures, i):
+    # Far-future dates keep written snapshots out of the "latest" reads
+    return (date(2100, 1, 1) + timedelta(days=i)).isoformat()
+
+
+def scenarios():
+    """Read scenarios first, so they measure the generated data rather than benchmark leftovers"""
+    return [
+        # api.py
+        Scenario("health", "api.health_check", "GET", lambda f, s, i: ("/api/health", {})),
+        Scenario("stores", "api.get_stores", "GET", lambda f, s, i: ("/api/stores", {})),
+        Scenario("accounts", "api.get_accounts", "GET",
+                 lambda f, s, i: (f"/api/accounts?store_id={f['store_id']}", {})),
+        Scenario("account_history", "api.get_account_history", "GET",
+                 lambda f, s, i: (f"/api/accounts/{nth(f['accounts'], i)}/history", {})),
+        Scenario("accounts_history", "api.get_accounts_history", "GET",
+                 lambda f, s, i: ("/api/accounts/history?ids=" + ",".join(map(str, f["accounts"][:20])), {})),
+        Scenario("snapshots", "api.get_snapshots", "GET", lambda f, s, i: ("/api/snapshots?limit=100", {})),
+        Scenario("snapshots_stream", "api.get_snapshots", "GET",
+                 lambda f, s, i: (f"/api/snapshots?store_id={f['store_id']}&stream=true", {})),
+        Scenario("snapshot_summaries", "api.get_snapshot_summaries", "GET",
+                 lambda f, s, i: ("/api/snapshots/summaries?limit=100", {})),
+        Scenario("snapshot_summaries_csv", "api.get_snapshot_summaries", "GET",
+                 lambda f, s, i: (f"/api/snapshots/summaries?store_id={f['store_id']}&format=csv", {})),
+        Scenario("dashboard_summary", "api.dashboard_summary", "GET",
+                 lambda f, s, i: ("/api/dashboard/summary", {})),
+        Scenario("dashboard_summary_store", "api.dashboard_summary", "GET",
+                 lambda f, s, i: (f"/api/dashboard/summary?store_id={f['store_id']}", {})),
+        Scenario("dashboard_timeline", "api.dashboard_timeline", "GET",
+                 lambda f, s, i: (f"/api/dashboard/timeline?days=365&end={f['latest_date']}", {})),
+        Scenario("dashboard_timeline_store", "api.dashboard_timeline", "GET",
+                 lambda f, s, i: (f"/api/dashboard/timeline?store_id={f['store_id']}&days=90&end={f['latest_date']}", {})),
+        Scenario("wizard_session_get", "api.get_wizard_session", "GET",
+                 lambda f, s, i: (f"/api/wizard/session/{s}", {}), setup=create_session),
+        # Without fix=true this only reads
+        Scenario("recompute_totals_store", "api.recompute_snapshot_totals", "POST",
+                 lambda f, s, i: (f"/api/snapshots/recompute-totals?store_id={f['store_id']}", {})),
+
+        # wizard.py
+        Scenario("initialize", "wizard.initialize_wizard", "POST", lambda f, s, i: ("/api/wizard/initialize", {})),
+        Scenario("store_accounts", "wizard.get_store_accounts", "GET",
+                 lambda f, s, i: (f"/api/wizard/accounts/{f['store_id']}", {})),
+        Scenario("drafts", "wizard.get_drafts", "GET", lambda f, s, i: ("/api/wizard/drafts", {})),
+        Scenario("latest_snapshot", "wizard.get_latest_snapshot", "GET",
+                 lambda f, s, i: (f"/api/wizard/latest-snapshot/{nth(f['stores'], i)}", {})),
+        Scenario("draft_get", "wizard.get_draft", "GET",
+                 lambda f, s, i: (f"/api/wizard/draft/{nth(f['drafts'], i)}", {})),
+        Scenario("account_types", "wizard.get_account_types", "GET",
+                 lambda f, s, i: ("/api/wizard/account-types", {})),
+        Scenario("banks", "wizard.get_banks", "GET", lambda f, s, i: ("/api/wizard/banks", {})),
+        Scenario("intercompany_pairs", "wizard.get_intercompany_pairs", "GET",
+                 lambda f, s, i: ("/api/wizard/intercompany-pairs", {})),
+        Scenario("store_snapshots", "wizard.get_store_snapshots", "GET",
+                 lambda f, s, i: (f"/api/wizard/store-snapshots/{f['store_id']}", {})),
+        Scenario("balance_sheet", "wizard.get_balance_sheet", "GET",
+                 lambda f, s, i: (f"/api/wizard/balance-sheet/{nth(f['snapshots'], i)}", {})),
+        Scenario("compare", "wizard.compare_snapshots", "GET",
+                 lambda f, s, i: (f"/api/wizard/compare?base={nth(f['snapshots'], i + 1)}&target={nth(f['snapshots'], i)}", {})),
+        Scenario("compare_12", "wizard.compare_snapshots", "GET",
+                 lambda f, s, i: ("/api/wizard/compare?ids=" + ",".join(map(str, f["snapshots"][:12])), {})),
+        Scenario("compare_12_sections", "wizard.compare_snapshots", "GET",
+                 lambda f, s, i: ("/api/wizard/compare?accounts=false&ids=" + ",".join(map(str, f["snapshots"][:12])), {})),
+        Scenario("export_json", "wizard.export_balance_sheet", "GET",
+                 lambda f, s, i: (f"/api/wizard/export-balance-sheet/{nth(f['snapshots'], i)}", {})),
+        Scenario("export_csv", "wizard.export_balance_sheet", "GET",
+                 lambda f, s, i: (f"/api/wizard/export-balance-sheet/{nth(f['snapshots'], i)}?format=csv", {})),
+
+        # Writes
+        Scenario("snapshot_create", "api.create_snapshot", "POST", lambda f, s, i: ("/api/snapshots", {"json": {
+            "store_id": f["store_id"], "snapshot_date": snapshot_date(f, i),
+            "balances": [{"account_id": b["account_id"], "balance": b["amount"]} for b in draft_balances(f, i)]
+        }}), expect=(201,)),
+        Scenario("wizard_session_create", "api.create_wizard_session", "POST",
+                 lambda f, s, i: ("/api/wizard/session", {"json": {
+                     "session_id": unique("bench-session", i), "store_id": f["store_id"]
+                 }}), expect=(201,)),
+        Scenario("wizard_step_update", "api.update_wizard_step", "PUT",
+                 lambda f, s, i: (f"/api/wizard/session/{s}/step/2", {"json": {"step_data": {"balances": draft_balances(f, i)}}}),
+                 setup=create_session),
+        Scenario("wizard_session_complete", "api.complete_wizard_session", "POST",
+                 lambda f, s, i: (f"/api/wizard/session/{s}/complete", {}), setup=create_session),
+        Scenario("save_draft_new", "wizard.save_draft", "POST", lambda f, s, i: ("/api/wizard/save-draft", {"json": {
+            "store_id": f["store_id"], "snapshot_date": f["today"], "balances": draft_balances(f, i)
+        }})),
+        Scenario("save_draft_update", "wizard.save_draft", "POST", lambda f, s, i: ("/api/wizard/save-draft", {"json": {
+            "draft_id": f["drafts"][0], "store_id": f["store_id"], "snapshot_date": f["today"],
+            "balances": draft_balances(f, i)
+        }})),
+        Scenario("patch_draft", "wizard.patch_draft_balances", "PATCH",
+                 lambda f, s, i: (f"/api/wizard/draft/{f['drafts'][0]}/balances", {"json": {
+                     "balances": draft_balances(f, i, size=3)
+                 }})),
+        Scenario("save_snapshot", "wizard.save_snapshot", "POST", lambda f, s, i: ("/api/wizard/save-snapshot", {"json": {
+            "store_id": f["store_id"], "snapshot_date": snapshot_date(f, i),
+            "balances": draft_balances(f, i), "ytd_sales": 100000, "ytd_profit": 12000
+        }})),
+        Scenario("save_snapshot_from_draft", "wizard.save_snapshot", "POST",
+                 lambda f, s, i: ("/api/wizard/save-snapshot", {"json": {
+                     "draft_id": s, "store_id": f["store_id"], "snapshot_date": snapshot_date(f, i + 10000),
+                     "balances": draft_balances(f, i)
+                 }}), setup=create_draft),
+        Scenario("draft_delete", "wizard.delete_draft", "DELETE",
+                 lambda f, s, i: (f"/api/wizard/draft/{s}", {}), setup=create_draft),
+        Scenario("add_account", "wizard.add_account", "POST", lambda f, s, i: ("/api/wizard/add-account", {"json": {
+            "store_id": f["store_id"], "account_name": unique("Bench Account", i),
+            "account_type_id": f["account_type_id"]
+        }})),
+        Scenario("update_account", "wizard.update_account", "PUT",
+                 lambda f, s, i: (f"/api/wizard/account/{f['accounts'][0]}", {"json": {"account_number": f"{i:04d}"}})),
+        Scenario("delete_account", "wizard.delete_account", "DELETE",
+                 lambda f, s, i: (f"/api/wizard/delete-account/{s}", {}), setup=add_account),
+        Scenario("account_type_create", "wizard.create_account_type", "POST",
+                 lambda f, s, i: ("/api/wizard/account-type", {"json": {
+                     "name": unique("Bench Type", i), "category": "Liability"
+                 }})),
+        Scenario("account_type_update", "wizard.update_account_type", "PUT",
+                 lambda f, s, i: (f"/api/wizard/account-type/{s}", {"json": {"sort_order": i}}),
+                 setup=create_account_type),
+        Scenario("account_type_delete", "wizard.delete_account_type", "DELETE",
+                 lambda f, s, i: (f"/api/wizard/account-type/{s}", {}), setup=create_account_type),
+        Scenario("bank_create", "wizard.create_bank", "POST",
+                 lambda f, s, i: ("/api/wizard/bank", {"json": {"name": unique("Bench Bank", i)}})),
+        Scenario("bulk_import", "wizard.bulk_import_accounts", "POST",
+                 lambda f, s, i: ("/api/wizard/bulk-import", {"json": {"accounts": [
+                     {"storeName": f["store_name"], "accountType": f["account_type_name"],
+                      "accountName": unique(f"Bench Import {row}", i), "bank": "-"}
+                     for row in range(200)
+                 ]}})),
+        Scenario("intercompany_accounts", "wizard.add_intercompany_accounts", "POST",
+                 lambda f, s, i: ("/api/wizard/add-intercompany-accounts", {"json": {
+                     "creditor_store_id": nth(f["stores"], i), "debtor_store_id": nth(f["stores"], i + 1)
+                 }})),
+    ]
+
+
+def check_summaries(db):
+    """Make sure every completed snapshot has its stored summary.
+
+    Without them the summary and comparison scenarios would measure an empty
+    list and the on-the-fly fallback. Databases generated before the
+    summaries existed get them built on the private copy.
+    """
+    from sqlalchemy import func
+    from src.models.balance_sheet import Snapshot, SnapshotSummary
+    from src.summaries import rebuild_summaries
+
+    def counts():
+        completed = db.session.query(func.count(Snapshot.id)).filter(Snapshot.status == 'completed').scalar()
+        return completed, db.session.query(func.count(SnapshotSummary.snapshot_id)).scalar()
+
+    completed, summaries = counts()
+    if summaries == completed:
+        return
+    print(f"⚠ {completed - summaries} completed snapshots have no stored summary; building them", file=sys.stderr)
+    rebuild_summaries(batch_size=5000)
+    completed, summaries = counts()
+    if summaries != completed:
+        raise SystemExit(f"✗ snapshot_summaries has {summaries} rows for {completed} completed snapshots")
+
+
+def load_fixtures(db, models):
+    """Pick ids from the generated data: the store with the most accounts and its snapshots"""
+    from sqlalchemy import func
+
+    Store, Account, AccountType, Snapshot = models
+    store_id, _ = db.session.query(Account.store_id, func.count(Account.id)).filter(
+        Account.is_active.is_(True)
+    ).group_by(Account.store_id).order_by(func.count(Account.id).desc()).first()
+    store = db.session.get(Store, store_id)
+
+    accounts = [row.id for row in db.session.query(Account.id).filter(
+        Account.store_id == store_id, Account.is_active.is_(True)
+    ).order_by(Account.id)]
+    snapshots = [row.id for row in db.session.query(Snapshot.id).filter(
+        Snapshot.store_id == store_id, Snapshot.status == 'completed'
+    ).order_by(Snapshot.snapshot_date.desc(), Snapshot.id.desc()).limit(ROTATION)]
+    drafts = [row.id for row in db.session.query(Snapshot.id).filter(
+        Snapshot.store_id == store_id, Snapshot.status == 'draft'
+    ).order_by(Snapshot.id)]
+    latest = db.session.query(func.max(Snapshot.snapshot_date)).scalar()
+    account_type = db.session.query(AccountType).filter_by(category='Asset').order_by(AccountType.id).first()
+
+    return {
+        "store_id": store_id,
+        "store_name": store.name,
+        "stores": [row.id for row in db.session.query(Store.id).filter(Store.is_active.is_(True)).order_by(Store.id)],
+        "accounts": accounts,
+        "snapshots": snapshots,
+        "drafts": drafts,
+        "account_type_id": account_type.id,
+        "account_type_name": account_type.name,
+        "latest_date": (latest or datetime.utcnow()).date().isoformat(),
+        "today": date.today().isoformat(),
+    }
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a non-empty list, q in 0..100"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_scenario(client, scenario, fixtures, iterations, warmup, counter):
+    timings = []
+    queries = 0
+    errors = []
+
+    def call(i, timed):
+        state = scenario.setup(client, fixtures, i) if scenario.setup else None
+        path, kwargs = scenario.request(fixtures, state, i)
+        counter[0] = 0
+        start = time.perf_counter()
+        response = client.open(path, method=scenario.method, **kwargs)
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        if response.status_code not in scenario.expect:
+            errors.append(f"{response.status_code} {path}: {response.get_data(as_text=True)[:200]}")
+        if timed:
+            timings.append(elapsed * 1000)
+        return counter[0]
+
+    for i in range(warmup):
+        call(i, timed=False)
+    for i in range(warmup, warmup + iterations):
+        queries = max(queries, call(i, timed=True))
+
+    # A few more requests under tracemalloc; tracing slows them down, so they are not timed.
+    # The smallest peak filters out garbage collections that happened to land mid-request.
+    peaks = []
+    for i in range(warmup + iterations, warmup + iterations + MEMORY_SAMPLES):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            call(i, timed=False)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    peak = min(peaks)
+
+    return {
+        "endpoint": scenario.endpoint,
+        "method": scenario.method,
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": queries,
+        "peak_kb": round(peak / 1024, 1),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+    }
+
+
+def database_counts(path):
+    connection = sqlite3.connect(path)
+    try:
+        return {
+            table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("stores", "accounts", "snapshots", "account_balances")
+        }
+    finally:
+        connection.close()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(database, iterations, warmup, only):
+    workdir = tempfile.mkdtemp(prefix="bbn-bench-")
+    path = os.path.join(workdir, "bench.db")
+    shutil.copyfile(database, path)
+
+    # The app reads these at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["CACHE_STAMP_DIR"] = workdir
+    os.environ["METRICS_DIR"] = os.path.join(workdir, "metrics")
+    sys.path.insert(0, ROOT)
+
+    import logging
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from src.main import app
+    from src.database import db
+    from src.migrations import run_migrations
+    from src.models.balance_sheet import Store, Account, AccountType, Snapshot
+    from src.sqlite_profile import sqlite_profile
+
+    logging.getLogger("src.requests").setLevel(logging.WARNING)
+
+    counter = [0]
+
+    def count_query(*args):
+        counter[0] += 1
+
+    event.listen(Engine, "before_cursor_execute", count_query)
+
+    selected = [s for s in scenarios() if not only or any(name in s.name for name in only)]
+    if not only:
+        covered = {s.endpoint for s in selected}
+        missing = sorted(
+            rule.endpoint for rule in app.url_map.iter_rules()
+            if rule.endpoint.split(".")[0] in ("api", "wizard") and rule.endpoint not in covered
+        )
+        for endpoint in missing:
+            print(f"⚠ No scenario for {endpoint}", file=sys.stderr)
+
+    results = {}
+    try:
+        with app.app_context():
+            # Databases generated before a schema change still benchmark the current models
+            run_migrations(db.engine)
+            check_summaries(db)
+            fixtures = load_fixtures(db, (Store, Account, AccountType, Snapshot))
+            sqlite_settings = sqlite_profile.report(db.engine)
+            db.session.remove()
+
+        client = app.test_client()
+        if not fixtures["drafts"]:
+            fixtures["drafts"] = [create_draft(client, fixtures, 0)]
+
+        for scenario in selected:
+            results[scenario.name] = run_scenario(client, scenario, fixtures, iterations, warmup, counter)
+            result = results[scenario.name]
+            print(
+                f"  {scenario.name:<28} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                f"p99 {result['p99_ms']:>8.2f}ms  {result['queries']:>4} queries  {result['peak_kb']:>9.1f}KB"
+                + (f"  {result['errors']} errors" if result["errors"] else ""),
+                file=sys.stderr
+            )
+    finally:
+        event.remove(Engine, "before_cursor_execute", count_query)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "database": os.path.abspath(database),
+            "counts": database_counts(database),
+            "sqlite_settings": sqlite_settings,
+            "iterations": iterations,
+            "warmup": warmup,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Return (regressions, warnings) against a baseline report.
+
+    The median, query count and allocation peak gate the run; tail latency
+    is too noisy at a few dozen iterations, so a slower p95 only warns.
+    """
+    regressions = []
+    warnings = []
+    for name, result in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        for metric, messages in (("p50_ms", regressions), ("p95_ms", warnings)):
+            limit = base[metric] * (1 + threshold) + LATENCY_SLACK_MS
+            if result[metric] > limit:
+                messages.append(f"{name}: {metric} {base[metric]:.2f} -> {result[metric]:.2f} (limit {limit:.2f})")
+        if result["queries"] > base["queries"]:
+            regressions.append(f"{name}: queries {base['queries']} -> {result['queries']}")
+        limit = base["peak_kb"] * (1 + threshold) + MEMORY_SLACK_KB
+        if result["peak_kb"] > limit:
+            regressions.append(f"{name}: peak_kb {base['peak_kb']:.1f} -> {result['peak_kb']:.1f} (limit {limit:.1f})")
+    return regressions, warnings
+
+
+def compare_profiles(args, profiles):
+    """Run the suite once per SQLITE_PROFILE in a fresh process and print the medians side by side"""
+    reports = {}
+    workdir = tempfile.mkdtemp(prefix="bbn-profiles-")
+    try:
+        for profile in profiles:
+            path = os.path.join(workdir, f"{profile}.json")
+            command = [
+                sys.executable, "-m", "benchmarks.run", "--database", args.database,
+                "-n", str(args.iterations), "--warmup", str(args.warmup),
+                "--sqlite-profile", profile, "--save", path,
+            ]
+            for name in args.only or []:
+                command += ["--only", name]
+            print(f"→ SQLITE_PROFILE={profile}", file=sys.stderr)
+            subprocess.run(command, cwd=ROOT, check=False)
+            with open(path) as f:
+                reports[profile] = json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    first, *others = profiles
+    header = f"{'scenario':<28}" + "".join(f"{profile + ' p50':>16}" for profile in profiles)
+    header += "".join(f"{'vs ' + first:>12}" for _ in others)
+    print(header)
+    for name, result in reports[first]["scenarios"].items():
+        line = f"{name:<28}" + "".join(
+            f"{reports[profile]['scenarios'].get(name, {}).get('p50_ms', float('nan')):>14.2f}ms" for profile in profiles
+        )
+        for profile in others:
+            other = reports[profile]["scenarios"].get(name)
+            change = (other["p50_ms"] / result["p50_ms"] - 1) * 100 if other and result["p50_ms"] else float("nan")
+            line += f"{change:>+11.1f}%"
+        print(line)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(reports, f, indent=2, sort_keys=True)
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="database made by benchmarks.generate")
+    parser.add_argument("-n", "--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", action="append", help="run scenarios whose name contains this (repeatable)")
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="compare with a saved report and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    parser.add_argument("--sqlite-profile", help="SQLITE_PROFILE for the app under test (default: the app's)")
+    parser.add_argument("--compare-profiles", help='run once per profile and compare, e.g. "default,tuned"')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"✗ {args.database} not found; run python -m benchmarks.generate first", file=sys.stderr)
+        return 2
+    if args.compare_profiles:
+        return compare_profiles(args, [p.strip() for p in args.compare_profiles.split(",") if p.strip()])
+    if args.sqlite_profile:
+        os.environ["SQLITE_PROFILE"] = args.sqlite_profile
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = run(args.database, max(args.iterations, 1), args.warmup, args.only)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"✓ Saved {args.save}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    failed = False
+    broken = [name for name, result in report["scenarios"].items() if result["errors"]]
+    for name in broken:
+        print(f"✗ {name}: unexpected responses: {report['scenarios'][name]['error_samples']}", file=sys.stderr)
+        failed = True
+
+    if baseline:
+        if baseline["meta"].get("iterations") != report["meta"]["iterations"]:
+            # Write scenarios grow the database as they go, so counts must match to compare
+            print(f"⚠ Baseline ran {baseline['meta'].get('iterations')} iterations, this run "
+                  f"{report['meta']['iterations']}; results are not directly comparable", file=sys.stderr)
+        regressions, warnings = compare(report, baseline, args.threshold)
+        for message in warnings:
+            print(f"⚠ Slower tail {message}", file=sys.stderr)
+        for message in regressions:
+            print(f"✗ Regression {message}", file=sys.stderr)
+        if regressions:
+            failed = True
+        else:
+            print(f"✓ No regressions against {args.baseline}", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
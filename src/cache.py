@@ -0,0 +1,220 @@
+"""In-process caches shared by all blueprints.
+
+Stores, account types and banks are tiny and rarely change, so they are loaded
+once per process and served from memory. Rendered balance sheets of completed
+snapshots are kept in a bounded LRU. Each cache is tied to a version stamp file
+next to the database: a write endpoint calls ``invalidate()`` after its commit,
+which replaces the stamp file, and every worker process notices the new stamp
+on its next read and drops or reloads its copy.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class VersionStamp:
+    """A version marker on disk that every worker process can observe"""
+
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+
+    def configure(self, directory):
+        self.path = os.path.join(directory, f"{self.name}.version")
+
+    def current(self):
+        """Return an opaque token that changes whenever ``bump()`` is called"""
+        if self.path is None:
+            return None
+        try:
+            with open(self.path) as f:
+                return f.readline().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def bump(self):
+        """Write a fresh random token; file metadata can repeat, the token cannot"""
+        if self.path is None:
+            return
+        # Written aside and renamed over the stamp so readers never see a partial token
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{uuid.uuid4().hex}\n")
+        os.replace(tmp_path, self.path)
+
+
+class ReferenceCache:
+    """Versioned in-memory copy of the stores, account_types and banks tables"""
+
+    def __init__(self):
+        self.stamp = VersionStamp("reference_cache")
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        directory = app.config.get("CACHE_STAMP_DIR") or app.instance_path
+        os.makedirs(directory, exist_ok=True)
+        self.stamp.configure(directory)
+
+    def invalidate(self):
+        """Drop the cached tables in this process and every other worker"""
+        with self._lock:
+            self._data = None
+        self.stamp.bump()
+
+    def _load(self):
+        from src.models.balance_sheet import Store, AccountType, Bank
+
+        stores = [store.to_dict() for store in Store.query.order_by(Store.id).all()]
+        account_types = [
+            account_type.to_dict()
+            for account_type in AccountType.query.order_by(AccountType.sort_order, AccountType.id).all()
+        ]
+        banks = [bank.to_dict() for bank in Bank.query.order_by(Bank.name).all()]
+
+        return {
+            "stores": stores,
+            "stores_by_id": {store["id"]: store for store in stores},
+            "stores_by_name": {store["name"]: store for store in stores},
+            "account_types": account_types,
+            "account_types_by_id": {account_type["id"]: account_type for account_type in account_types},
+            "account_types_by_name": {account_type["name"]: account_type for account_type in account_types},
+            "account_type_sections": {account_type["id"]: account_type["section"] for account_type in account_types},
+            "banks": banks,
+            "banks_by_id": {bank["id"]: bank for bank in banks},
+            "banks_by_name": {bank["name"]: bank for bank in banks},
+        }
+
+    def _get(self, key):
+        version = self.stamp.current()
+        data = self._data
+        if data is None or version != self._version:
+            with self._lock:
+                # Read the stamp before the tables so a concurrent bump forces another reload
+                version = self.stamp.current()
+                if self._data is None or version != self._version:
+                    self._data = self._load()
+                    self._version = version
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                data = self._data
+        else:
+            self.hits += 1
+        return data[key]
+
+    def stats(self):
+        return {"hit": self.hits, "miss": self.misses}
+
+    # Stores
+
+    def stores(self, active_only=False):
+        """All stores as dicts, ordered by id"""
+        stores = self._get("stores")
+        return [store for store in stores if store["is_active"]] if active_only else list(stores)
+
+    def store(self, store_id):
+        return self._get("stores_by_id").get(store_id)
+
+    def stores_by_name(self):
+        return dict(self._get("stores_by_name"))
+
+    # Account types
+
+    def account_types(self):
+        """All account types as dicts, ordered by sort_order"""
+        return list(self._get("account_types"))
+
+    def account_type(self, account_type_id):
+        return self._get("account_types_by_id").get(account_type_id)
+
+    def account_type_section(self, account_type_id):
+        """Balance sheet section of an account type, None if unknown or unclassified"""
+        return self._get("account_type_sections").get(account_type_id)
+
+    def account_types_by_name(self):
+        return dict(self._get("account_types_by_name"))
+
+    # Banks
+
+    def banks(self, active_only=False):
+        """All banks as dicts, ordered by name"""
+        banks = self._get("banks")
+        return [bank for bank in banks if bank["is_active"]] if active_only else list(banks)
+
+    def bank(self, bank_id):
+        return self._get("banks_by_id").get(bank_id)
+
+    def banks_by_name(self):
+        return dict(self._get("banks_by_name"))
+
+
+class LRUCache:
+    """Bounded per-process cache, emptied whenever any of its stamps change"""
+
+    def __init__(self, name, maxsize=256, depends_on=()):
+        self.stamp = VersionStamp(name)
+        self.maxsize = maxsize
+        self._stamps = (self.stamp,) + tuple(depends_on)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app, size_setting=None):
+        directory = app.config.get("CACHE_STAMP_DIR") or app.instance_path
+        os.makedirs(directory, exist_ok=True)
+        self.stamp.configure(directory)
+        if size_setting and app.config.get(size_setting):
+            self.maxsize = int(app.config[size_setting])
+
+    def version(self):
+        return tuple(stamp.current() for stamp in self._stamps)
+
+    def get(self, key):
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+                self.misses += 1
+                return None
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def stats(self):
+        return {"hit": self.hits, "miss": self.misses}
+
+    def put(self, key, value):
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Empty this cache in this process and every other worker"""
+        with self._lock:
+            self._entries.clear()
+        self.stamp.bump()
+
+
+reference_cache = ReferenceCache()
+
+# Rendered balance sheets embed store, account type and bank names, so they
+# also expire whenever the reference tables change.
+balance_sheet_cache = LRUCache("balance_sheets", depends_on=(reference_cache.stamp,))
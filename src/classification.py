@@ -0,0 +1,98 @@
+"""Balance sheet classification of account types.
+
+Every account type carries a ``section`` (where its accounts are listed on
+the balance sheet) and a ``liquidity`` (``current`` or ``long_term``, which
+subtotal they count towards). Both are stored on ``account_types``, so the
+wizard, the balance sheet and the SQL aggregations in ``src/summaries.py``
+classify an account with one lookup instead of matching type names.
+
+``DEFAULT_SECTIONS`` only seeds the classification of the standard types
+(and of new types created without one); after that the stored columns are
+authoritative and can be edited through ``PUT /api/wizard/account-type``.
+"""
+
+# (section, parent) in the order the balance sheet lists them
+BALANCE_SHEET_SECTIONS = (
+    ('bank_accounts', 'assets'),
+    ('merchant_accounts', 'assets'),
+    ('inventory', 'assets'),
+    ('other_assets', 'assets'),
+    ('current_liabilities', 'liabilities'),
+    ('long_term', 'liabilities'),
+)
+
+SECTION_COLUMNS = tuple(name for name, _ in BALANCE_SHEET_SECTIONS)
+
+SECTION_PARENTS = dict(BALANCE_SHEET_SECTIONS)
+
+# Account type category -> balance sheet side its sections belong to
+CATEGORY_PARENTS = {'Asset': 'assets', 'Liability': 'liabilities'}
+
+LIQUIDITY_LEVELS = ('current', 'long_term')
+
+# Standard account types; anything else defaults to other_assets / long_term
+DEFAULT_SECTIONS = {
+    'Bank Checking': 'bank_accounts',
+    'Bank Savings': 'bank_accounts',
+    'Merchant Account': 'merchant_accounts',
+    'Points': 'merchant_accounts',
+    'Inventory': 'inventory',
+    'Intercompany Receivable': 'other_assets',
+    'Order Receivable': 'other_assets',
+    'Tax Refund': 'other_assets',
+    'Loan Receivable': 'other_assets',
+    'Credit Card': 'current_liabilities',
+    'Vendor Payable': 'current_liabilities',
+    'Sales Tax Payable': 'current_liabilities',
+    'Pending Refunds': 'current_liabilities',
+    'Pending Shipments': 'current_liabilities',
+    'Management Fee': 'current_liabilities',
+    'Advertising Payable': 'current_liabilities',
+    'Shipping Payable': 'current_liabilities',
+    'Container Duties': 'current_liabilities',
+}
+
+DEFAULT_LIQUIDITY = {
+    'bank_accounts': 'current',
+    'merchant_accounts': 'current',
+    'inventory': 'current',
+    'other_assets': 'long_term',
+    'current_liabilities': 'current',
+    'long_term': 'long_term',
+}
+
+
+def default_section(name, category):
+    """Section for an account type, None for categories outside the balance sheet"""
+    parent = CATEGORY_PARENTS.get(category)
+    if parent is None:
+        return None
+    section = DEFAULT_SECTIONS.get(name)
+    if section and SECTION_PARENTS[section] == parent:
+        return section
+    return 'other_assets' if parent == 'assets' else 'long_term'
+
+
+def default_liquidity(section):
+    return DEFAULT_LIQUIDITY.get(section)
+
+
+def default_classification(name, category):
+    """{"section", "liquidity"} for a new account type"""
+    section = default_section(name, category)
+    return {"section": section, "liquidity": default_liquidity(section)}
+
+
+def validate_classification(category, section, liquidity):
+    """Error message for a section/liquidity that does not fit the category, else None"""
+    parent = CATEGORY_PARENTS.get(category)
+    if section is not None:
+        if section not in SECTION_PARENTS:
+            return f"Unknown section {section!r}; use one of {', '.join(SECTION_COLUMNS)}"
+        if SECTION_PARENTS[section] != parent:
+            return f"Section {section!r} does not belong to category {category!r}"
+    elif parent is not None:
+        return f"A section is required for category {category!r}"
+    if liquidity is not None and liquidity not in LIQUIDITY_LEVELS:
+        return f"Unknown liquidity {liquidity!r}; use one of {', '.join(LIQUIDITY_LEVELS)}"
+    return None
@@ -0,0 +1,650 @@
+"""Bulk import pipelines for accounts and historical snapshots.
+
+Rows are read one at a time from a JSON, NDJSON or CSV request body and
+written in chunks. Existing ``(store_id, account_name)`` keys are loaded once
+up front and store names are resolved through a normalized index, so each row
+costs a couple of dict lookups instead of a query. Every chunk is committed on
+its own, which keeps transactions short enough not to block the wizard's
+writers during a large import.
+
+Large imports run as background jobs (see src/jobs.py); historical snapshot
+imports also report their progress through the HistoricalImport row created
+for the upload.
+"""
+import codecs
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
+
+from sqlalchemy import and_, delete, func, insert, select, update
+
+from src.cache import reference_cache
+from src.database import db
+from src.jobs import job_runner
+from src.models.balance_sheet import Account, AccountBalance, Bank, HistoricalImport, Snapshot
+from src.summaries import refresh_summaries
+from src.totals import compute_totals
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Status of historical snapshots until their import completes
+IMPORTING = 'importing'
+
+NDJSON_TYPES = ("application/x-ndjson",)
+CSV_TYPES = ("text/csv", "application/csv")
+
+# Errors kept in HistoricalImport.notes and account import summaries; the rest are only counted
+MAX_RECORDED_ERRORS = 100
+
+# Accepted snapshot_date formats in historical files
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y')
+
+# Bank column values that mean "no bank"
+NO_BANK = ('', '-')
+
+
+def normalize_name(name):
+    """Lowercase a name and reduce it to its alphanumeric words"""
+    return " ".join(re.findall(r"[a-z0-9]+", (name or "").lower()))
+
+
+class StoreMatcher:
+    """Resolve free-form store names from import files to stores.
+
+    Tries an exact match, then a match on the normalized name, then the
+    longest store name contained in (or containing) the given name, e.g.
+    "Slice Yorktown" -> "Slice". Results are memoized, so each distinct
+    name is resolved once per import.
+    """
+
+    def __init__(self, stores):
+        self.exact = {store["name"]: store for store in stores}
+        self.normalized = {normalize_name(store["name"]): store for store in stores}
+        self._resolved = {}
+
+    def match(self, name):
+        if name in self._resolved:
+            return self._resolved[name]
+
+        store = self.exact.get(name)
+        if store is None:
+            key = normalize_name(name)
+            store = self.normalized.get(key)
+            if store is None and key:
+                candidates = [
+                    (len(store_key), candidate)
+                    for store_key, candidate in self.normalized.items()
+                    if store_key and (store_key in key or key in store_key)
+                ]
+                if candidates:
+                    store = max(candidates, key=lambda item: item[0])[1]
+
+        self._resolved[name] = store
+        return store
+
+
+def iter_request_rows(request):
+    """Yield account rows from the request body without buffering it.
+
+    ``application/json`` bodies are ``{"accounts": [...]}`` as sent by the
+    bulk import dialog; ``application/x-ndjson`` has one account object per
+    line and ``text/csv`` has a header row. All use the same keys:
+    storeName, accountType, accountName, bank, accountNumber.
+    """
+    if request.mimetype in NDJSON_TYPES + CSV_TYPES:
+        yield from iter_rows(request.stream, request.mimetype)
+    else:
+        data = request.get_json()
+        yield from data.get("accounts", [])
+
+
+def iter_rows(stream, mimetype):
+    """Yield account rows from a binary stream in one of the request formats"""
+    if mimetype in NDJSON_TYPES:
+        for line in codecs.iterdecode(stream, "utf-8"):
+            if line.strip():
+                yield json.loads(line)
+    elif mimetype in CSV_TYPES:
+        lines = codecs.iterdecode(stream, "utf-8-sig")
+        for row in csv.DictReader(lines):
+            yield {key.strip(): (value or "").strip() for key, value in row.items() if key}
+    else:
+        yield from json.load(stream).get("accounts", [])
+
+
+def spool_to_file(stream, directory=None, suffix=""):
+    """Copy a request body to a temp file for a background job, returning its path"""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(stream, f)
+    return path
+
+
+class AccountImporter:
+    """Insert or reactivate accounts in chunks, one commit per chunk.
+
+    ``progress``, if given, is called by ``run()`` with the dict describing
+    each committed chunk.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self.chunk_size = max(1, chunk_size)
+        self.progress = progress
+
+        self.stores = StoreMatcher(reference_cache.stores())
+        self.account_types = reference_cache.account_types_by_name()
+        self.banks = reference_cache.banks_by_name()
+        self.banks_created = False
+
+        # (store_id, account_name) -> [account id, is_active] for every existing account
+        self.existing = {
+            (store_id, account_name): [account_id, is_active]
+            for account_id, store_id, account_name, is_active in db.session.query(
+                Account.id, Account.store_id, Account.account_name, Account.is_active
+            )
+        }
+
+        self.rows = 0
+        self.created = 0
+        self.reactivated = 0
+        self.skipped = 0
+        self.errors = []
+        self.error_count = 0
+        self.chunks = 0
+
+        self._inserts = []
+        self._reactivations = []
+        self._chunk_rows = 0
+
+    def run(self, rows):
+        """Import an iterable of row dicts and return the summary"""
+        for progress in self.import_rows(rows):
+            if self.progress:
+                self.progress(progress)
+        return self.summary()
+
+    def import_rows(self, rows):
+        """Import rows, yielding a progress dict after each committed chunk"""
+        for row in rows:
+            self.rows += 1
+            self._chunk_rows += 1
+            try:
+                self.add(row)
+            except Exception as e:
+                name = row.get('accountName', 'unknown') if isinstance(row, dict) else 'unknown'
+                self.error(f"error processing {name}: {str(e)}")
+            if self._chunk_rows >= self.chunk_size:
+                yield self.flush()
+        if self._chunk_rows:
+            yield self.flush()
+
+        if self.banks_created:
+            reference_cache.invalidate()
+            self.banks_created = False
+
+    def error(self, message):
+        """Record an error for the current row; past MAX_RECORDED_ERRORS it is only counted"""
+        self.error_count += 1
+        if len(self.errors) < MAX_RECORDED_ERRORS:
+            self.errors.append(f"Row {self.rows}: {message}")
+
+    def add(self, row):
+        store_name = row.get('storeName') or ''
+        store = self.stores.match(store_name)
+        if not store:
+            self.error(f"Store not found: {store_name}")
+            return
+
+        account_type_name = row.get('accountType')
+        account_type = self.account_types.get(account_type_name)
+        if not account_type:
+            self.error(f"Account type not found: {account_type_name}")
+            return
+
+        bank = self.bank(row.get('bank'))
+
+        account_name = row.get('accountName', '')
+        key = (store["id"], account_name)
+        existing = self.existing.get(key)
+        if existing:
+            if existing[1]:
+                self.skipped += 1
+            else:
+                # Reactivate if it was deactivated
+                existing[1] = True
+                self._reactivations.append({"id": existing[0], "is_active": True})
+                self.reactivated += 1
+            return
+
+        # Later rows with the same key within this import are skipped
+        self.existing[key] = [None, True]
+        self._inserts.append({
+            "store_id": store["id"],
+            "account_name": account_name,
+            "account_type_id": account_type["id"],
+            "bank_id": bank["id"] if bank else None,
+            "account_number": row.get('accountNumber') or None,
+            "is_active": True,
+        })
+        self.created += 1
+
+    def bank(self, bank_name):
+        """Look up a bank by name, creating it if it does not exist yet"""
+        if bank_name is None or bank_name.strip() in NO_BANK:
+            return None
+        bank = self.banks.get(bank_name)
+        if bank is None:
+            bank = Bank(name=bank_name, is_active=True)
+            db.session.add(bank)
+            db.session.flush()
+            bank = bank.to_dict()
+            self.banks[bank_name] = bank
+            self.banks_created = True
+        return bank
+
+    def flush(self):
+        """Write and commit the pending chunk, returning its progress dict"""
+        if self._inserts:
+            db.session.execute(insert(Account), self._inserts)
+        if self._reactivations:
+            db.session.execute(update(Account), self._reactivations)
+        db.session.commit()
+
+        self.chunks += 1
+        progress = {
+            "chunk": self.chunks,
+            "rows": self._chunk_rows,
+            "inserted": len(self._inserts),
+            "reactivated": len(self._reactivations),
+            "processed": self.rows,
+            "errors": self.error_count,
+        }
+        self._inserts = []
+        self._reactivations = []
+        self._chunk_rows = 0
+        return progress
+
+    def summary(self):
+        created = self.created + self.reactivated
+        return {
+            "rows": self.rows,
+            "created": created,
+            "inserted": self.created,
+            "reactivated": self.reactivated,
+            "skipped": self.skipped,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "message": f"Imported {created} accounts, skipped {self.skipped} existing",
+        }
+
+
+def parse_amount(value):
+    """Parse a balance as exported from a spreadsheet: "$1,234.50", "(12.00)", "-3" """
+    text = (value or '').strip().replace('$', '').replace(',', '')
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    if not text or text == '-':
+        return Decimal('0')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value}")
+    return -amount if negative else amount
+
+
+def parse_snapshot_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime((value or '').strip(), date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid snapshot_date: {value}")
+
+
+def counted_lines(stream, counter):
+    """Yield raw lines from a binary stream, adding their size to counter[0]"""
+    for line in stream:
+        counter[0] += len(line)
+        yield line
+
+
+class HistoricalSnapshotImporter:
+    """Create completed snapshots and their balances from a long-format CSV.
+    
+    One row per balance with the columns ``store``, ``snapshot_date``,
+    ``account_name`` and ``balance``; optional ``ytd_sales`` and
+    ``ytd_profit`` apply to the row's snapshot, and ``account_type`` lets
+    accounts that no longer exist be created (as inactive accounts). Rows may
+    come in any order: a second balance for the same snapshot and account is
+    reported as a duplicate wherever it appears in the file. Balances are bulk
+    inserted once per chunk, after which the totals and summaries of the
+    snapshots the chunk touched are recomputed from the database, so memory
+    stays bounded by the chunk size (plus the accounts lookup) however many
+    snapshots the file holds.
+
+    Snapshots are created with status ``importing`` (and ``created_by``
+    naming the import), so partial balance sheets are neither listed nor
+    cached while later chunks still add to them. The final flush marks them
+    completed and builds their summaries; a failed import deletes them, so
+    the file can be imported again.
+    """
+
+    def __init__(self, import_id, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self.import_id = import_id
+        self.chunk_size = max(1, chunk_size)
+        self.progress = progress
+        self.record = db.session.get(HistoricalImport, import_id)
+
+        self.stores = StoreMatcher(reference_cache.stores())
+        self.account_types = reference_cache.account_types_by_name()
+        self.categories = {account_type["id"]: account_type["category"] for account_type in reference_cache.account_types()}
+
+        # (store_id, account_name) -> (account id, category)
+        self.accounts = {
+            (store_id, account_name): (account_id, self.categories.get(account_type_id))
+            for account_id, store_id, account_name, account_type_id in db.session.query(
+                Account.id, Account.store_id, Account.account_name, Account.account_type_id
+            )
+        }
+        # Snapshots of this import are tagged with it until they are published
+        self.marker = f"historical_import:{import_id}"
+        # Every snapshot up to this id predates the import
+        self.last_existing_snapshot = db.session.query(func.max(Snapshot.id)).scalar() or 0
+        # Keys of existing snapshots already reported, so each is reported once
+        self.skipped_keys = set()
+        self.snapshots_created = 0
+
+        # Per chunk: (store_id, date) -> snapshot id (None for an existing
+        # snapshot), the snapshots created, the (snapshot, account) pairs and
+        # YTD figures seen, and the touched snapshots
+        self.chunk_snapshots = {}
+        self.new_snapshots = set()
+        self.chunk_balances = set()
+        self.chunk_ytd = {}
+        self.dirty_snapshots = set()
+
+        self.bytes_read = [0]
+        self.rows = 0
+        self.balances = 0
+        self.errors = []
+        self.error_count = 0
+        self._pending = []
+        # (row number, account name) of each pending balance, for duplicate errors
+        self._pending_rows = []
+
+    def run(self, path):
+        """Import the file at ``path``, committing progress after every chunk"""
+        self.record.status = 'running'
+        self.record.started_at = datetime.utcnow()
+        self.record.total_bytes = os.path.getsize(path)
+        db.session.commit()
+
+        try:
+            with open(path, 'rb') as f:
+                lines = codecs.iterdecode(counted_lines(f, self.bytes_read), 'utf-8-sig')
+                for row in csv.DictReader(lines):
+                    self.rows += 1
+                    try:
+                        self.add({key.strip(): (value or '').strip() for key, value in row.items() if key})
+                    except ValueError as e:
+                        self.error(str(e))
+                    if len(self._pending) >= self.chunk_size:
+                        self.flush()
+            self.flush(status='completed')
+        except Exception as e:
+            db.session.rollback()
+            self.reset_chunk()
+            # flush(status='failed') deletes the snapshots committed by earlier chunks
+            self.error(f"Import failed: {e}", row=False)
+            self.flush(status='failed')
+            raise
+
+    def error(self, message, row=True):
+        """Record an error for the current row, another row number, or none (row=False)"""
+        self.error_count += 1
+        if row is True:
+            row = self.rows
+        if len(self.errors) < MAX_RECORDED_ERRORS:
+            self.errors.append(f"Row {row}: {message}" if row else message)
+
+    def add(self, row):
+        store = self.stores.match(row.get('store', ''))
+        if not store:
+            self.error(f"Store not found: {row.get('store', '')}")
+            return
+        snapshot_date = parse_snapshot_date(row.get('snapshot_date'))
+        amount = parse_amount(row.get('balance'))
+
+        key = (store["id"], snapshot_date.date())
+        snapshot_id = self.find_snapshot(key)
+        if snapshot_id is None:
+            if key not in self.skipped_keys:
+                self.skipped_keys.add(key)
+                self.error(f"Completed snapshot already exists for {store['name']} on {key[1].isoformat()}")
+            return
+
+        account = self.account(store, row)
+        if account is None:
+            return
+        account_id, _ = account
+
+        if snapshot_id is False:
+            snapshot_id = self.create_snapshot(key, snapshot_date)
+        elif (snapshot_id, account_id) in self.chunk_balances:
+            self.error(f"Duplicate balance for {row.get('account_name')}")
+            return
+        self.chunk_balances.add((snapshot_id, account_id))
+
+        for column in ('ytd_sales', 'ytd_profit'):
+            if row.get(column):
+                self.chunk_ytd.setdefault(snapshot_id, {})[column] = parse_amount(row[column])
+        self.dirty_snapshots.add(snapshot_id)
+
+        self._pending.append({"snapshot_id": snapshot_id, "account_id": account_id, "balance": amount})
+        self._pending_rows.append((self.rows, row.get('account_name')))
+
+    def account(self, store, row):
+        """(account id, category) for the row, creating the account if a type is given"""
+        account_name = row.get('account_name', '')
+        account = self.accounts.get((store["id"], account_name))
+        if account:
+            return account
+
+        account_type = self.account_types.get(row.get('account_type'))
+        if not account_type:
+            self.error(f"Account not found: {account_name} ({store['name']})")
+            return None
+
+        new_account = Account(
+            store_id=store["id"],
+            account_name=account_name,
+            account_type_id=account_type["id"],
+            is_active=False
+        )
+        db.session.add(new_account)
+        db.session.flush()
+        account = (new_account.id, account_type["category"])
+        self.accounts[(store["id"], account_name)] = account
+        return account
+
+    def find_snapshot(self, key):
+        """Snapshot id this import created for the key, None if another
+        completed (or importing) snapshot has the key, False if there is none yet"""
+        if key in self.chunk_snapshots:
+            return self.chunk_snapshots[key]
+        store_id, day = key
+        start = datetime.combine(day, datetime.min.time())
+        found = db.session.execute(
+            select(Snapshot.id, Snapshot.created_by).where(
+                Snapshot.store_id == store_id,
+                Snapshot.status.in_(('completed', IMPORTING)),
+                Snapshot.snapshot_date >= start,
+                Snapshot.snapshot_date < start + timedelta(days=1),
+            ).order_by(Snapshot.id).limit(1)
+        ).first()
+        if found is None:
+            return False
+        snapshot_id = found.id if found.created_by == self.marker else None
+        self.chunk_snapshots[key] = snapshot_id
+        return snapshot_id
+
+    def create_snapshot(self, key, snapshot_date):
+        snapshot = Snapshot(
+            store_id=key[0],
+            snapshot_date=snapshot_date,
+            created_by=self.marker,
+            notes=f"Imported from {self.record.filename}",
+            status=IMPORTING
+        )
+        db.session.add(snapshot)
+        db.session.flush()
+        self.chunk_snapshots[key] = snapshot.id
+        self.new_snapshots.add(snapshot.id)
+        self.snapshots_created += 1
+        return snapshot.id
+
+    def drop_earlier_duplicates(self):
+        """Drop pending balances whose snapshot and account an earlier chunk already inserted"""
+        continued = {balance["snapshot_id"] for balance in self._pending} - self.new_snapshots
+        if not continued:
+            return
+        inserted = set(db.session.execute(
+            select(AccountBalance.snapshot_id, AccountBalance.account_id).where(
+                AccountBalance.snapshot_id.in_(continued),
+                AccountBalance.account_id.in_({balance["account_id"] for balance in self._pending}),
+            )
+        ).all())
+        if not inserted:
+            return
+        pending = []
+        for balance, (row, account_name) in zip(self._pending, self._pending_rows):
+            if (balance["snapshot_id"], balance["account_id"]) in inserted:
+                self.error(f"Duplicate balance for {account_name}", row=row)
+            else:
+                pending.append(balance)
+        self._pending = pending
+
+    def imported(self):
+        """Filter for the snapshots this import created and has not published"""
+        return and_(Snapshot.id > self.last_existing_snapshot, Snapshot.created_by == self.marker)
+
+    def publish(self):
+        """Mark the imported snapshots completed and build their summaries"""
+        db.session.execute(
+            update(Snapshot).where(self.imported()).values(status='completed'),
+            execution_options={"synchronize_session": False}
+        )
+        refresh_summaries(select(Snapshot.id).where(self.imported()))
+        db.session.execute(
+            update(Snapshot).where(self.imported()).values(created_by='historical_import'),
+            execution_options={"synchronize_session": False}
+        )
+
+    def discard(self):
+        """Delete the snapshots (and balances) of a failed import"""
+        snapshot_ids = select(Snapshot.id).where(self.imported())
+        db.session.execute(
+            delete(AccountBalance).where(AccountBalance.snapshot_id.in_(snapshot_ids)),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.execute(delete(Snapshot).where(self.imported()), execution_options={"synchronize_session": False})
+        self.snapshots_created = 0
+        self.balances = 0
+
+    def reset_chunk(self):
+        self.chunk_snapshots = {}
+        self.new_snapshots = set()
+        self.chunk_balances = set()
+        self.chunk_ytd = {}
+        self.dirty_snapshots = set()
+        self._pending = []
+        self._pending_rows = []
+
+    def flush(self, status=None):
+        """Insert pending balances, recompute touched snapshot totals and record progress"""
+        if self._pending:
+            self.drop_earlier_duplicates()
+        if self._pending:
+            db.session.execute(insert(AccountBalance), self._pending)
+            self.balances += len(self._pending)
+
+        if self.dirty_snapshots:
+            # YTD figures from this chunk replace the stored ones; compute_totals()
+            # falls back to them since imported balances carry no sales or profit
+            snapshots = [
+                SimpleNamespace(
+                    id=snapshot.id,
+                    ytd_sales=self.chunk_ytd.get(snapshot.id, {}).get('ytd_sales', snapshot.ytd_sales),
+                    ytd_profit=self.chunk_ytd.get(snapshot.id, {}).get('ytd_profit', snapshot.ytd_profit),
+                )
+                for snapshot in db.session.execute(
+                    select(Snapshot.id, Snapshot.ytd_sales, Snapshot.ytd_profit).where(
+                        Snapshot.id.in_(self.dirty_snapshots)
+                    )
+                )
+            ]
+            rows = [{"id": snapshot_id, **columns} for snapshot_id, columns in compute_totals(snapshots).items()]
+            # Rows with different key sets are grouped by SQLAlchemy into separate executemany calls
+            db.session.execute(update(Snapshot), rows)
+
+        if status == 'completed':
+            self.publish()
+        elif status == 'failed':
+            self.discard()
+
+        record = self.record
+        record.processed_bytes = self.bytes_read[0]
+        record.rows_processed = self.rows
+        record.snapshots_created = self.snapshots_created
+        record.balances_created = self.balances
+        record.error_count = self.error_count
+        record.notes = "\n".join(self.errors) or None
+        if status:
+            record.status = status
+            record.completed_at = datetime.utcnow()
+        db.session.commit()
+        self.reset_chunk()
+
+        if self.progress:
+            self.progress(
+                record.processed_bytes / record.total_bytes if record.total_bytes else 0,
+                f"{self.rows} rows, {self.snapshots_created} snapshots"
+            )
+
+
+@job_runner.task("historical_import", pool="heavy")
+def historical_import_task(context, import_id, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import a spooled historical CSV and delete it afterwards"""
+    try:
+        importer = HistoricalSnapshotImporter(import_id, chunk_size, progress=context.progress)
+        importer.run(path)
+        return importer.record.to_dict()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@job_runner.task("account_import", pool="heavy")
+def account_import_task(context, path, mimetype, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import a spooled bulk account upload and delete it afterwards"""
+    try:
+        importer = AccountImporter(chunk_size)
+        with open(path, "rb") as f:
+            total_bytes = os.path.getsize(path)
+            for progress in importer.import_rows(iter_rows(f, mimetype)):
+                context.progress(
+                    f.tell() / total_bytes if total_bytes else 0,
+                    f"{progress['processed']} rows, chunk {progress['chunk']}"
+                )
+        return importer.summary()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,132 @@
+"""Per-request timing and SQL statement accounting.
+
+For every request this records the wall time, the number of SQL statements
+and the time spent executing them, and reports them in a ``Server-Timing``
+response header and a structured (JSON) log line on the ``src.requests``
+logger. With ``SQL_PROFILE`` enabled the slowest statements of each request
+are added to both.
+
+Statements are counted with SQLAlchemy cursor events on every engine, so
+queries issued by background jobs (no request context) are ignored. For
+streamed responses only the time until the response starts is measured.
+"""
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("src.requests")
+
+# Characters of SQL kept per statement in profile output
+SQL_PREVIEW_LENGTH = 200
+
+
+class RequestInstrumentation:
+    def __init__(self):
+        self.profile_sql = False
+        self.profile_top = 5
+        self._listening = False
+
+    def init_app(self, app):
+        self.profile_sql = bool(app.config.get("SQL_PROFILE"))
+        self.profile_top = int(app.config.get("SQL_PROFILE_TOP") or 5)
+
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+            event.listen(Engine, "handle_error", self._handle_error)
+            self._listening = True
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # SQLAlchemy events
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "request_timing" in g:
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._record_query(conn, statement)
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute; pop its start
+        # here so the next statement on this connection is not timed from it
+        if context.connection is not None:
+            self._record_query(context.connection, context.statement)
+
+    def _record_query(self, conn, statement):
+        if not (has_request_context() and "request_timing" in g):
+            return
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+
+        timing = g.request_timing
+        timing["queries"] += 1
+        timing["db_time"] += elapsed
+        if self.profile_sql:
+            timing["statements"].append((elapsed, statement))
+
+    # Request hooks
+
+    def _start(self):
+        g.request_timing = {
+            "start": time.perf_counter(),
+            "queries": 0,
+            "db_time": 0.0,
+            "statements": [],
+        }
+
+    def _finish(self, response):
+        timing = g.pop("request_timing", None)
+        if timing is None:
+            return response
+
+        duration_ms = (time.perf_counter() - timing["start"]) * 1000
+        db_ms = timing["db_time"] * 1000
+
+        server_timing = [
+            f"app;dur={duration_ms:.1f}",
+            f'db;dur={db_ms:.1f};desc="{timing["queries"]} queries"',
+        ]
+
+        record = {
+            "event": "request",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_queries": timing["queries"],
+            "db_ms": round(db_ms, 2),
+        }
+
+        if self.profile_sql and timing["statements"]:
+            slowest = sorted(timing["statements"], key=lambda item: item[0], reverse=True)[:self.profile_top]
+            record["slowest_statements"] = [
+                {"ms": round(elapsed * 1000, 2), "sql": " ".join(statement.split())[:SQL_PREVIEW_LENGTH]}
+                for elapsed, statement in slowest
+            ]
+            for index, (elapsed, statement) in enumerate(slowest, start=1):
+                # Header values must stay on one line and may not contain quotes
+                preview = " ".join(statement.split())[:60].replace('"', "'")
+                server_timing.append(f'sql{index};dur={elapsed * 1000:.1f};desc="{preview}"')
+
+        response.headers.add("Server-Timing", ", ".join(server_timing))
+        logger.info(json.dumps(record))
+        return response
+
+
+request_instrumentation = RequestInstrumentation()
@@ -0,0 +1,247 @@
+"""Background jobs for work that is too slow for a request thread.
+
+A job is a row in the ``jobs`` table plus a task function registered with
+``@job_runner.task``. ``enqueue()`` stores the row and hands it to the
+thread pool of the task's pool; the request returns right away and clients
+poll ``GET /api/jobs/<id>`` for progress and the result.
+
+Each pool has its own fixed number of threads (``JOB_POOLS``), so heavy
+imports and recalculations queue behind each other instead of taking over
+the database while the wizard is in use. Limits apply per worker process.
+
+Jobs run in the process that enqueued them. The row records that process
+as ``worker`` (host, pid and a random token, so a pid reused after a restart
+is a different worker) and a ``heartbeat_at`` that a background thread in
+the process refreshes every ``JOB_HEARTBEAT_INTERVAL`` seconds while it has
+jobs. When the process exits (a deploy, a crash, a gunicorn worker restart)
+the heartbeat stops; once it is older than ``JOB_HEARTBEAT_TIMEOUT``, the
+same thread in any other process runs ``recover()``, which fails the
+running jobs as interrupted and schedules the queued ones again.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, update
+
+from src.database import db
+from src.models.balance_sheet import Job
+
+INTERRUPTED = "Interrupted: the worker process running this job exited"
+
+# pool name -> number of worker threads, overridable with the JOB_POOLS setting
+DEFAULT_POOLS = {
+    "default": 2,
+    "heavy": 1,
+}
+
+DEFAULT_HEARTBEAT_INTERVAL = 10.0
+DEFAULT_HEARTBEAT_TIMEOUT = 60.0
+
+
+def parse_pools(value):
+    """Parse a JOB_POOLS setting such as "default=2,heavy=1" """
+    pools = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, size = item.split("=", 1)
+            pools[name.strip()] = max(1, int(size))
+    return pools
+
+
+class JobContext:
+    """Handle passed to a running task for reporting progress"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def progress(self, fraction, message=None):
+        """Record progress (0..1). Commits the current session."""
+        values = {"progress": round(min(max(fraction, 0), 1), 4)}
+        if message is not None:
+            values["message"] = message
+        db.session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+        db.session.commit()
+
+
+class JobRunner:
+    def __init__(self):
+        self.tasks = {}
+        self.pools = dict(DEFAULT_POOLS)
+        self.heartbeat_interval = DEFAULT_HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = DEFAULT_HEARTBEAT_TIMEOUT
+        self._executors = {}
+        self._lock = threading.Lock()
+        # Ids of the jobs this process has queued or is running
+        self._active = set()
+        self._worker = None
+        self._worker_pid = None
+        self._heartbeat_pid = None
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        self.pools.update(parse_pools(app.config.get("JOB_POOLS")))
+        self.heartbeat_interval = float(app.config.get("JOB_HEARTBEAT_INTERVAL") or DEFAULT_HEARTBEAT_INTERVAL)
+        self.heartbeat_timeout = float(app.config.get("JOB_HEARTBEAT_TIMEOUT") or DEFAULT_HEARTBEAT_TIMEOUT)
+        # Not at import time: the schema may not be migrated yet, and with
+        # gunicorn --preload threads started in the master do not survive the fork
+        app.before_request(self._ensure_heartbeat)
+
+    @property
+    def worker(self):
+        """This process's worker id, new after a fork"""
+        pid = os.getpid()
+        if self._worker_pid != pid:
+            self._worker_pid = pid
+            self._worker = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:12]}"
+            self._active = set()
+        return self._worker
+
+    def _ensure_heartbeat(self):
+        """Start the heartbeat thread once per process (also after a fork)"""
+        pid = os.getpid()
+        if self._heartbeat_pid == pid:
+            return
+        with self._lock:
+            if self._heartbeat_pid == pid:
+                return
+            self._heartbeat_pid = pid
+            threading.Thread(target=self._heartbeat_loop, name="jobs-heartbeat", daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self.app.app_context():
+                try:
+                    self.heartbeat()
+                    self.recover()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error("Job heartbeat failed: %s", e)
+                finally:
+                    db.session.remove()
+
+    def heartbeat(self):
+        """Mark this process's queued and running jobs as still owned"""
+        if not self._active:
+            return
+        db.session.execute(update(Job).where(
+            Job.worker == self.worker, Job.status.in_(('queued', 'running'))
+        ).values(heartbeat_at=datetime.utcnow()))
+        db.session.commit()
+
+    def recover(self, now=None):
+        """Settle the queued and running jobs whose worker stopped sending heartbeats.
+
+        A running job was cut off and is marked failed; a queued one never
+        started and is claimed and scheduled in this process. Claims are
+        conditional on the heartbeat that was read, so two processes
+        recovering at once do not both run a job. Returns the ids of
+        (failed, rescheduled) jobs.
+        """
+        now = now or datetime.utcnow()
+        stale = now - timedelta(seconds=self.heartbeat_timeout)
+        orphans = db.session.execute(
+            select(Job.id, Job.kind, Job.status, Job.heartbeat_at).where(
+                Job.status.in_(('queued', 'running')),
+                or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale),
+                or_(Job.worker.is_(None), Job.worker != self.worker),
+            )
+        ).all()
+        failed, rescheduled = [], []
+        for job in orphans:
+            seen = Job.heartbeat_at.is_(None) if job.heartbeat_at is None else Job.heartbeat_at == job.heartbeat_at
+            claim = update(Job).where(Job.id == job.id, Job.status == job.status, seen)
+            if job.status == 'queued' and job.kind in self.tasks:
+                if db.session.execute(claim.values(worker=self.worker, heartbeat_at=now)).rowcount:
+                    rescheduled.append((job.id, self.tasks[job.kind][1]))
+            elif db.session.execute(claim.values(
+                status='failed', error=INTERRUPTED, finished_at=now
+            )).rowcount:
+                failed.append(job.id)
+        db.session.commit()
+
+        for job_id, pool in rescheduled:
+            self._schedule(job_id, pool)
+        if orphans:
+            self.app.logger.warning(
+                "Recovered orphaned jobs: %d failed, %d rescheduled", len(failed), len(rescheduled)
+            )
+        return failed, [job_id for job_id, _ in rescheduled]
+
+    def task(self, kind, pool="default"):
+        """Register a function ``fn(context, **params)`` as the task for a job kind"""
+        def decorator(fn):
+            self.tasks[kind] = (fn, pool)
+            return fn
+        return decorator
+
+    def executor(self, pool):
+        with self._lock:
+            if pool not in self._executors:
+                self._executors[pool] = ThreadPoolExecutor(
+                    max_workers=self.pools.get(pool, 1),
+                    thread_name_prefix=f"jobs-{pool}"
+                )
+            return self._executors[pool]
+
+    def enqueue(self, kind, params=None):
+        """Persist a queued job, schedule it and return the Job row"""
+        if kind not in self.tasks:
+            raise ValueError(f"Unknown job kind: {kind}")
+        _, pool = self.tasks[kind]
+
+        job = Job(
+            kind=kind, pool=pool, status='queued', params=json.dumps(params or {}),
+            worker=self.worker, heartbeat_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self._schedule(job.id, pool)
+        return job
+
+    def _schedule(self, job_id, pool):
+        self._ensure_heartbeat()
+        self._active.add(job_id)
+        self.executor(pool).submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                job = db.session.get(Job, job_id)
+                fn, _ = self.tasks[job.kind]
+                params = json.loads(job.params) if job.params else {}
+
+                job.status = 'running'
+                job.started_at = datetime.utcnow()
+                db.session.commit()
+
+                result = fn(JobContext(job_id), **params)
+
+                job = db.session.get(Job, job_id)
+                job.status = 'completed'
+                job.progress = 1
+                job.result = json.dumps(result, default=str) if result is not None else None
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error("Job %s failed: %s\n%s", job_id, e, traceback.format_exc())
+                db.session.execute(update(Job).where(Job.id == job_id).values(
+                    status='failed', error=str(e), finished_at=datetime.utcnow()
+                ))
+                db.session.commit()
+            finally:
+                self._active.discard(job_id)
+                db.session.remove()
+
+
+job_runner = JobRunner()
@@ -6,9 +6,16 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.database import db
+from src.cache import reference_cache, balance_sheet_cache
+from src.jobs import job_runner
+from src.instrumentation import request_instrumentation
+from src.metrics import metrics
+from src.sqlite_profile import sqlite_profile, format_report
+from src.write_queue import write_queue
 from src.routes.user import user_bp
 from src.routes.api import api_bp
 from src.routes.data_import import import_bp
+from src.routes.jobs import jobs_bp
 from src.routes.wizard import wizard_bp  # Import the new wizard routes
 from src.models.balance_sheet import Store, Account, AccountType, Bank, Snapshot, AccountBalance, WizardSession, HistoricalImport
 
@@ -19,17 +26,58 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 CORS(app)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# SQLite PRAGMAs run on every connection: "tuned" (WAL, busy timeout, ...) or "default"
+app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'tuned')
+# Per-PRAGMA overrides, e.g. "cache_size=-32000,mmap_size=0"
+app.config['SQLITE_PRAGMAS'] = os.environ.get('SQLITE_PRAGMAS', '')
+app.config['SQLITE_POOL_SIZE'] = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+app.config['SQLITE_MAX_OVERFLOW'] = int(os.environ.get('SQLITE_MAX_OVERFLOW', 20))
+
+# Cache version stamps live next to the database so every worker process sees them
+app.config['CACHE_STAMP_DIR'] = os.environ.get('CACHE_STAMP_DIR', os.path.join(os.path.dirname(__file__), 'database'))
+app.config['BALANCE_SHEET_CACHE_SIZE'] = int(os.environ.get('BALANCE_SHEET_CACHE_SIZE', 256))
+# Accounts committed per transaction by the bulk import
+app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+# Background job threads per pool, e.g. "default=2,heavy=1"
+app.config['JOB_POOLS'] = os.environ.get('JOB_POOLS', '')
+# Seconds between job heartbeats, and without one before a job counts as orphaned
+app.config['JOB_HEARTBEAT_INTERVAL'] = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 10))
+app.config['JOB_HEARTBEAT_TIMEOUT'] = float(os.environ.get('JOB_HEARTBEAT_TIMEOUT', 60))
+# List the slowest SQL statements of each request in logs and Server-Timing
+app.config['SQL_PROFILE'] = os.environ.get('SQL_PROFILE', 'false').lower() == 'true'
+app.config['SQL_PROFILE_TOP'] = int(os.environ.get('SQL_PROFILE_TOP', 5))
+# Send draft and snapshot writes through one group-committing writer thread per process
+app.config['WRITE_QUEUE'] = os.environ.get('WRITE_QUEUE', 'false').lower() == 'true'
+app.config['WRITE_QUEUE_MAX_BATCH'] = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 32))
+app.config['WRITE_QUEUE_MAX_WAIT_MS'] = float(os.environ.get('WRITE_QUEUE_MAX_WAIT_MS', 2))
+# Per-process metric files that GET /metrics adds up
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR', os.path.join(os.path.dirname(__file__), 'database', 'metrics'))
 
 # Initialize database
+sqlite_profile.init_app(app)
 db.init_app(app)
+reference_cache.init_app(app)
+balance_sheet_cache.init_app(app, size_setting='BALANCE_SHEET_CACHE_SIZE')
+job_runner.init_app(app)
+write_queue.init_app(app)
+request_instrumentation.init_app(app)
+metrics.init_app(app)
+metrics.watch_cache('reference', reference_cache)
+metrics.watch_cache('balance_sheet', balance_sheet_cache)
+metrics.collector('write_queue_batches_total', lambda: {(): write_queue.batches})
+metrics.collector('write_queue_writes_total', lambda: {(): write_queue.writes})
 
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api/users')
 app.register_blueprint(api_bp, url_prefix='/api')
 app.register_blueprint(wizard_bp, url_prefix='/api/wizard')  # Use different prefix to avoid conflicts
 app.register_blueprint(import_bp, url_prefix='/import')
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -57,6 +105,13 @@ if __name__ == '__main__':
         db.create_all()
         print("✓ Database tables created successfully")
         
+        # Bring indexes and columns on existing databases up to date
+        from src.migrations import run_migrations, latest_version
+        for version, description in run_migrations(db.engine):
+            print(f"✓ Applied migration {version}: {description}")
+        print(f"✓ Database schema at version {latest_version()}")
+        print(f"✓ SQLite settings: {format_report(sqlite_profile.report(db.engine))}")
+        
         # Auto-seed if no stores exist
         from src.models.balance_sheet import Store
         if Store.query.count() == 0:
@@ -0,0 +1,338 @@
+"""Prometheus text-format metrics generated by the app itself.
+
+Each worker process keeps its counters, gauges and histograms in memory and
+writes them to ``<METRICS_DIR>/metrics_<pid>.json`` at most once per
+``FLUSH_INTERVAL`` seconds. ``GET /metrics`` adds up the files of every
+process, so totals stay correct under gunicorn with several workers. Files
+of processes that exited are deleted, so metrics restart from zero with the
+app and a replaced worker's counters drop out of the totals (Prometheus
+reads the drop as a counter reset).
+
+Exposed series:
+    http_requests_total{method,route,status}
+    http_request_duration_seconds{method,route}       histogram
+    http_requests_in_flight                           gauge
+    db_queries_per_request{route}                     histogram
+    db_query_duration_seconds                         histogram
+    sqlite_locked_errors_total                        statements that failed with "database is locked"
+    cache_requests_total{cache,result}                hits and misses of the in-process caches
+    cache_hit_ratio{cache}                            gauge
+    write_queue_batches_total                         transactions committed by the write queue
+    write_queue_writes_total                          requests committed in those transactions
+"""
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+FLUSH_INTERVAL = 1.0
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HELP = {
+    "http_requests_total": ("counter", "HTTP requests by route and status"),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route"),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being served"),
+    "db_queries_per_request": ("histogram", "SQL statements executed per request"),
+    "db_query_duration_seconds": ("histogram", "SQL statement execution time"),
+    "sqlite_locked_errors_total": ("counter", "SQL statements that failed with database is locked"),
+    "cache_requests_total": ("counter", "In-process cache lookups by result"),
+    "cache_hit_ratio": ("gauge", "In-process cache hit ratio"),
+    "write_queue_batches_total": ("counter", "Group commits made by the write queue"),
+    "write_queue_writes_total": ("counter", "Requests committed by the write queue"),
+}
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.directory = None
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._buckets = {}
+        # (counter name, callable returning {labels tuple: value}), sampled at flush time
+        self._collectors = []
+        self._last_flush = 0.0
+        self._dirty = False
+        self._flusher_pid = None
+
+    def init_app(self, app):
+        self.directory = app.config.get("METRICS_DIR") or os.path.join(app.instance_path, "metrics")
+        os.makedirs(self.directory, exist_ok=True)
+        # A file under our pid was left by an earlier process that had it
+        self.remove_file(os.getpid())
+
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(Engine, "handle_error", self._handle_error)
+
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._end_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    # Recording
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, label_key(labels or {}))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[(name, label_key(labels or {}))] = value
+
+    def add_gauge(self, name, value, labels=None):
+        key = (name, label_key(labels or {}))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, value, buckets, labels=None):
+        key = (name, label_key(labels or {}))
+        with self._lock:
+            self._buckets[name] = buckets
+            counts = self._histograms.get(key)
+            if counts is None:
+                # one count per bucket, +Inf, then sum
+                counts = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[len(buckets)] += 1
+            counts[-1] += value
+
+    def collector(self, name, fn):
+        """Register ``fn() -> {labels tuple: value}``, sampled as counter ``name``"""
+        self._collectors.append((name, fn))
+
+    def watch_cache(self, name, cache):
+        """Export the hit/miss counts of a cache with a ``stats()`` method"""
+        self.collector("cache_requests_total", lambda: {
+            (("cache", name), ("result", result)): count
+            for result, count in cache.stats().items()
+        })
+
+    # Request and SQL hooks
+
+    def _start_request(self):
+        self._ensure_flusher()
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        self.add_gauge("http_requests_in_flight", 1)
+
+    def _end_request(self, exc=None):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return
+        self.add_gauge("http_requests_in_flight", -1)
+
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = getattr(g, "metrics_status", 500 if exc else 200)
+        self.inc("http_requests_total", {"method": request.method, "route": route, "status": str(status)})
+        self.observe(
+            "http_request_duration_seconds", time.perf_counter() - start,
+            REQUEST_BUCKETS, {"method": request.method, "route": route}
+        )
+        self.observe("db_queries_per_request", g.pop("metrics_queries", 0), QUERY_COUNT_BUCKETS, {"route": route})
+        self.flush()
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        self.observe("db_query_duration_seconds", time.perf_counter() - starts.pop(), QUERY_BUCKETS)
+        if has_request_context() and "metrics_queries" in g:
+            g.metrics_queries += 1
+
+    def _handle_error(self, context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        if "locked" in str(context.original_exception).lower():
+            self.inc("sqlite_locked_errors_total")
+
+    # Multi-process state
+
+    def snapshot(self):
+        """This process's metrics as JSON-serializable lists"""
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            gauges = [[name, dict(labels), value] for (name, labels), value in self._gauges.items()]
+            histograms = [
+                [name, dict(labels), list(self._buckets[name]), list(counts)]
+                for (name, labels), counts in self._histograms.items()
+            ]
+        for name, fn in self._collectors:
+            for labels, value in fn().items():
+                counters.append([name, dict(labels), value])
+        return {"pid": os.getpid(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def path_for(self, pid):
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def remove_file(self, pid):
+        try:
+            os.remove(self.path_for(pid))
+        except OSError:
+            pass
+
+    def flush(self, force=False):
+        """Write this process's metrics file, at most once per FLUSH_INTERVAL unless forced"""
+        if self.directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            # The background flusher writes it once the interval has passed
+            self._dirty = True
+            return
+        self._last_flush = now
+        self._dirty = False
+
+        path = self.path_for(os.getpid())
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _ensure_flusher(self):
+        """Start the background flusher once per process (also after a fork)"""
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        self._flusher_pid = pid
+        threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self._dirty:
+                try:
+                    self.flush(force=True)
+                except OSError:
+                    pass
+
+    def load_all(self):
+        """Snapshots of every process, using live state for this one"""
+        own_pid = os.getpid()
+        snapshots = [self.snapshot()]
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = data.get("pid")
+            if pid == own_pid:
+                continue
+            if not pid_alive(pid):
+                self.remove_file(pid)
+                continue
+            snapshots.append(data)
+        return snapshots
+
+    # Exposition
+
+    def render(self):
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for data in self.load_all():
+            for name, labels, value in data["counters"]:
+                key = (name, label_key(labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in data["gauges"]:
+                key = (name, label_key(labels))
+                gauges[key] = gauges.get(key, 0) + value
+            for name, labels, buckets, counts in data["histograms"]:
+                key = (name, label_key(labels), tuple(buckets))
+                existing = histograms.get(key)
+                histograms[key] = counts if existing is None else [a + b for a, b in zip(existing, counts)]
+
+        # Hit ratios from the aggregated cache counters
+        lookups = {}
+        for (name, labels), value in counters.items():
+            if name == "cache_requests_total":
+                labels = dict(labels)
+                totals = lookups.setdefault(labels["cache"], [0, 0])
+                totals[0 if labels["result"] == "hit" else 1] += value
+        for cache, (hits, misses) in lookups.items():
+            gauges[("cache_hit_ratio", (("cache", cache),))] = hits / (hits + misses) if hits + misses else 0
+
+        gauges.setdefault(("http_requests_in_flight", ()), 0)
+
+        # name -> [(labels, lines)], written out per label set so a histogram's
+        # buckets stay in bound order, followed by +Inf, _sum and _count
+        series = {}
+        for (name, labels), value in list(counters.items()) + list(gauges.items()):
+            series.setdefault(name, []).append((labels, [f"{name}{format_labels(labels)} {format_value(value)}"]))
+        for (name, labels, buckets), counts in histograms.items():
+            lines = [
+                f"{name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {count}"
+                for bound, count in zip(buckets, counts)
+            ]
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {counts[len(buckets)]}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(counts[-1])}")
+            lines.append(f"{name}_count{format_labels(labels)} {counts[len(buckets)]}")
+            series.setdefault(name, []).append((labels, lines))
+
+        output = []
+        for name in sorted(series):
+            kind, text = HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {text}")
+            output.append(f"# TYPE {name} {kind}")
+            for _, lines in sorted(series[name], key=lambda item: item[0]):
+                output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+metrics = MetricsRegistry()
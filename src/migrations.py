@@ -0,0 +1,278 @@
+"""Versioned schema migrations for existing SQLite databases.
+
+``db.create_all()`` only creates missing tables, so indexes and columns added
+to the models later never reach databases created by an older version of the
+app. Each migration below is applied once, in order, and the schema version is
+tracked in SQLite's ``PRAGMA user_version``. Every step is written so it can
+also run against a fresh database that ``create_all()`` already brought up to
+date.
+
+Usage:
+    python -m src.migrations            # upgrade src/database/app.db
+    python -m src.migrations --check    # upgrade, then verify query plans
+"""
+import re
+import sqlite3
+import sys
+
+from sqlalchemy import text
+
+
+def add_columns(table, columns):
+    """Step adding (name, DDL type) columns that the table does not have yet"""
+    def step(connection):
+        existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        for name, ddl in columns:
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+    return step
+
+
+def drop_columns(table, names):
+    """Step dropping columns that the table still has (needs SQLite 3.35+; older versions keep them)"""
+    def step(connection):
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            return
+        existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        for name in names:
+            if name in existing:
+                connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {name}"))
+    return step
+
+
+def create_snapshot_summaries(connection):
+    from src.models.balance_sheet import SnapshotSummary
+
+    SnapshotSummary.__table__.create(connection, checkfirst=True)
+
+
+def backfill_snapshot_summaries(connection):
+    """(Re)build the summary of every completed snapshot"""
+    from sqlalchemy import select
+    from src.models.balance_sheet import Snapshot
+    from src.summaries import refresh_summaries
+
+    refresh_summaries(select(Snapshot.id).where(Snapshot.status == 'completed'), connection)
+
+
+def classify_account_types(connection):
+    """Fill in section and liquidity of account types that have none"""
+    from src.classification import default_classification
+
+    rows = connection.execute(text(
+        "SELECT id, name, category FROM account_types WHERE section IS NULL OR liquidity IS NULL"
+    )).fetchall()
+    for account_type_id, name, category in rows:
+        connection.execute(
+            text("UPDATE account_types SET section = :section, liquidity = :liquidity WHERE id = :id"),
+            {"id": account_type_id, **default_classification(name, category)}
+        )
+
+
+def clear_planner_statistics(connection):
+    """Forget ANALYZE results, which migrations 1 and 2 took from a nearly empty database.
+
+    With stale sqlite_stat1 rows the planner scans whole indexes for the hot
+    queries; without any it falls back to its defaults, which use them as
+    intended (see ``--check``).
+    """
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    )).first()
+    if exists:
+        connection.execute(text("DELETE FROM sqlite_stat1"))
+
+
+# (version, description, steps) - a step is either a SQL string or a callable
+# taking the open connection, for changes that need to inspect the schema.
+MIGRATIONS = [
+    (1, "Secondary indexes for snapshot, balance and account filters", [
+        "CREATE INDEX IF NOT EXISTS ix_snapshots_store_status_date "
+        "ON snapshots (store_id, status, snapshot_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_snapshots_drafts_updated "
+        "ON snapshots (updated_at) WHERE status = 'draft'",
+        "CREATE INDEX IF NOT EXISTS ix_account_balances_snapshot "
+        "ON account_balances (snapshot_id, account_id)",
+        "CREATE INDEX IF NOT EXISTS ix_account_balances_account "
+        "ON account_balances (account_id)",
+        "CREATE INDEX IF NOT EXISTS ix_accounts_store_name "
+        "ON accounts (store_id, account_name)",
+        "CREATE INDEX IF NOT EXISTS ix_accounts_type_active "
+        "ON accounts (account_type_id, is_active)",
+    ]),
+    (2, "Covering index for per-account balance history", [
+        "CREATE INDEX IF NOT EXISTS ix_account_balances_account_snapshot "
+        "ON account_balances (account_id, snapshot_id, balance)",
+        # Superseded by the covering index, which starts with account_id
+        "DROP INDEX IF EXISTS ix_account_balances_account",
+    ]),
+    (3, "Progress columns for historical imports", [
+        add_columns("historical_imports", [
+            ("total_bytes", "INTEGER DEFAULT 0"),
+            ("processed_bytes", "INTEGER DEFAULT 0"),
+            ("rows_processed", "INTEGER DEFAULT 0"),
+            ("snapshots_created", "INTEGER DEFAULT 0"),
+            ("balances_created", "INTEGER DEFAULT 0"),
+            ("error_count", "INTEGER DEFAULT 0"),
+            ("started_at", "DATETIME"),
+            ("completed_at", "DATETIME"),
+        ]),
+    ]),
+    (4, "Optimistic-locking version columns for snapshots and accounts", [
+        add_columns("snapshots", [("version", "INTEGER NOT NULL DEFAULT 1")]),
+        add_columns("accounts", [("version", "INTEGER NOT NULL DEFAULT 1")]),
+    ]),
+    (5, "Per-snapshot section subtotals", [
+        create_snapshot_summaries,
+    ]),
+    (6, "Balance sheet section and liquidity on account types", [
+        add_columns("account_types", [("section", "VARCHAR(50)"), ("liquidity", "VARCHAR(20)")]),
+        classify_account_types,
+        # Summaries are built from the stored sections, which need the columns above
+        backfill_snapshot_summaries,
+    ]),
+    (7, "Drop planner statistics gathered by earlier migrations", [
+        clear_planner_statistics,
+    ]),
+    (8, "Owning worker process of background jobs", [
+        add_columns("jobs", [("worker_pid", "INTEGER")]),
+    ]),
+    (9, "Worker token and heartbeat of background jobs", [
+        add_columns("jobs", [("worker", "VARCHAR(100)"), ("heartbeat_at", "DATETIME")]),
+        # Replaced by the worker token; a pid can be reused after a restart
+        drop_columns("jobs", ["worker_pid"]),
+    ]),
+]
+
+# (name, sql, params, table, access, index) for the queries behind the
+# dashboard, wizard and import endpoints: the plan must read ``table`` (as
+# named in the query) with a ``SEARCH`` or ``SCAN`` step through ``index``,
+# and may not scan any table otherwise.
+HOT_QUERIES = [
+    (
+        "latest snapshot per store",
+        "SELECT id FROM snapshots WHERE store_id = :store_id AND status = 'completed' "
+        "ORDER BY snapshot_date DESC, id DESC LIMIT 1",
+        {"store_id": 1},
+        "snapshots", "SEARCH", "ix_snapshots_store_status_date",
+    ),
+    (
+        # A scan of the partial index only visits drafts
+        "draft list",
+        "SELECT id FROM snapshots WHERE status = 'draft' ORDER BY updated_at DESC",
+        {},
+        "snapshots", "SCAN", "ix_snapshots_drafts_updated",
+    ),
+    (
+        "balances for snapshot",
+        "SELECT account_id, balance FROM account_balances WHERE snapshot_id = :snapshot_id",
+        {"snapshot_id": 1},
+        "account_balances", "SEARCH", "ix_account_balances_snapshot",
+    ),
+    (
+        "balances for account",
+        "SELECT id FROM account_balances WHERE account_id = :account_id LIMIT 1",
+        {"account_id": 1},
+        "account_balances", "SEARCH", "ix_account_balances_account_snapshot",
+    ),
+    (
+        "account balance history",
+        "SELECT s.snapshot_date, b.balance FROM account_balances b "
+        "JOIN snapshots s ON s.id = b.snapshot_id "
+        "WHERE b.account_id = :account_id AND s.status = 'completed' "
+        "ORDER BY s.snapshot_date, s.id",
+        {"account_id": 1},
+        "b", "SEARCH", "ix_account_balances_account_snapshot",
+    ),
+    (
+        "account by store and name",
+        "SELECT id FROM accounts WHERE store_id = :store_id AND account_name = :account_name",
+        {"store_id": 1, "account_name": ""},
+        "accounts", "SEARCH", "ix_accounts_store_name",
+    ),
+    (
+        "active accounts by type",
+        "SELECT id FROM accounts WHERE account_type_id = :account_type_id AND is_active = 1",
+        {"account_type_id": 1},
+        "accounts", "SEARCH", "ix_accounts_type_active",
+    ),
+]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def run_migrations(engine):
+    """Apply every pending migration and return the list of versions applied"""
+    applied = []
+    with engine.begin() as connection:
+        current = get_schema_version(connection)
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.execute(text(step))
+            # PRAGMA does not accept bound parameters
+            connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+            applied.append((version, description))
+    return applied
+
+
+def plan_uses_index(steps, table, access, index_name):
+    """True if the plan reads ``table`` through the index and scans nothing else"""
+    expected = re.compile(rf"^{access} {re.escape(table)} USING (COVERING )?INDEX {re.escape(index_name)}\b")
+    if not any(expected.match(step) for step in steps):
+        return False
+    return not any(step.startswith("SCAN ") and not expected.match(step) for step in steps)
+
+
+def check_query_plans(engine):
+    """Run EXPLAIN QUERY PLAN for each hot query.
+
+    Returns a list of (name, expected index, plan detail, ok) tuples.
+    """
+    results = []
+    with engine.connect() as connection:
+        for name, sql, params, table, access, index_name in HOT_QUERIES:
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+            steps = [row[-1] for row in plan]
+            results.append((name, index_name, "; ".join(steps), plan_uses_index(steps, table, access, index_name)))
+    return results
+
+
+def main(argv):
+    from src.main import app
+    from src.database import db
+    from src.sqlite_profile import sqlite_profile, format_report
+
+    with app.app_context():
+        db.create_all()
+        for version, description in run_migrations(db.engine):
+            print(f"✓ Applied migration {version}: {description}")
+        print(f"✓ Schema at version {get_schema_version(db.session.connection())}")
+        print(f"✓ SQLite settings: {format_report(sqlite_profile.report(db.engine))}")
+
+        if "--check" not in argv:
+            return 0
+
+        failures = 0
+        for name, index_name, detail, ok in check_query_plans(db.engine):
+            print(f"{'✓' if ok else '✗'} {name}: {detail}")
+            if not ok:
+                failures += 1
+        if failures:
+            print(f"✗ {failures} hot queries are not using their index")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
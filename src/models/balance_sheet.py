@@ -1,5 +1,5 @@
 from src.database import db
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Numeric, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from decimal import Decimal
@@ -52,6 +52,9 @@ class AccountType(db.Model):
     name = Column(String(100), nullable=False)
     category = Column(String(50), nullable=False)  # 'Asset' or 'Liability'
     sort_order = Column(Integer, default=0)
+    # Balance sheet classification, see src/classification.py
+    section = Column(String(50), nullable=True)
+    liquidity = Column(String(20), nullable=True)  # 'current' or 'long_term'
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -63,6 +66,8 @@ class AccountType(db.Model):
             'name': self.name,
             'category': self.category,
             'sort_order': self.sort_order,
+            'section': self.section,
+            'liquidity': self.liquidity,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -88,6 +93,10 @@ class Bank(db.Model):
 
 class Account(db.Model):
     __tablename__ = 'accounts'
+    __table_args__ = (
+        Index('ix_accounts_store_name', 'store_id', 'account_name'),
+        Index('ix_accounts_type_active', 'account_type_id', 'is_active'),
+    )
     id = Column(Integer, primary_key=True)
     store_id = Column(Integer, ForeignKey('stores.id'), nullable=False)
     account_type_id = Column(Integer, ForeignKey('account_types.id'), nullable=False)
@@ -97,6 +106,8 @@ class Account(db.Model):
     available_credit = Column(Numeric(10, 2), default=0.00)
     total_credit = Column(Numeric(10, 2), default=0.00)
     is_active = Column(Boolean, default=True)
+    # Optimistic lock: edits run as UPDATE ... SET version = version + 1 WHERE version = ?
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -111,6 +122,7 @@ class Account(db.Model):
             'available_credit': float(self.available_credit) if self.available_credit is not None else None,
             'total_credit': float(self.total_credit) if self.total_credit is not None else None,
             'is_active': self.is_active,
+            'version': self.version,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'account_type': self.account_type.to_dict() if self.account_type else None,
@@ -119,6 +131,10 @@ class Account(db.Model):
 
 class Snapshot(db.Model):
     __tablename__ = 'snapshots'
+    __table_args__ = (
+        Index('ix_snapshots_store_status_date', 'store_id', 'status', 'snapshot_date', 'id'),
+        Index('ix_snapshots_drafts_updated', 'updated_at', sqlite_where=text("status = 'draft'")),
+    )
     id = Column(Integer, primary_key=True)
     store_id = Column(Integer, ForeignKey('stores.id'), nullable=False)
     snapshot_date = Column(DateTime, nullable=False)
@@ -131,6 +147,8 @@ class Snapshot(db.Model):
     created_by = Column(String(100), default='system')
     notes = Column(Text, nullable=True)
     status = Column(String(50), default='draft')
+    # Optimistic lock: edits run as UPDATE ... SET version = version + 1 WHERE version = ?
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -150,6 +168,7 @@ class Snapshot(db.Model):
             'created_by': self.created_by,
             'notes': self.notes,
             'status': self.status,
+            'version': self.version,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'store': self.store.to_dict() if self.store else None
@@ -157,6 +176,11 @@ class Snapshot(db.Model):
 
 class AccountBalance(db.Model):
     __tablename__ = 'account_balances'
+    __table_args__ = (
+        Index('ix_account_balances_snapshot', 'snapshot_id', 'account_id'),
+        # Covers the per-account history lookups (balance read from the index)
+        Index('ix_account_balances_account_snapshot', 'account_id', 'snapshot_id', 'balance'),
+    )
     id = Column(Integer, primary_key=True)
     snapshot_id = Column(Integer, ForeignKey('snapshots.id'), nullable=False)
     account_id = Column(Integer, ForeignKey('accounts.id'), nullable=False)
@@ -190,6 +214,18 @@ class AccountBalance(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
+class SnapshotSummary(db.Model):
+    """Section subtotals of a completed snapshot, maintained by src/summaries.py"""
+    __tablename__ = 'snapshot_summaries'
+    snapshot_id = Column(Integer, ForeignKey('snapshots.id'), primary_key=True)
+    bank_accounts = Column(Numeric(12, 2), nullable=False, default=0)
+    merchant_accounts = Column(Numeric(12, 2), nullable=False, default=0)
+    inventory = Column(Numeric(12, 2), nullable=False, default=0)
+    other_assets = Column(Numeric(12, 2), nullable=False, default=0)
+    current_liabilities = Column(Numeric(12, 2), nullable=False, default=0)
+    long_term = Column(Numeric(12, 2), nullable=False, default=0)
+    balance_count = Column(Integer, nullable=False, default=0)
+
 class WizardSession(db.Model):
     __tablename__ = 'wizard_sessions'
     id = Column(Integer, primary_key=True)
@@ -234,6 +270,15 @@ class HistoricalImport(db.Model):
     import_date = Column(DateTime, default=datetime.utcnow)
     status = Column(String(50), default='pending')
     notes = Column(Text, nullable=True)
+    # Progress, updated after every committed chunk
+    total_bytes = Column(Integer, default=0)
+    processed_bytes = Column(Integer, default=0)
+    rows_processed = Column(Integer, default=0)
+    snapshots_created = Column(Integer, default=0)
+    balances_created = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
 
     def to_dict(self):
         return {
@@ -241,5 +286,52 @@ class HistoricalImport(db.Model):
             'filename': self.filename,
             'import_date': self.import_date.isoformat(),
             'status': self.status,
-            'notes': self.notes
+            'notes': self.notes,
+            'total_bytes': self.total_bytes,
+            'processed_bytes': self.processed_bytes,
+            'progress': round(self.processed_bytes / self.total_bytes, 4) if self.total_bytes else 0,
+            'rows_processed': self.rows_processed,
+            'snapshots_created': self.snapshots_created,
+            'balances_created': self.balances_created,
+            'error_count': self.error_count,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_created', 'status', 'created_at'),
+    )
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    pool = Column(String(50), nullable=False, default='default')
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    params = Column(Text, nullable=True)  # JSON
+    progress = Column(Numeric(5, 4), default=0)
+    message = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    # Process whose thread pool holds the job (host:pid:token) and its last
+    # heartbeat; jobs whose heartbeat stops are recovered (see src/jobs.py)
+    worker = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'pool': self.pool,
+            'status': self.status,
+            'params': json.loads(self.params) if self.params else {},
+            'progress': float(self.progress) if self.progress is not None else 0,
+            'message': self.message,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
         }
@@ -0,0 +1,90 @@
+"""Keyset pagination and streamed responses for snapshot listings.
+
+Snapshots are listed newest first, ordered by (snapshot_date DESC, id DESC).
+A cursor encodes the (snapshot_date, id) of the last row of a page, and the
+next page continues strictly after it, so pages stay stable while new
+snapshots are being written and no OFFSET scan is needed.
+"""
+import base64
+from datetime import datetime
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import and_, desc, or_
+
+# Rows fetched from the database cursor per batch when streaming
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(snapshot_date, snapshot_id):
+    raw = f"{snapshot_date.isoformat()}|{snapshot_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (snapshot_date, id) from a cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, id_part = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(value, default, maximum):
+    if value is None:
+        return default
+    return max(1, min(int(value), maximum))
+
+
+def keyset_order(query, date_column, id_column, cursor=None):
+    """Order newest first and skip everything up to and including the cursor row"""
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            date_column < cursor_date,
+            and_(date_column == cursor_date, id_column < cursor_id)
+        ))
+    return query.order_by(desc(date_column), desc(id_column))
+
+
+def fetch_page(query, limit, date_of, id_of):
+    """Fetch one page and the cursor for the next one (None on the last page)"""
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(date_of(rows[-1]), id_of(rows[-1])) if has_more and rows else None
+    return rows, next_cursor
+
+
+def wants_stream():
+    """True when the client asked for a streamed response (?format=ndjson or ?stream=true)"""
+    return (
+        request.args.get("format") == "ndjson"
+        or request.args.get("stream", "false").lower() == "true"
+    )
+
+
+def stream_rows(query, key, serialize):
+    """Stream query results as NDJSON or as a JSON document, encoding rows as they arrive.
+
+    The ORM query is iterated with ``yield_per`` so only one batch of rows is
+    held in memory at a time.
+    """
+    dumps = current_app.json.dumps
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+
+    if request.args.get("format") == "ndjson":
+        def generate():
+            for row in rows:
+                yield dumps(serialize(row)) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    def generate():
+        yield f'{{"success": true, "{key}": ['
+        first = True
+        for row in rows:
+            yield ("" if first else ",") + dumps(serialize(row))
+            first = False
+        yield "]}"
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -1,17 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from src.database import db
+from src.cache import reference_cache
+from src.pagination import keyset_order, fetch_page, parse_limit, wants_stream, stream_rows, STREAM_BATCH_SIZE
+from src.serializers import with_relationships, serialize_all
+from src.write_queue import write_queue
+from src.jobs import job_runner
+from src.totals import apply_totals, recompute_totals, DEFAULT_BATCH_SIZE
+from src.summaries import SECTION_COLUMNS, refresh_summaries, load_summaries, summary_values, summary_dict
 from src.models.balance_sheet import (
     Store, AccountType, Bank, Account, Snapshot,
-    AccountBalance, WizardSession, HistoricalImport
+    AccountBalance, SnapshotSummary, WizardSession, HistoricalImport
 )
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from decimal import Decimal
+from io import StringIO
+import csv
 import json
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, insert
 
 api_bp = Blueprint("api", __name__)
 
+TIMELINE_METRICS = ("net_position", "total_assets", "total_liabilities", "ytd_sales", "ytd_profit")
+TIMELINE_BUCKETS = ("day", "week", "month")
+
+# Most accounts a single /accounts/history request may ask for
+MAX_HISTORY_ACCOUNTS = 100
+
 @api_bp.route("/health", methods=["GET"])
 def health_check():
     return jsonify({"status": "ok", "message": "API is running"}), 200
@@ -20,10 +35,9 @@ def health_check():
 def get_stores():
     """Get all active stores"""
     try:
-        stores = Store.query.filter_by(is_active=True).all()
         return jsonify({
             "success": True,
-            "stores": [store.to_dict() for store in stores]
+            "stores": reference_cache.stores(active_only=True)
         })
     except Exception as e:
         print(f"Error fetching stores: {e}")
@@ -36,7 +50,7 @@ def get_accounts():
         store_id = request.args.get("store_id", type=int)
         account_type_id = request.args.get("account_type_id", type=int)
         
-        query = Account.query.filter_by(is_active=True)
+        query = with_relationships(Account.query.filter_by(is_active=True), "account_list")
         
         if store_id:
             query = query.filter_by(store_id=store_id)
@@ -48,12 +62,88 @@ def get_accounts():
         
         return jsonify({
             "success": True,
-            "accounts": [account.to_dict() for account in accounts]
+            "accounts": serialize_all(accounts)
         })
     except Exception as e:
         print(f"Error fetching accounts: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@api_bp.route("/accounts/<int:account_id>/history", methods=["GET"])
+def get_account_history(account_id):
+    """Balance of one account across completed snapshots, oldest first.
+    
+    Optional ``start``/``end`` (YYYY-MM-DD) bound the range and ``limit``
+    keeps only the most recent points.
+    """
+    try:
+        account = db.session.get(Account, account_id)
+        if not account:
+            return jsonify({"success": False, "error": "Account not found"}), 404
+        
+        try:
+            start, end = parse_history_range()
+        except ValueError:
+            return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+        limit = request.args.get("limit", type=int)
+        
+        query = account_history_query([account_id], start, end)
+        if limit:
+            rows = query.order_by(None).order_by(
+                desc(Snapshot.snapshot_date), desc(Snapshot.id)
+            ).limit(max(limit, 1)).all()
+            rows.reverse()
+        else:
+            rows = query.all()
+        
+        return jsonify({
+            "success": True,
+            "account_id": account.id,
+            "account_name": account.account_name,
+            **history_columns(rows)
+        })
+    except Exception as e:
+        print(f"Error fetching account history: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route("/accounts/history", methods=["GET"])
+def get_accounts_history():
+    """Balance history for several accounts (``?ids=1,2,3``) in one query"""
+    try:
+        try:
+            account_ids = [int(value) for value in request.args.get("ids", "").split(",") if value.strip()]
+        except ValueError:
+            return jsonify({"success": False, "error": "ids must be a comma separated list of integers"}), 400
+        if not account_ids:
+            return jsonify({"success": False, "error": "ids is required"}), 400
+        if len(account_ids) > MAX_HISTORY_ACCOUNTS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {MAX_HISTORY_ACCOUNTS} accounts per request"
+            }), 400
+        
+        try:
+            start, end = parse_history_range()
+        except ValueError:
+            return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+        
+        names = dict(
+            db.session.query(Account.id, Account.account_name).filter(Account.id.in_(account_ids)).all()
+        )
+        rows_by_account = {account_id: [] for account_id in account_ids}
+        for row in account_history_query(account_ids, start, end):
+            rows_by_account[row.account_id].append(row)
+        
+        return jsonify({
+            "success": True,
+            "accounts": [
+                {"account_id": account_id, "account_name": names[account_id], **history_columns(rows_by_account[account_id])}
+                for account_id in account_ids if account_id in names
+            ]
+        })
+    except Exception as e:
+        print(f"Error fetching accounts history: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @api_bp.route("/snapshots", methods=["GET"])
 def get_snapshots():
     """Get snapshots with optional filtering"""
@@ -61,9 +151,10 @@ def get_snapshots():
         store_id = request.args.get("store_id", type=int)
         date_from = request.args.get("date_from")
         date_to = request.args.get("date_to")
-        limit = request.args.get("limit", 50, type=int)
+        limit = parse_limit(request.args.get("limit", type=int), default=50, maximum=500)
+        cursor = request.args.get("cursor")
         
-        query = Snapshot.query
+        query = with_relationships(Snapshot.query, "snapshot_list")
         
         if store_id:
             query = query.filter_by(store_id=store_id)
@@ -74,64 +165,221 @@ def get_snapshots():
         if date_to:
             query = query.filter(Snapshot.snapshot_date <= datetime.strptime(date_to, "%Y-%m-%d").date())
         
-        snapshots = query.order_by(desc(Snapshot.snapshot_date)).limit(limit).all()
+        # Keyset pagination on (snapshot_date, id), newest first
+        try:
+            query = keyset_order(query, Snapshot.snapshot_date, Snapshot.id, cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if wants_stream():
+            if "limit" in request.args:
+                query = query.limit(limit)
+            return stream_rows(query, "snapshots", lambda snapshot: snapshot.to_dict())
+        
+        snapshots, next_cursor = fetch_page(
+            query, limit, lambda s: s.snapshot_date, lambda s: s.id
+        )
         
         return jsonify({
             "success": True,
-            "snapshots": [snapshot.to_dict() for snapshot in snapshots]
+            "snapshots": serialize_all(snapshots),
+            "next_cursor": next_cursor
         })
     except Exception as e:
         print(f"Error fetching snapshots: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@api_bp.route("/snapshots", methods=["POST"])
-def create_snapshot():
-    """Create a new snapshot"""
+@api_bp.route("/snapshots/summaries", methods=["GET"])
+def get_snapshot_summaries():
+    """Totals and section subtotals of completed snapshots, newest first.
+    
+    Reads only ``snapshots`` and ``snapshot_summaries``. Filters and paging
+    follow ``GET /snapshots``; ``format=csv`` exports every matching row
+    (``limit`` caps it) and ``format=ndjson`` / ``stream=true`` stream JSON.
+    """
     try:
-        data = request.get_json()
-        
-        snapshot = Snapshot(
-            store_id=data["store_id"],
-            snapshot_date=datetime.strptime(data["snapshot_date"], "%Y-%m-%d").date(),
-            created_by=data.get("created_by", "system"),
-            notes=data.get("notes", ""),
-            status="draft"
+        store_id = request.args.get("store_id", type=int)
+        date_from = request.args.get("date_from")
+        date_to = request.args.get("date_to")
+        limit = parse_limit(request.args.get("limit", type=int), default=50, maximum=500)
+        cursor = request.args.get("cursor")
+        
+        query = db.session.query(
+            Snapshot.id,
+            Snapshot.store_id,
+            Snapshot.snapshot_date,
+            Snapshot.total_assets,
+            Snapshot.total_liabilities,
+            Snapshot.net_position,
+            *(getattr(SnapshotSummary, column) for column in SECTION_COLUMNS),
+            SnapshotSummary.balance_count
+        ).join(
+            SnapshotSummary, SnapshotSummary.snapshot_id == Snapshot.id
         )
         
-        db.session.add(snapshot)
-        db.session.flush()  # Get the ID
-        
-        # Add account balances if provided
-        if "balances" in data:
-            for balance_data in data["balances"]:
-                balance = AccountBalance(
-                    snapshot_id=snapshot.id,
-                    account_id=balance_data["account_id"],
-                    balance=Decimal(str(balance_data.get("balance", 0))),
-                    points=balance_data.get("points", 0),
-                    sales=Decimal(str(balance_data.get("sales", 0))) if balance_data.get("sales") else None,
-                    orders=balance_data.get("orders"),
-                    spend=Decimal(str(balance_data.get("spend", 0))) if balance_data.get("spend") else None,
-                    cpa=Decimal(str(balance_data.get("cpa", 0))) if balance_data.get("cpa") else None,
-                    profit=Decimal(str(balance_data.get("profit", 0))) if balance_data.get("profit") else None,
-                    notes=balance_data.get("notes", "")
-                )
-                db.session.add(balance)
-        
-        # Calculate totals
-        calculate_snapshot_totals(snapshot.id)
+        if store_id:
+            query = query.filter(Snapshot.store_id == store_id)
+        if date_from:
+            query = query.filter(Snapshot.snapshot_date >= datetime.strptime(date_from, "%Y-%m-%d").date())
+        if date_to:
+            query = query.filter(Snapshot.snapshot_date <= datetime.strptime(date_to, "%Y-%m-%d").date())
         
-        db.session.commit()
+        try:
+            query = keyset_order(query, Snapshot.snapshot_date, Snapshot.id, cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if request.args.get("format") == "csv":
+            if "limit" in request.args:
+                query = query.limit(limit)
+            return Response(
+                stream_with_context(summary_csv(query.yield_per(STREAM_BATCH_SIZE))),
+                mimetype="text/csv",
+                headers={"Content-Disposition": "attachment; filename=snapshot_summaries.csv"}
+            )
+        
+        if wants_stream():
+            if "limit" in request.args:
+                query = query.limit(limit)
+            return stream_rows(query, "summaries", snapshot_summary_dict)
+        
+        rows, next_cursor = fetch_page(
+            query, limit, lambda row: row.snapshot_date, lambda row: row.id
+        )
         
         return jsonify({
             "success": True,
-            "snapshot": snapshot.to_dict()
-        }), 201
+            "summaries": [snapshot_summary_dict(row) for row in rows],
+            "next_cursor": next_cursor
+        })
+    except Exception as e:
+        print(f"Error fetching snapshot summaries: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def snapshot_summary_dict(row):
+    store = reference_cache.store(row.store_id) or {}
+    return {
+        "snapshot_id": row.id,
+        "store_id": row.store_id,
+        "store_name": store.get("name", "Unknown"),
+        "store_code": store.get("code"),
+        "snapshot_date": row.snapshot_date.isoformat() if row.snapshot_date else None,
+        "total_assets": float(row.total_assets or 0),
+        "total_liabilities": float(row.total_liabilities or 0),
+        "net_position": float(row.net_position or 0),
+        "sections": summary_dict(summary_values(row))
+    }
+
+def summary_csv(rows):
+    """Yield the CSV export of snapshot summary rows, one line at a time"""
+    output = StringIO()
+    writer = csv.writer(output)
+    
+    def line(values):
+        writer.writerow(values)
+        value = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return value
+    
+    yield line([
+        "snapshot_id", "store_code", "store_name", "snapshot_date",
+        *SECTION_COLUMNS, "total_assets", "total_liabilities", "net_position", "balance_count"
+    ])
+    for row in rows:
+        summary = snapshot_summary_dict(row)
+        yield line([
+            summary["snapshot_id"], summary["store_code"], summary["store_name"], summary["snapshot_date"],
+            *(f"{summary['sections'][column]:.2f}" for column in SECTION_COLUMNS),
+            f"{summary['total_assets']:.2f}", f"{summary['total_liabilities']:.2f}",
+            f"{summary['net_position']:.2f}", summary["sections"]["balance_count"]
+        ])
+
+@api_bp.route("/snapshots", methods=["POST"])
+def create_snapshot():
+    """Create a new snapshot"""
+    try:
+        data = request.get_json()
+        
+        payload, status = write_queue.run(insert_snapshot, data)
+        return jsonify(payload), status
     except Exception as e:
         db.session.rollback()
         print(f"Error creating snapshot: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def insert_snapshot(data):
+    """Create a draft snapshot with optional balances. Runs through the write queue."""
+    snapshot = Snapshot(
+        store_id=data["store_id"],
+        snapshot_date=datetime.strptime(data["snapshot_date"], "%Y-%m-%d").date(),
+        created_by=data.get("created_by", "system"),
+        notes=data.get("notes", ""),
+        status="draft"
+    )
+    
+    db.session.add(snapshot)
+    db.session.flush()  # Get the ID
+    
+    # Add account balances if provided, in one executemany
+    rows = [
+        {
+            "snapshot_id": snapshot.id,
+            "account_id": balance_data["account_id"],
+            "balance": Decimal(str(balance_data.get("balance", 0))),
+            "points": balance_data.get("points", 0),
+            "sales": Decimal(str(balance_data.get("sales", 0))) if balance_data.get("sales") else None,
+            "orders": balance_data.get("orders"),
+            "spend": Decimal(str(balance_data.get("spend", 0))) if balance_data.get("spend") else None,
+            "cpa": Decimal(str(balance_data.get("cpa", 0))) if balance_data.get("cpa") else None,
+            "profit": Decimal(str(balance_data.get("profit", 0))) if balance_data.get("profit") else None,
+            "notes": balance_data.get("notes", "")
+        }
+        for balance_data in data.get("balances", [])
+    ]
+    if rows:
+        db.session.execute(insert(AccountBalance), rows)
+    
+    # Calculate totals
+    apply_totals(snapshot)
+    db.session.flush()
+    
+    return {
+        "success": True,
+        "snapshot": snapshot.to_dict()
+    }, 201
+
+@api_bp.route("/snapshots/recompute-totals", methods=["POST"])
+def recompute_snapshot_totals():
+    """Check stored snapshot totals against their balances and report the drift.
+    
+    Query parameters: ``fix=true`` writes the computed totals, ``store_id``
+    and ``status`` narrow the snapshots checked, ``batch_size`` sets the
+    snapshots per query/commit. With ``background=true`` it runs as a job and
+    202 is returned with the job id.
+    """
+    try:
+        params = {
+            "store_id": request.args.get("store_id", type=int),
+            "status": request.args.get("status") or None,
+            "fix": request.args.get("fix", "false").lower() == "true",
+            "batch_size": request.args.get("batch_size", DEFAULT_BATCH_SIZE, type=int)
+        }
+        
+        if request.args.get("background", "false").lower() == "true":
+            job = job_runner.enqueue("recompute_totals", params)
+            return jsonify({
+                "success": True,
+                "job": job.to_dict(),
+                "job_url": f"/api/jobs/{job.id}"
+            }), 202
+        
+        return jsonify({"success": True, "report": recompute_totals(**params)})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error recomputing snapshot totals: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @api_bp.route("/dashboard/summary", methods=["GET"])
 def dashboard_summary():
     """Get dashboard summary data"""
@@ -140,37 +388,10 @@ def dashboard_summary():
         snapshot_date = request.args.get("date", "latest")
         include_drafts = request.args.get("include_drafts", "false").lower() == "true"
         
-        # Get latest snapshot for each store or specific store
-        if store_id:
-            query = Snapshot.query.filter_by(store_id=store_id)
-            
-            # Filter by status unless explicitly including drafts
-            if not include_drafts:
-                query = query.filter_by(status='completed')
-            
-            latest_snapshot = query.order_by(desc(Snapshot.snapshot_date), desc(Snapshot.id)).first()
-            snapshots = [latest_snapshot] if latest_snapshot else []
-        else:
-            # Get all active stores
-            stores = Store.query.filter_by(is_active=True).all()
-            snapshots = []
-            
-            for store in stores:
-                # Get the latest snapshot for this specific store
-                query = Snapshot.query.filter_by(store_id=store.id)
-                
-                # Filter by status
-                if not include_drafts:
-                    query = query.filter_by(status='completed')
-                
-                # Get the most recent one - order by date AND id to handle same-date entries
-                latest = query.order_by(
-                    desc(Snapshot.snapshot_date),
-                    desc(Snapshot.id)  # Use ID as tiebreaker for same dates
-                ).first()
-                
-                if latest:
-                    snapshots.append(latest)
+        # Resolve the latest snapshot per store in a single windowed query
+        rows = latest_snapshots_by_store(store_id=store_id, include_drafts=include_drafts)
+        snapshots = [snapshot for snapshot, store in rows]
+        summaries = load_summaries(snapshots)
         
         # Calculate consolidated metrics
         total_assets = sum(s.total_assets or 0 for s in snapshots)
@@ -178,14 +399,21 @@ def dashboard_summary():
         net_position = sum(s.net_position or 0 for s in snapshots)
         ytd_sales = sum(s.ytd_sales or 0 for s in snapshots)
         ytd_profit = sum(s.ytd_profit or 0 for s in snapshots)
+        sections = {
+            "balance_count": 0,
+            **{section: Decimal('0') for section in SECTION_COLUMNS}
+        }
+        for values in summaries.values():
+            for column in sections:
+                sections[column] += values[column]
         
         # Get store breakdown
         store_breakdown = []
-        for snapshot in snapshots:
+        for snapshot, store in rows:
             store_breakdown.append({
                 "store_id": snapshot.store_id,
-                "store_name": snapshot.store.name,
-                "store_code": snapshot.store.code,
+                "store_name": store.name,
+                "store_code": store.code,
                 "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
                 "snapshot_id": snapshot.id,  # Include ID for debugging
                 "status": snapshot.status,
@@ -194,6 +422,7 @@ def dashboard_summary():
                 "total_liabilities": float(snapshot.total_liabilities or 0),
                 "ytd_sales": float(snapshot.ytd_sales or 0),
                 "ytd_profit": float(snapshot.ytd_profit or 0),
+                "sections": summary_dict(summaries[snapshot.id]),
                 "created_at": snapshot.created_at.isoformat() if snapshot.created_at else None,
                 "updated_at": snapshot.updated_at.isoformat() if snapshot.updated_at else None
             })
@@ -204,35 +433,17 @@ def dashboard_summary():
         # Find stores with only drafts (if not showing drafts)
         stores_with_only_drafts = []
         if not include_drafts:
-            all_stores = Store.query.filter_by(is_active=True).all()
-            for store in all_stores:
-                if not any(s.store_id == store.id for s in snapshots):
-                    # Check if this store has any drafts
-                    has_draft = Snapshot.query.filter_by(
-                        store_id=store.id,
-                        status='draft'
-                    ).first() is not None
-                    
-                    if has_draft:
-                        # Get the latest draft info
-                        latest_draft = Snapshot.query.filter_by(
-                            store_id=store.id,
-                            status='draft'
-                        ).order_by(
-                            desc(Snapshot.snapshot_date),
-                            desc(Snapshot.id)
-                        ).first()
-                        
-                        stores_with_only_drafts.append({
-                            "store_id": store.id,
-                            "store_name": store.name,
-                            "store_code": store.code,
-                            "draft_date": latest_draft.snapshot_date.isoformat() if latest_draft else None,
-                            "draft_count": Snapshot.query.filter_by(
-                                store_id=store.id,
-                                status='draft'
-                            ).count()
-                        })
+            stores_with_snapshots = {s.store_id for s in snapshots}
+            for store, draft_date, draft_count in draft_counts_by_store():
+                if store.id in stores_with_snapshots:
+                    continue
+                stores_with_only_drafts.append({
+                    "store_id": store.id,
+                    "store_name": store.name,
+                    "store_code": store.code,
+                    "draft_date": draft_date.isoformat() if draft_date else None,
+                    "draft_count": draft_count
+                })
         
         return jsonify({
             "success": True,
@@ -243,6 +454,7 @@ def dashboard_summary():
                 "ytd_sales": float(ytd_sales),
                 "ytd_profit": float(ytd_profit),
                 "profit_margin": float(ytd_profit / ytd_sales * 100) if ytd_sales > 0 else 0,
+                "sections": summary_dict(sections),
                 "store_count": len(snapshots),
                 "last_updated": max(s.created_at for s in snapshots).isoformat() if snapshots else None,
                 "showing_drafts": include_drafts
@@ -258,31 +470,43 @@ def dashboard_summary():
 
 @api_bp.route("/dashboard/timeline", methods=["GET"])
 def dashboard_timeline():
-    """Get timeline data for charts"""
+    """Get timeline data for charts, aggregated into day, week or month buckets"""
     try:
         store_id = request.args.get("store_id", type=int)
         days = request.args.get("days", 30, type=int)
+        include_drafts = request.args.get("include_drafts", "false").lower() == "true"
         
-        query = Snapshot.query
-        if store_id:
-            query = query.filter_by(store_id=store_id)
+        try:
+            end = datetime.strptime(request.args["end"], "%Y-%m-%d").date() if request.args.get("end") else date.today()
+            start = datetime.strptime(request.args["start"], "%Y-%m-%d").date() if request.args.get("start") else end - timedelta(days=max(days, 1) - 1)
+        except ValueError:
+            return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+        if start > end:
+            return jsonify({"success": False, "error": "start must not be after end"}), 400
         
-        snapshots = query.order_by(desc(Snapshot.snapshot_date)).limit(days).all()
+        bucket = request.args.get("bucket") or default_timeline_bucket(start, end)
+        if bucket not in TIMELINE_BUCKETS:
+            return jsonify({"success": False, "error": f"bucket must be one of {', '.join(TIMELINE_BUCKETS)}"}), 400
+        
+        labels, series, store_counts = build_timeline(start, end, bucket, store_id, include_drafts)
+        
+        store = reference_cache.store(store_id) if store_id else None
+        store_name = store["name"] if store else "All Stores"
         
         timeline_data = []
-        for snapshot in reversed(snapshots):  # Reverse to get chronological order
-            timeline_data.append({
-                "date": snapshot.snapshot_date.isoformat(),
-                "net_position": float(snapshot.net_position or 0),
-                "total_assets": float(snapshot.total_assets or 0),
-                "total_liabilities": float(snapshot.total_liabilities or 0),
-                "ytd_sales": float(snapshot.ytd_sales or 0),
-                "ytd_profit": float(snapshot.ytd_profit or 0),
-                "store_name": snapshot.store.name
-            })
+        for index, label in enumerate(labels):
+            point = {"date": label, "store_name": store_name, "store_count": store_counts[index]}
+            for metric in TIMELINE_METRICS:
+                point[metric] = series[metric][index]
+            timeline_data.append(point)
         
         return jsonify({
             "success": True,
+            "bucket": bucket,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "labels": labels,
+            "series": series,
             "timeline": timeline_data
         })
     except Exception as e:
@@ -387,7 +611,8 @@ def complete_wizard_session(session_id):
         session.completed_at = datetime.utcnow()
         
         # Calculate totals
-        calculate_snapshot_totals(snapshot.id)
+        apply_totals(snapshot)
+        refresh_summaries([snapshot.id])
         
         db.session.commit()
         
@@ -400,44 +625,200 @@ def complete_wizard_session(session_id):
         print(f"Error completing wizard session: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-def calculate_snapshot_totals(snapshot_id):
-    """Calculate and update snapshot totals"""
-    try:
-        # Get all balances for this snapshot with account type info
-        balances_query = db.session.query(
-            AccountBalance, AccountType
-        ).join(Account).join(AccountType).filter(
-            AccountBalance.snapshot_id == snapshot_id
-        ).all()
-        
-        total_assets = Decimal("0")
-        total_liabilities = Decimal("0")
-        ytd_sales = Decimal("0")
-        ytd_profit = Decimal("0")
-        
-        for balance, account_type in balances_query:
-            if account_type.category == "Asset":
-                total_assets += balance.balance or Decimal("0")
-            elif account_type.category == "Liability":
-                total_liabilities += abs(balance.balance or Decimal("0"))
-            
-            if balance.sales:
-                ytd_sales += balance.sales
-            if balance.profit:
-                ytd_profit += balance.profit
-        
-        net_position = total_assets - total_liabilities
-        profit_margin = (ytd_profit / ytd_sales * 100) if ytd_sales > 0 else Decimal("0")
-        
-        # Update snapshot
-        snapshot = Snapshot.query.get(snapshot_id)
-        snapshot.total_assets = total_assets
-        snapshot.total_liabilities = total_liabilities
-        snapshot.net_position = net_position
-        snapshot.ytd_sales = ytd_sales
-        snapshot.ytd_profit = ytd_profit
-        snapshot.profit_margin = profit_margin
+def latest_snapshots_by_store(store_id=None, include_drafts=False):
+    """Return (Snapshot, Store) pairs for the most recent snapshot of each store.
+
+    Uses ROW_NUMBER() partitioned by store so the whole result comes back in
+    one query regardless of how many stores exist. Without ``store_id`` only
+    active stores are considered; ``snapshot_date`` ties are broken by id.
+    """
+    ranked = db.session.query(
+        Snapshot.id.label("snapshot_id"),
+        func.row_number().over(
+            partition_by=Snapshot.store_id,
+            order_by=(desc(Snapshot.snapshot_date), desc(Snapshot.id))
+        ).label("rank")
+    )
+    
+    if store_id:
+        ranked = ranked.filter(Snapshot.store_id == store_id)
+    if not include_drafts:
+        ranked = ranked.filter(Snapshot.status == "completed")
+    
+    ranked = ranked.subquery()
+    
+    query = db.session.query(Snapshot, Store).join(
+        ranked, ranked.c.snapshot_id == Snapshot.id
+    ).join(
+        Store, Snapshot.store_id == Store.id
+    ).filter(
+        ranked.c.rank == 1
+    )
+    
+    if not store_id:
+        query = query.filter(Store.is_active == True)
+    
+    return query.all()
+
+def draft_counts_by_store():
+    """Return (Store, latest draft date, draft count) for active stores with drafts"""
+    drafts = db.session.query(
+        Snapshot.store_id.label("store_id"),
+        func.max(Snapshot.snapshot_date).label("draft_date"),
+        func.count(Snapshot.id).label("draft_count")
+    ).filter(
+        Snapshot.status == "draft"
+    ).group_by(
+        Snapshot.store_id
+    ).subquery()
+    
+    return db.session.query(
+        Store, drafts.c.draft_date, drafts.c.draft_count
+    ).join(
+        drafts, drafts.c.store_id == Store.id
+    ).filter(
+        Store.is_active == True
+    ).all()
+
+def default_timeline_bucket(start, end):
+    """Pick a bucket size that keeps the chart at a few dozen points"""
+    span = (end - start).days + 1
+    if span <= 31:
+        return "day"
+    if span <= 180:
+        return "week"
+    return "month"
+
+def timeline_bucket_key(bucket, column):
+    """SQL expression mapping a snapshot date to the label of its bucket"""
+    if bucket == "day":
+        return func.date(column)
+    if bucket == "week":
+        # Weeks start on Monday
+        return func.date(column, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", column)
+
+def timeline_bucket_labels(start, end, bucket):
+    """Every bucket label between start and end, in order"""
+    if bucket == "day":
+        current = start
+        step = lambda d: d + timedelta(days=1)
+    elif bucket == "week":
+        current = start - timedelta(days=start.weekday())
+        step = lambda d: d + timedelta(days=7)
+    else:
+        current = start.replace(day=1)
+        step = lambda d: (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    
+    labels = []
+    while current <= end:
+        labels.append(current.isoformat())
+        current = step(current)
+    return labels
+
+def build_timeline(start, end, bucket, store_id=None, include_drafts=False):
+    """Aggregate snapshot metrics per bucket between start and end (inclusive).
+    
+    Each store contributes its latest snapshot within a bucket; when a store
+    has no snapshot in a bucket its last known snapshot is carried forward
+    (an as-of join), seeded from the latest snapshot before ``start``. Runs
+    two queries regardless of how much history exists and returns
+    (labels, series by metric, number of stores contributing per bucket).
+    """
+    key = timeline_bucket_key(bucket, Snapshot.snapshot_date).label("bucket")
+    range_start = datetime.combine(start, datetime.min.time())
+    range_end = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    
+    def ranked(partition, date_filter):
+        query = db.session.query(
+            Snapshot.store_id.label("store_id"),
+            key,
+            *[getattr(Snapshot, metric).label(metric) for metric in TIMELINE_METRICS],
+            func.row_number().over(
+                partition_by=partition,
+                order_by=(desc(Snapshot.snapshot_date), desc(Snapshot.id))
+            ).label("rank")
+        ).join(
+            Store, Snapshot.store_id == Store.id
+        ).filter(date_filter)
         
-    except Exception as e:
-        print(f"Error calculating snapshot totals: {e}")
-        raise # Re-raise to ensure rollback in calling function
+        if store_id:
+            query = query.filter(Snapshot.store_id == store_id)
+        else:
+            query = query.filter(Store.is_active == True)
+        if not include_drafts:
+            query = query.filter(Snapshot.status == "completed")
+        
+        subquery = query.subquery()
+        return db.session.query(subquery).filter(subquery.c.rank == 1)
+    
+    # Last known snapshot of each store before the range starts
+    seed_rows = ranked(Snapshot.store_id, Snapshot.snapshot_date < range_start).all()
+    
+    # Latest snapshot of each store within each bucket
+    bucket_rows = ranked(
+        (Snapshot.store_id, key),
+        and_(Snapshot.snapshot_date >= range_start, Snapshot.snapshot_date < range_end)
+    ).all()
+    
+    by_bucket = {}
+    for row in bucket_rows:
+        by_bucket.setdefault(row.bucket, []).append(row)
+    
+    current = {row.store_id: row for row in seed_rows}
+    labels = timeline_bucket_labels(start, end, bucket)
+    series = {metric: [] for metric in TIMELINE_METRICS}
+    store_counts = []
+    
+    for label in labels:
+        for row in by_bucket.get(label, []):
+            current[row.store_id] = row
+        
+        store_counts.append(len(current))
+        for metric in TIMELINE_METRICS:
+            if current:
+                series[metric].append(float(sum(getattr(row, metric) or 0 for row in current.values())))
+            else:
+                series[metric].append(None)
+    
+    return labels, series, store_counts
+
+def parse_history_range():
+    """Optional start/end dates from the query string, raising ValueError if malformed"""
+    start = request.args.get("start")
+    end = request.args.get("end")
+    return (
+        datetime.strptime(start, "%Y-%m-%d") if start else None,
+        datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) if end else None,
+    )
+
+def account_history_query(account_ids, start=None, end=None):
+    """Balances of the given accounts in completed snapshots, ordered by account then date.
+    
+    Reads (account_id, snapshot_id, balance) straight from the covering
+    ix_account_balances_account_snapshot index and joins snapshots by key.
+    """
+    query = db.session.query(
+        AccountBalance.account_id,
+        AccountBalance.snapshot_id,
+        AccountBalance.balance,
+        Snapshot.snapshot_date
+    ).join(
+        Snapshot, Snapshot.id == AccountBalance.snapshot_id
+    ).filter(
+        AccountBalance.account_id.in_(account_ids),
+        Snapshot.status == 'completed'
+    )
+    if start:
+        query = query.filter(Snapshot.snapshot_date >= start)
+    if end:
+        query = query.filter(Snapshot.snapshot_date < end)
+    return query.order_by(AccountBalance.account_id, Snapshot.snapshot_date, Snapshot.id)
+
+def history_columns(rows):
+    """Columnar dates / values / snapshot ids for a list of history rows"""
+    return {
+        "dates": [row.snapshot_date.date().isoformat() for row in rows],
+        "values": [float(row.balance) for row in rows],
+        "snapshot_ids": [row.snapshot_id for row in rows]
+    }
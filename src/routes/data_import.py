@@ -1,345 +1,431 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+from src.cache import reference_cache
+from src.classification import default_classification
+from src.importers import DEFAULT_CHUNK_SIZE, CSV_TYPES, spool_to_file
+from src.jobs import job_runner
 from src.models.balance_sheet import (
     db, Store, AccountType, Bank, Account, Snapshot,
     AccountBalance, HistoricalImport
 )
+import os
 
 import_bp = Blueprint('import', __name__)
 
 @import_bp.route('/seed', methods=['POST'])
 def seed_data():
-    """Create comprehensive seed data matching the Excel balance sheet structure"""
+    """Create comprehensive seed data matching the Excel balance sheet structure.
+    
+    With ``?background=true`` the seed runs as a job and 202 is returned
+    with the job id.
+    """
     try:
-        # Create stores
-        stores_data = [
-            {'code': 'SEAL', 'name': 'Seal Skin', 'is_active': True},
-            {'code': 'BOAT', 'name': 'BoatCover', 'is_active': True},
-            {'code': 'JSC', 'name': 'JetSkiCover', 'is_active': True},
-            {'code': 'DEB', 'name': 'Debonair', 'is_active': True},
-            {'code': 'UTV', 'name': 'UTV Cover', 'is_active': True},
-            {'code': 'YORK', 'name': 'Slice Yorktown', 'is_active': True},
-            {'code': 'SOM', 'name': 'Slice Somers', 'is_active': True},
-        ]
+        if request.args.get('background', 'false').lower() == 'true':
+            job = job_runner.enqueue('seed')
+            return jsonify({
+                'success': True,
+                'job': job.to_dict(),
+                'job_url': f'/api/jobs/{job.id}'
+            }), 202
         
-        created_stores = {}
-        for store_data in stores_data:
-            store = Store.query.filter_by(code=store_data['code']).first()
-            if not store:
-                store = Store(**store_data)
-                db.session.add(store)
-                db.session.flush()
-            created_stores[store.code] = store
+        stats = seed_database()
         
-        # Create account types
-        account_types_data = [
-            # Assets
-            {'name': 'Bank Checking', 'category': 'Asset', 'sort_order': 1},
-            {'name': 'Bank Savings', 'category': 'Asset', 'sort_order': 2},
-            {'name': 'Merchant Account', 'category': 'Asset', 'sort_order': 3},
-            {'name': 'Intercompany Receivable', 'category': 'Asset', 'sort_order': 4},
-            {'name': 'Points', 'category': 'Asset', 'sort_order': 5},
-            {'name': 'Inventory', 'category': 'Asset', 'sort_order': 6},
-            {'name': 'Order Receivable', 'category': 'Asset', 'sort_order': 7},
-            {'name': 'Tax Refund', 'category': 'Asset', 'sort_order': 8},
-            {'name': 'Loan Receivable', 'category': 'Asset', 'sort_order': 9},
-            # Liabilities
-            {'name': 'Management Fee', 'category': 'Liability', 'sort_order': 20},
-            {'name': 'Advertising Payable', 'category': 'Liability', 'sort_order': 21},
-            {'name': 'Pending Refunds', 'category': 'Liability', 'sort_order': 22},
-            {'name': 'Pending Shipments', 'category': 'Liability', 'sort_order': 23},
-            {'name': 'Shipping Payable', 'category': 'Liability', 'sort_order': 24},
-            {'name': 'Credit Card', 'category': 'Liability', 'sort_order': 25},
-            {'name': 'Container Duties', 'category': 'Liability', 'sort_order': 26},
-            {'name': 'Sales Tax Payable', 'category': 'Liability', 'sort_order': 27},
-            {'name': 'Vendor Payable', 'category': 'Liability', 'sort_order': 28},
-            {'name': 'Rent Payable', 'category': 'Liability', 'sort_order': 29},
-        ]
-        
-        created_types = {}
-        for at_data in account_types_data:
-            account_type = AccountType.query.filter_by(name=at_data['name']).first()
-            if not account_type:
-                account_type = AccountType(**at_data)
-                db.session.add(account_type)
-                db.session.flush()
-            created_types[account_type.name] = account_type
-        
-        # Create banks
-        banks_data = [
-            {'name': 'Chase', 'is_active': True},
-            {'name': 'Capital One', 'is_active': True},
-            {'name': 'Amazon', 'is_active': True},
-            {'name': 'PayPal', 'is_active': True},
-            {'name': 'Shopify', 'is_active': True},
-            {'name': 'Points System', 'is_active': True},
-            {'name': 'Internal', 'is_active': True},
-        ]
-        
-        created_banks = {}
-        for bank_data in banks_data:
-            bank = Bank.query.filter_by(name=bank_data['name']).first()
-            if not bank:
-                bank = Bank(**bank_data)
-                db.session.add(bank)
-                db.session.flush()
-            created_banks[bank.name] = bank
+        return jsonify({
+            'success': True,
+            'message': 'Seed data created successfully',
+            'stats': stats
+        })
         
-        # Create accounts for each store
-        for store_code, store in created_stores.items():
-            accounts_to_create = []
-            
-            # Bank Accounts (Assets)
-            accounts_to_create.extend([
-                {
-                    'account_name': f'{store.name} - Chase Checking',
-                    'account_type_id': created_types['Bank Checking'].id,
-                    'bank_id': created_banks['Chase'].id,
-                    'account_number': '3456'
-                },
-                {
-                    'account_name': f'{store.name} - Capital One',
-                    'account_type_id': created_types['Bank Checking'].id,
-                    'bank_id': created_banks['Capital One'].id,
-                    'account_number': '1234'
-                }
-            ])
-            
-            # Merchant Accounts (Assets)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@job_runner.task('seed')
+def seed_task(context):
+    return seed_database()
+
+def seed_database():
+    """Create the stores, account types, banks and accounts that are missing, returning table counts"""
+    # Create stores
+    stores_data = [
+        {'code': 'SEAL', 'name': 'Seal Skin', 'is_active': True},
+        {'code': 'BOAT', 'name': 'BoatCover', 'is_active': True},
+        {'code': 'JSC', 'name': 'JetSkiCover', 'is_active': True},
+        {'code': 'DEB', 'name': 'Debonair', 'is_active': True},
+        {'code': 'UTV', 'name': 'UTV Cover', 'is_active': True},
+        {'code': 'YORK', 'name': 'Slice Yorktown', 'is_active': True},
+        {'code': 'SOM', 'name': 'Slice Somers', 'is_active': True},
+    ]
+    
+    created_stores = {}
+    for store_data in stores_data:
+        store = Store.query.filter_by(code=store_data['code']).first()
+        if not store:
+            store = Store(**store_data)
+            db.session.add(store)
+            db.session.flush()
+        created_stores[store.code] = store
+    
+    # Create account types
+    account_types_data = [
+        # Assets
+        {'name': 'Bank Checking', 'category': 'Asset', 'sort_order': 1},
+        {'name': 'Bank Savings', 'category': 'Asset', 'sort_order': 2},
+        {'name': 'Merchant Account', 'category': 'Asset', 'sort_order': 3},
+        {'name': 'Intercompany Receivable', 'category': 'Asset', 'sort_order': 4},
+        {'name': 'Points', 'category': 'Asset', 'sort_order': 5},
+        {'name': 'Inventory', 'category': 'Asset', 'sort_order': 6},
+        {'name': 'Order Receivable', 'category': 'Asset', 'sort_order': 7},
+        {'name': 'Tax Refund', 'category': 'Asset', 'sort_order': 8},
+        {'name': 'Loan Receivable', 'category': 'Asset', 'sort_order': 9},
+        # Liabilities
+        {'name': 'Management Fee', 'category': 'Liability', 'sort_order': 20},
+        {'name': 'Advertising Payable', 'category': 'Liability', 'sort_order': 21},
+        {'name': 'Pending Refunds', 'category': 'Liability', 'sort_order': 22},
+        {'name': 'Pending Shipments', 'category': 'Liability', 'sort_order': 23},
+        {'name': 'Shipping Payable', 'category': 'Liability', 'sort_order': 24},
+        {'name': 'Credit Card', 'category': 'Liability', 'sort_order': 25},
+        {'name': 'Container Duties', 'category': 'Liability', 'sort_order': 26},
+        {'name': 'Sales Tax Payable', 'category': 'Liability', 'sort_order': 27},
+        {'name': 'Vendor Payable', 'category': 'Liability', 'sort_order': 28},
+        {'name': 'Rent Payable', 'category': 'Liability', 'sort_order': 29},
+    ]
+    
+    created_types = {}
+    for at_data in account_types_data:
+        account_type = AccountType.query.filter_by(name=at_data['name']).first()
+        if not account_type:
+            account_type = AccountType(**at_data, **default_classification(at_data['name'], at_data['category']))
+            db.session.add(account_type)
+            db.session.flush()
+        created_types[account_type.name] = account_type
+    
+    # Create banks
+    banks_data = [
+        {'name': 'Chase', 'is_active': True},
+        {'name': 'Capital One', 'is_active': True},
+        {'name': 'Amazon', 'is_active': True},
+        {'name': 'PayPal', 'is_active': True},
+        {'name': 'Shopify', 'is_active': True},
+        {'name': 'Points System', 'is_active': True},
+        {'name': 'Internal', 'is_active': True},
+    ]
+    
+    created_banks = {}
+    for bank_data in banks_data:
+        bank = Bank.query.filter_by(name=bank_data['name']).first()
+        if not bank:
+            bank = Bank(**bank_data)
+            db.session.add(bank)
+            db.session.flush()
+        created_banks[bank.name] = bank
+    
+    # Create accounts for each store
+    for store_code, store in created_stores.items():
+        accounts_to_create = []
+    
+        # Bank Accounts (Assets)
+        accounts_to_create.extend([
+            {
+                'account_name': f'{store.name} - Chase Checking',
+                'account_type_id': created_types['Bank Checking'].id,
+                'bank_id': created_banks['Chase'].id,
+                'account_number': '3456'
+            },
+            {
+                'account_name': f'{store.name} - Capital One',
+                'account_type_id': created_types['Bank Checking'].id,
+                'bank_id': created_banks['Capital One'].id,
+                'account_number': '1234'
+            }
+        ])
+    
+        # Merchant Accounts (Assets)
+        accounts_to_create.extend([
+            {
+                'account_name': f'{store.name} - Amazon',
+                'account_type_id': created_types['Merchant Account'].id,
+                'bank_id': created_banks['Amazon'].id,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - PayPal',
+                'account_type_id': created_types['Merchant Account'].id,
+                'bank_id': created_banks['PayPal'].id,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Shopify/Merchant',
+                'account_type_id': created_types['Merchant Account'].id,
+                'bank_id': created_banks['Shopify'].id,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Points',
+                'account_type_id': created_types['Points'].id,
+                'bank_id': created_banks['Points System'].id,
+                'account_number': None
+            }
+        ])
+    
+        # Intercompany Receivables (for Seal Skin only)
+        if store.code == 'SEAL':
             accounts_to_create.extend([
                 {
-                    'account_name': f'{store.name} - Amazon',
-                    'account_type_id': created_types['Merchant Account'].id,
-                    'bank_id': created_banks['Amazon'].id,
+                    'account_name': 'BC owes Seal Skin',
+                    'account_type_id': created_types['Intercompany Receivable'].id,
+                    'bank_id': created_banks['Internal'].id,
                     'account_number': None
                 },
                 {
-                    'account_name': f'{store.name} - PayPal',
-                    'account_type_id': created_types['Merchant Account'].id,
-                    'bank_id': created_banks['PayPal'].id,
+                    'account_name': 'Debonair owes Seal Skin',
+                    'account_type_id': created_types['Intercompany Receivable'].id,
+                    'bank_id': created_banks['Internal'].id,
                     'account_number': None
                 },
                 {
-                    'account_name': f'{store.name} - Shopify/Merchant',
-                    'account_type_id': created_types['Merchant Account'].id,
-                    'bank_id': created_banks['Shopify'].id,
+                    'account_name': 'JSC owes Seal Skin',
+                    'account_type_id': created_types['Intercompany Receivable'].id,
+                    'bank_id': created_banks['Internal'].id,
                     'account_number': None
                 },
                 {
-                    'account_name': f'{store.name} - Points',
-                    'account_type_id': created_types['Points'].id,
-                    'bank_id': created_banks['Points System'].id,
+                    'account_name': 'UTV owes Seal Skin',
+                    'account_type_id': created_types['Intercompany Receivable'].id,
+                    'bank_id': created_banks['Internal'].id,
                     'account_number': None
                 }
             ])
-            
-            # Intercompany Receivables (for Seal Skin only)
-            if store.code == 'SEAL':
-                accounts_to_create.extend([
-                    {
-                        'account_name': 'BC owes Seal Skin',
-                        'account_type_id': created_types['Intercompany Receivable'].id,
-                        'bank_id': created_banks['Internal'].id,
-                        'account_number': None
-                    },
-                    {
-                        'account_name': 'Debonair owes Seal Skin',
-                        'account_type_id': created_types['Intercompany Receivable'].id,
-                        'bank_id': created_banks['Internal'].id,
-                        'account_number': None
-                    },
-                    {
-                        'account_name': 'JSC owes Seal Skin',
-                        'account_type_id': created_types['Intercompany Receivable'].id,
-                        'bank_id': created_banks['Internal'].id,
-                        'account_number': None
-                    },
-                    {
-                        'account_name': 'UTV owes Seal Skin',
-                        'account_type_id': created_types['Intercompany Receivable'].id,
-                        'bank_id': created_banks['Internal'].id,
-                        'account_number': None
-                    }
-                ])
-            
-            # Inventory (Asset)
-            accounts_to_create.append({
-                'account_name': f'{store.name} - Live Inventory',
-                'account_type_id': created_types['Inventory'].id,
+    
+        # Inventory (Asset)
+        accounts_to_create.append({
+            'account_name': f'{store.name} - Live Inventory',
+            'account_type_id': created_types['Inventory'].id,
+            'bank_id': None,
+            'account_number': None
+        })
+    
+        # Order Receivables (Assets)
+        accounts_to_create.extend([
+            {
+                'account_name': f'{store.name} - Order Q2 2025 Anma',
+                'account_type_id': created_types['Order Receivable'].id,
                 'bank_id': None,
                 'account_number': None
-            })
-            
-            # Order Receivables (Assets)
-            accounts_to_create.extend([
-                {
-                    'account_name': f'{store.name} - Order Q2 2025 Anma',
-                    'account_type_id': created_types['Order Receivable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Order Q2 2025 Homful',
-                    'account_type_id': created_types['Order Receivable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Order Q3 2025 Anma',
-                    'account_type_id': created_types['Order Receivable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Order Q3 2025 Homful',
-                    'account_type_id': created_types['Order Receivable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                }
-            ])
-            
-            # Other Assets
-            accounts_to_create.extend([
-                {
-                    'account_name': f'{store.name} - IRS REFUND PTET',
-                    'account_type_id': created_types['Tax Refund'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - CarLoans',
-                    'account_type_id': created_types['Loan Receivable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                }
-            ])
-            
-            # Liabilities
+            },
+            {
+                'account_name': f'{store.name} - Order Q2 2025 Homful',
+                'account_type_id': created_types['Order Receivable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Order Q3 2025 Anma',
+                'account_type_id': created_types['Order Receivable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Order Q3 2025 Homful',
+                'account_type_id': created_types['Order Receivable'].id,
+                'bank_id': None,
+                'account_number': None
+            }
+        ])
+    
+        # Other Assets
+        accounts_to_create.extend([
+            {
+                'account_name': f'{store.name} - IRS REFUND PTET',
+                'account_type_id': created_types['Tax Refund'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - CarLoans',
+                'account_type_id': created_types['Loan Receivable'].id,
+                'bank_id': None,
+                'account_number': None
+            }
+        ])
+    
+        # Liabilities
+        accounts_to_create.extend([
+            {
+                'account_name': f'{store.name} - 7a Management Fee',
+                'account_type_id': created_types['Management Fee'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - AdsBing',
+                'account_type_id': created_types['Advertising Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - AdsGoogle',
+                'account_type_id': created_types['Advertising Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - AdsMeta',
+                'account_type_id': created_types['Advertising Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Pending Refunds',
+                'account_type_id': created_types['Pending Refunds'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Pending Shipments',
+                'account_type_id': created_types['Pending Shipments'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - UPS/DHL/USPS Carriers',
+                'account_type_id': created_types['Shipping Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Credit Card',
+                'account_type_id': created_types['Credit Card'].id,
+                'bank_id': created_banks['Chase'].id,
+                'account_number': '9876'
+            },
+            {
+                'account_name': f'{store.name} - Container Duties Due',
+                'account_type_id': created_types['Container Duties'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Sales Tax owed',
+                'account_type_id': created_types['Sales Tax Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - Balkans.io',
+                'account_type_id': created_types['Vendor Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            },
+            {
+                'account_name': f'{store.name} - WorldWeav',
+                'account_type_id': created_types['Vendor Payable'].id,
+                'bank_id': None,
+                'account_number': None
+            }
+        ])
+    
+        # Rent accounts (only for physical stores)
+        if store.code in ['YORK', 'SOM']:
             accounts_to_create.extend([
                 {
-                    'account_name': f'{store.name} - 7a Management Fee',
-                    'account_type_id': created_types['Management Fee'].id,
+                    'account_name': f'{store.name} - Rent Brewster',
+                    'account_type_id': created_types['Rent Payable'].id,
                     'bank_id': None,
                     'account_number': None
                 },
                 {
-                    'account_name': f'{store.name} - AdsBing',
-                    'account_type_id': created_types['Advertising Payable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - AdsGoogle',
-                    'account_type_id': created_types['Advertising Payable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - AdsMeta',
-                    'account_type_id': created_types['Advertising Payable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Pending Refunds',
-                    'account_type_id': created_types['Pending Refunds'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Pending Shipments',
-                    'account_type_id': created_types['Pending Shipments'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - UPS/DHL/USPS Carriers',
-                    'account_type_id': created_types['Shipping Payable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Credit Card',
-                    'account_type_id': created_types['Credit Card'].id,
-                    'bank_id': created_banks['Chase'].id,
-                    'account_number': '9876'
-                },
-                {
-                    'account_name': f'{store.name} - Container Duties Due',
-                    'account_type_id': created_types['Container Duties'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Sales Tax owed',
-                    'account_type_id': created_types['Sales Tax Payable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - Balkans.io',
-                    'account_type_id': created_types['Vendor Payable'].id,
-                    'bank_id': None,
-                    'account_number': None
-                },
-                {
-                    'account_name': f'{store.name} - WorldWeav',
-                    'account_type_id': created_types['Vendor Payable'].id,
+                    'account_name': f'{store.name} - Rent Hartford',
+                    'account_type_id': created_types['Rent Payable'].id,
                     'bank_id': None,
                     'account_number': None
                 }
             ])
-            
-            # Rent accounts (only for physical stores)
-            if store.code in ['YORK', 'SOM']:
-                accounts_to_create.extend([
-                    {
-                        'account_name': f'{store.name} - Rent Brewster',
-                        'account_type_id': created_types['Rent Payable'].id,
-                        'bank_id': None,
-                        'account_number': None
-                    },
-                    {
-                        'account_name': f'{store.name} - Rent Hartford',
-                        'account_type_id': created_types['Rent Payable'].id,
-                        'bank_id': None,
-                        'account_number': None
-                    }
-                ])
-            
-            # Create all accounts for this store
-            for account_data in accounts_to_create:
-                existing = Account.query.filter_by(
+    
+        # Create all accounts for this store
+        for account_data in accounts_to_create:
+            existing = Account.query.filter_by(
+                store_id=store.id,
+                account_name=account_data['account_name']
+            ).first()
+    
+            if not existing:
+                account = Account(
                     store_id=store.id,
-                    account_name=account_data['account_name']
-                ).first()
-                
-                if not existing:
-                    account = Account(
-                        store_id=store.id,
-                        **account_data,
-                        is_active=True
-                    )
-                    db.session.add(account)
+                    **account_data,
+                    is_active=True
+                )
+                db.session.add(account)
+    
+    db.session.commit()
+    reference_cache.invalidate()
+    
+    # Count created records
+    total_stores = Store.query.count()
+    total_account_types = AccountType.query.count()
+    total_banks = Bank.query.count()
+    total_accounts = Account.query.count()
+    
+    return {
+        'stores': total_stores,
+        'account_types': total_account_types,
+        'banks': total_banks,
+        'accounts': total_accounts
+    }
+
+@import_bp.route('/historical', methods=['POST'])
+def start_historical_import():
+    """Upload a historical snapshot CSV and import it in the background.
+    
+    Accepts a multipart ``file`` field or a raw ``text/csv`` body. Returns
+    202 with the HistoricalImport record and the job running it; poll
+    ``status_url`` or ``job_url`` for progress.
+    """
+    try:
+        upload = request.files.get('file')
+        if upload is None and request.mimetype not in CSV_TYPES:
+            return jsonify({'success': False, 'error': 'Upload a CSV file or send a text/csv body'}), 400
+        
+        # Spool the upload to disk so the job can stream it after this request ends
+        path = spool_to_file(
+            upload.stream if upload is not None else request.stream,
+            current_app.config.get('IMPORT_UPLOAD_DIR'),
+            suffix='.csv'
+        )
         
+        filename = (upload.filename if upload is not None else None) or request.args.get('filename') or 'upload.csv'
+        record = HistoricalImport(filename=filename, status='pending', total_bytes=os.path.getsize(path))
+        db.session.add(record)
         db.session.commit()
         
-        # Count created records
-        total_stores = Store.query.count()
-        total_account_types = AccountType.query.count()
-        total_banks = Bank.query.count()
-        total_accounts = Account.query.count()
+        chunk_size = request.args.get('chunk_size', type=int) or current_app.config.get('IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        job = job_runner.enqueue('historical_import', {
+            'import_id': record.id,
+            'path': path,
+            'chunk_size': chunk_size
+        })
         
         return jsonify({
             'success': True,
-            'message': 'Seed data created successfully',
-            'stats': {
-                'stores': total_stores,
-                'account_types': total_account_types,
-                'banks': total_banks,
-                'accounts': total_accounts
-            }
-        })
+            'import': record.to_dict(),
+            'job': job.to_dict(),
+            'status_url': f'/import/historical/{record.id}',
+            'job_url': f'/api/jobs/{job.id}'
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
+
+@import_bp.route('/historical', methods=['GET'])
+def list_historical_imports():
+    """Most recent historical imports, newest first"""
+    imports = HistoricalImport.query.order_by(HistoricalImport.id.desc()).limit(50).all()
+    return jsonify({'success': True, 'imports': [record.to_dict() for record in imports]})
+
+@import_bp.route('/historical/<int:import_id>', methods=['GET'])
+def get_historical_import(import_id):
+    """Status and progress of one historical import"""
+    record = db.session.get(HistoricalImport, import_id)
+    if not record:
+        return jsonify({'success': False, 'error': 'Import not found'}), 404
+    return jsonify({'success': True, 'import': record.to_dict()})
@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify, request
+from src.database import db
+from src.models.balance_sheet import Job
+
+jobs_bp = Blueprint("jobs", __name__)
+
+@jobs_bp.route("", methods=["GET"])
+def list_jobs():
+    """Most recent jobs, newest first, optionally filtered by status and kind"""
+    try:
+        query = Job.query
+        if request.args.get("status"):
+            query = query.filter_by(status=request.args["status"])
+        if request.args.get("kind"):
+            query = query.filter_by(kind=request.args["kind"])
+        limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+        
+        jobs = query.order_by(Job.id.desc()).limit(limit).all()
+        return jsonify({"success": True, "jobs": [job.to_dict() for job in jobs]})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@jobs_bp.route("/<int:job_id>", methods=["GET"])
+def get_job(job_id):
+    """Status, progress and result of one job"""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
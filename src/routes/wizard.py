@@ -1,24 +1,52 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from src.database import db
+from src.cache import reference_cache, balance_sheet_cache
+from src.pagination import keyset_order, fetch_page, parse_limit, wants_stream, stream_rows
+from src.serializers import with_relationships
+from src.importers import AccountImporter, DEFAULT_CHUNK_SIZE, iter_request_rows, spool_to_file
+from src.jobs import job_runner
+from src.write_queue import write_queue
+from src.totals import contribution, balance_columns, ytd_columns
+from src.classification import (
+    BALANCE_SHEET_SECTIONS, SECTION_COLUMNS, SECTION_PARENTS,
+    default_classification, default_liquidity, validate_classification
+)
+from src.summaries import refresh_summaries, refresh_account_summaries, load_summaries
 from src.models.balance_sheet import (
     Store, AccountType, Bank, Account, Snapshot,
     AccountBalance, WizardSession
 )
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, case, insert, select, update
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime, date
 from decimal import Decimal
+import hashlib
 import json
+import re
 import uuid
 
 wizard_bp = Blueprint("wizard", __name__)
 
+# Balances are stored as Numeric(10, 2)
+CENT = Decimal('0.01')
+
+# Balance sheet section -> wizard step group that lists its accounts
+WIZARD_GROUPS = {
+    'bank_accounts': 'bank_accounts',
+    'merchant_accounts': 'merchant_accounts',
+    'inventory': 'inventory',
+    'other_assets': 'receivables',
+    'current_liabilities': 'liabilities',
+    'long_term': 'liabilities',
+}
+
 @wizard_bp.route("/initialize", methods=["POST"])
 def initialize_wizard():
     """Initialize a new wizard session with all necessary data"""
     try:
         # Get all stores
-        stores = Store.query.filter_by(is_active=True).order_by(Store.name).all()
+        stores = sorted(reference_cache.stores(active_only=True), key=lambda s: s["name"])
         
         # Create a new wizard session
         session_id = str(uuid.uuid4())
@@ -26,7 +54,7 @@ def initialize_wizard():
         return jsonify({
             "success": True,
             "session_id": session_id,
-            "stores": [{"id": s.id, "name": s.name, "code": s.code} for s in stores]
+            "stores": [{"id": s["id"], "name": s["name"], "code": s["code"]} for s in stores]
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -39,10 +67,13 @@ def get_store_accounts(store_id):
         store = Store.query.get_or_404(store_id)
         
         # Get all accounts for this store
-        accounts = Account.query.filter_by(
-            store_id=store_id,
-            is_active=True
-        ).join(AccountType).order_by(AccountType.sort_order, Account.account_name).all()
+        accounts = with_relationships(
+            Account.query.filter_by(
+                store_id=store_id,
+                is_active=True
+            ).join(AccountType),
+            "store_accounts"
+        ).order_by(AccountType.sort_order, Account.account_name).all()
         
         # Organize accounts by category
         organized_accounts = {
@@ -63,17 +94,10 @@ def get_store_accounts(store_id):
                 "bank": account.bank.name if account.bank else None
             }
             
-            # Categorize based on account type
-            if account.account_type.name in ['Bank Checking', 'Bank Savings']:
-                organized_accounts["bank_accounts"].append(account_data)
-            elif account.account_type.name in ['Merchant Account', 'Intercompany Receivable', 'Points']:
-                organized_accounts["merchant_accounts"].append(account_data)
-            elif account.account_type.name == 'Inventory':
-                organized_accounts["inventory"].append(account_data)
-            elif account.account_type.name in ['Order Receivable', 'Tax Refund', 'Loan Receivable']:
-                organized_accounts["receivables"].append(account_data)
-            elif account.account_type.category == 'Liability':
-                organized_accounts["liabilities"].append(account_data)
+            # Categorize based on the account type's balance sheet section
+            group = WIZARD_GROUPS.get(account.account_type.section)
+            if group:
+                organized_accounts[group].append(account_data)
         
         return jsonify({
             "success": True,
@@ -156,89 +180,236 @@ def save_snapshot():
             return jsonify({"success": False, "error": "Snapshot date is required"}), 400
         if not data.get('balances'):
             return jsonify({"success": False, "error": "Account balances are required"}), 400
+        if not valid_version(data.get('version')):
+            return jsonify({"success": False, "error": "Version must be an integer"}), 400
         
         # Parse date
         snapshot_date = datetime.strptime(data['snapshot_date'], '%Y-%m-%d').date()
         
-        # Delete draft if publishing from draft
-        draft_id = data.get('draft_id')
-        if draft_id:
-            draft = Snapshot.query.get(draft_id)
-            if draft and draft.status == 'draft':
-                db.session.delete(draft)
-        
-        # Create snapshot
-        snapshot = Snapshot(
-            store_id=data['store_id'],
-            snapshot_date=snapshot_date,
-            created_by='wizard',
-            notes=data.get('notes', ''),
-            status='completed'
-        )
-        
-        db.session.add(snapshot)
-        db.session.flush()  # Get the snapshot ID
-        
-        # Add account balances
-        total_assets = Decimal('0')
-        total_liabilities = Decimal('0')
-        
-        for balance_data in data['balances']:
-            account_id = balance_data.get('account_id')
-            amount = Decimal(str(balance_data.get('amount', 0)))
-            
-            if not account_id:
-                continue
-            
-            # Get account to determine if it's an asset or liability
-            account = Account.query.get(account_id)
-            if not account:
-                continue
-            
-            # Create account balance
-            balance = AccountBalance(
-                snapshot_id=snapshot.id,
-                account_id=account_id,
-                balance=amount,
-                notes=balance_data.get('notes', '')
-            )
-            db.session.add(balance)
-            
-            # Update totals
-            if account.account_type.category == 'Asset':
-                total_assets += abs(amount)
-            elif account.account_type.category == 'Liability':
-                total_liabilities += abs(amount)
-        
-        # Update snapshot totals
-        snapshot.total_assets = total_assets
-        snapshot.total_liabilities = total_liabilities
-        snapshot.net_position = total_assets - total_liabilities
-        
-        # Calculate profit margin if we have sales data
-        if data.get('ytd_sales'):
-            snapshot.ytd_sales = Decimal(str(data['ytd_sales']))
-        if data.get('ytd_profit'):
-            snapshot.ytd_profit = Decimal(str(data['ytd_profit']))
-            if snapshot.ytd_sales and snapshot.ytd_sales > 0:
-                snapshot.profit_margin = (snapshot.ytd_profit / snapshot.ytd_sales * 100)
-        
-        db.session.commit()
-        
-        return jsonify({
-            "success": True,
-            "snapshot_id": snapshot.id,
-            "summary": {
-                "total_assets": float(total_assets),
-                "total_liabilities": float(total_liabilities),
-                "net_position": float(snapshot.net_position)
-            }
-        })
+        payload, status = write_queue.run(write_snapshot, data, snapshot_date)
+        return jsonify(payload), status
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
 
+def write_snapshot(data, snapshot_date):
+    """Create a completed snapshot (replacing its draft, if any). Runs through the write queue."""
+    # Delete draft if publishing from draft
+    draft_id = data.get('draft_id')
+    if draft_id:
+        draft = Snapshot.query.get(draft_id)
+        if draft and draft.status == 'draft':
+            # Publishing from a stale tab must not discard newer edits
+            if not claim_version(draft, data.get('version')):
+                return version_conflict(draft, "Draft")
+            AccountBalance.query.filter_by(snapshot_id=draft.id).delete(synchronize_session=False)
+            db.session.delete(draft)
+    
+    # Create snapshot
+    snapshot = Snapshot(
+        store_id=data['store_id'],
+        snapshot_date=snapshot_date,
+        created_by='wizard',
+        notes=data.get('notes', ''),
+        status='completed'
+    )
+    
+    db.session.add(snapshot)
+    db.session.flush()  # Get the snapshot ID
+    
+    # Resolve every submitted account in one query and bulk insert the balances
+    rows, total_assets, total_liabilities = build_balance_rows(
+        data['balances'], snapshot.id, include_notes=True
+    )
+    if rows:
+        db.session.execute(insert(AccountBalance), rows)
+    
+    # Update snapshot totals and the profit margin if we have sales data
+    ytd_sales = Decimal(str(data['ytd_sales'])) if data.get('ytd_sales') else None
+    ytd_profit = Decimal(str(data['ytd_profit'])) if data.get('ytd_profit') else None
+    totals = {**balance_columns(total_assets, total_liabilities), **ytd_columns(ytd_sales, ytd_profit)}
+    for column, value in totals.items():
+        setattr(snapshot, column, value)
+    
+    # Surface constraint errors here rather than at the shared commit
+    db.session.flush()
+    refresh_summaries([snapshot.id])
+    
+    return {
+        "success": True,
+        "snapshot_id": snapshot.id,
+        "summary": {
+            "total_assets": float(total_assets),
+            "total_liabilities": float(total_liabilities),
+            "net_position": float(snapshot.net_position)
+        }
+    }, 200
+
+def load_account_categories(account_ids):
+    """Map account id -> account type category for all given ids in one query"""
+    if not account_ids:
+        return {}
+    
+    rows = db.session.query(
+        Account.id,
+        AccountType.category
+    ).join(
+        AccountType, Account.account_type_id == AccountType.id
+    ).filter(
+        Account.id.in_(account_ids)
+    ).all()
+    
+    return {row.id: row.category for row in rows}
+
+def build_balance_rows(balances_data, snapshot_id, include_notes=False):
+    """Turn submitted balances into AccountBalance insert rows and totals.
+    
+    Unknown or missing account ids are skipped, as before. Returns
+    (rows, total_assets, total_liabilities).
+    """
+    parsed = []
+    for balance_data in balances_data:
+        account_id = balance_data.get('account_id')
+        amount = Decimal(str(balance_data.get('amount', 0)))
+        
+        if not account_id:
+            continue
+        try:
+            account_id = int(account_id)
+        except (TypeError, ValueError):
+            continue
+        
+        parsed.append((account_id, amount, balance_data))
+    
+    categories = load_account_categories({account_id for account_id, _, _ in parsed})
+    
+    rows = []
+    total_assets = Decimal('0')
+    total_liabilities = Decimal('0')
+    
+    for account_id, amount, balance_data in parsed:
+        category = categories.get(account_id)
+        if category is None:
+            continue
+        
+        row = {
+            "snapshot_id": snapshot_id,
+            "account_id": account_id,
+            "balance": amount
+        }
+        if include_notes:
+            row["notes"] = balance_data.get('notes', '')
+        rows.append(row)
+        
+        assets, liabilities = contribution(category, amount)
+        total_assets += assets
+        total_liabilities += liabilities
+    
+    return rows, total_assets, total_liabilities
+
+def apply_draft_balance_diff(draft_id, rows):
+    """Reconcile a draft's stored balances with the submitted rows.
+    
+    Inserts balances for new accounts, updates the ones whose amount changed
+    and deletes the ones no longer submitted, leaving identical rows alone.
+    Returns the number of rows in each bucket.
+    """
+    existing = {
+        row.account_id: row
+        for row in db.session.query(
+            AccountBalance.id,
+            AccountBalance.account_id,
+            AccountBalance.balance
+        ).filter(
+            AccountBalance.snapshot_id == draft_id
+        ).all()
+    }
+    
+    # Last submitted amount wins if an account is sent twice
+    incoming = {row["account_id"]: row for row in rows}
+    
+    to_insert = []
+    to_update = []
+    unchanged = 0
+    now = datetime.utcnow()
+    
+    for account_id, row in incoming.items():
+        current = existing.get(account_id)
+        if current is None:
+            to_insert.append(row)
+        elif current.balance != row["balance"].quantize(CENT):
+            to_update.append({"id": current.id, "balance": row["balance"], "updated_at": now})
+        else:
+            unchanged += 1
+    
+    to_delete = [row.id for account_id, row in existing.items() if account_id not in incoming]
+    
+    if to_insert:
+        db.session.execute(insert(AccountBalance), to_insert)
+    if to_update:
+        db.session.execute(update(AccountBalance), to_update)
+    if to_delete:
+        AccountBalance.query.filter(
+            AccountBalance.id.in_(to_delete)
+        ).delete(synchronize_session=False)
+    
+    return {
+        "inserted": len(to_insert),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+        "unchanged": unchanged
+    }
+
+def valid_version(value):
+    """Whether a client-sent version is absent or an integer (JSON number or query string)"""
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    return isinstance(value, str) and re.fullmatch(r'-?\d+', value.strip()) is not None
+
+def claim_version(obj, expected_version, **values):
+    """Write ``values`` to a loaded Snapshot or Account and bump its version.
+    
+    Runs one ``UPDATE ... SET version = version + 1 WHERE id = ? AND version = ?``
+    against the version that was loaded, so of two writers that read the same
+    row only the first gets through. ``expected_version`` is the version the
+    client last saw, already checked by ``valid_version``; None skips that check (clients that do not send one keep
+    last-write-wins). Returns False, having written nothing, if either check fails.
+    """
+    model = type(obj)
+    if expected_version is not None and int(expected_version) != obj.version:
+        return False
+    
+    values.setdefault('updated_at', datetime.utcnow())
+    result = db.session.execute(
+        update(model)
+        .where(model.id == obj.id, model.version == obj.version)
+        .values(version=obj.version + 1, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    
+    # Mirror the write on the loaded object without marking it dirty
+    for key, value in {**values, 'version': obj.version + 1}.items():
+        set_committed_value(obj, key, value)
+    return True
+
+def version_conflict(obj, label):
+    """409 payload with the version now stored, so the client knows to reload"""
+    model = type(obj)
+    current = db.session.query(model.version).filter(model.id == obj.id).scalar()
+    return {
+        "success": False,
+        "error": f"{label} was changed elsewhere since you loaded it; reload it and try again",
+        "conflict": True,
+        "version": current
+    }, 409
+
 @wizard_bp.route("/latest-snapshot/<int:store_id>", methods=["GET"])
 def get_latest_snapshot(store_id):
     """Get the latest snapshot for a store to use as a template"""
@@ -278,84 +449,72 @@ def save_draft():
     """Save or update a draft snapshot"""
     try:
         data = request.get_json()
+        if not valid_version(data.get('version')):
+            return jsonify({"success": False, "error": "Version must be an integer"}), 400
+        snapshot_date = datetime.strptime(data['snapshot_date'], '%Y-%m-%d').date()
         
-        # Check if updating existing draft
-        draft_id = data.get('draft_id')
-        
-        if draft_id:
-            # Update existing draft
-            draft = Snapshot.query.get(draft_id)
-            if not draft or draft.status != 'draft':
-                return jsonify({"success": False, "error": "Draft not found"}), 404
-            
-            # Update date if changed
-            new_date = datetime.strptime(data['snapshot_date'], '%Y-%m-%d').date()
-            if draft.snapshot_date != new_date:
-                draft.snapshot_date = new_date
-            
-            # Clear existing balances
-            AccountBalance.query.filter_by(snapshot_id=draft_id).delete()
-        else:
-            # Create new draft
-            draft = Snapshot(
-                store_id=data['store_id'],
-                snapshot_date=datetime.strptime(data['snapshot_date'], '%Y-%m-%d').date(),
-                created_by='wizard',
-                notes='',
-                status='draft'  # Mark as draft
-            )
-            db.session.add(draft)
-            db.session.flush()
-        
-        # Add account balances
-        total_assets = Decimal('0')
-        total_liabilities = Decimal('0')
-        balance_count = 0
-        
-        for balance_data in data.get('balances', []):
-            account_id = balance_data.get('account_id')
-            amount = Decimal(str(balance_data.get('amount', 0)))
-            
-            if not account_id:
-                continue
-            
-            account = Account.query.get(account_id)
-            if not account:
-                continue
-            
-            balance = AccountBalance(
-                snapshot_id=draft.id,
-                account_id=account_id,
-                balance=amount
-            )
-            db.session.add(balance)
-            balance_count += 1
-            
-            if account.account_type.category == 'Asset':
-                total_assets += abs(amount)
-            elif account.account_type.category == 'Liability':
-                total_liabilities += abs(amount)
-        
-        # Update totals
-        draft.total_assets = total_assets
-        draft.total_liabilities = total_liabilities
-        draft.net_position = total_assets - total_liabilities
-        draft.updated_at = datetime.utcnow()
-        
-        db.session.commit()
-        
-        return jsonify({
-            "success": True,
-            "draft_id": draft.id,
-            "balance_count": balance_count,
-            "message": f"Draft saved successfully with {balance_count} balances"
-        })
+        payload, status = write_queue.run(write_draft, data, snapshot_date)
+        return jsonify(payload), status
         
     except Exception as e:
         db.session.rollback()
         print(f"Error saving draft: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def write_draft(data, snapshot_date):
+    """Create a draft or reconcile an existing one with the submitted balances. Runs through the write queue."""
+    # Check if updating existing draft
+    draft_id = data.get('draft_id')
+    
+    if draft_id:
+        # Update existing draft
+        draft = Snapshot.query.get(draft_id)
+        if not draft or draft.status != 'draft':
+            return {"success": False, "error": "Draft not found"}, 404
+    else:
+        # Create new draft
+        draft = Snapshot(
+            store_id=data['store_id'],
+            snapshot_date=snapshot_date,
+            created_by='wizard',
+            notes='',
+            status='draft'  # Mark as draft
+        )
+        db.session.add(draft)
+        db.session.flush()
+    
+    # Resolve every submitted account in one query
+    rows, total_assets, total_liabilities = build_balance_rows(
+        data.get('balances', []), draft.id
+    )
+    
+    totals = balance_columns(total_assets, total_liabilities)
+    
+    if draft_id:
+        # Claim the draft (and write its totals) before touching balances, so a stale save writes nothing
+        if not claim_version(draft, data.get('version'), snapshot_date=snapshot_date, **totals):
+            return version_conflict(draft, "Draft")
+        # Only touch the balances that actually changed
+        changes = apply_draft_balance_diff(draft.id, rows)
+    else:
+        if rows:
+            db.session.execute(insert(AccountBalance), rows)
+        changes = {"inserted": len(rows), "updated": 0, "deleted": 0, "unchanged": 0}
+        for key, value in totals.items():
+            setattr(draft, key, value)
+        draft.updated_at = datetime.utcnow()
+        db.session.flush()
+    balance_count = len(rows)
+    
+    return {
+        "success": True,
+        "draft_id": draft.id,
+        "version": draft.version,
+        "balance_count": balance_count,
+        "changes": changes,
+        "message": f"Draft saved successfully with {balance_count} balances"
+    }, 200
+
 @wizard_bp.route("/draft/<int:draft_id>", methods=["GET"])
 def get_draft(draft_id):
     """Get a specific draft with all its balances"""
@@ -399,6 +558,7 @@ def get_draft(draft_id):
                 "total_assets": float(draft.total_assets) if draft.total_assets else 0,
                 "total_liabilities": float(draft.total_liabilities) if draft.total_liabilities else 0,
                 "net_position": float(draft.net_position) if draft.net_position else 0,
+                "version": draft.version,
                 "created_at": draft.created_at.isoformat() if draft.created_at else None,
                 "updated_at": draft.updated_at.isoformat() if draft.updated_at else None,
                 "balances": balance_list,
@@ -410,24 +570,150 @@ def get_draft(draft_id):
         print(f"Error loading draft: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@wizard_bp.route("/draft/<int:draft_id>/balances", methods=["PATCH"])
+def patch_draft_balances(draft_id):
+    """Apply only the changed cells of a draft and adjust its totals incrementally"""
+    try:
+        data = request.get_json() or {}
+        if not valid_version(data.get('version')):
+            return jsonify({"success": False, "error": "Version must be an integer"}), 400
+        snapshot_date = datetime.strptime(data['snapshot_date'], '%Y-%m-%d').date() if data.get('snapshot_date') else None
+        
+        payload, status = write_queue.run(write_draft_patch, draft_id, data, snapshot_date)
+        return jsonify(payload), status
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error patching draft balances: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def write_draft_patch(draft_id, data, snapshot_date):
+    """Apply edited cells to a draft and adjust its totals. Runs through the write queue."""
+    draft = Snapshot.query.get(draft_id)
+    if not draft or draft.status != 'draft':
+        return {"success": False, "error": "Draft not found"}, 404
+    
+    # account_id -> new amount, or None to remove the balance
+    edits = {}
+    for balance_data in data.get('balances', []):
+        try:
+            account_id = int(balance_data.get('account_id'))
+        except (TypeError, ValueError):
+            continue
+        amount = balance_data.get('amount')
+        edits[account_id] = Decimal(str(amount)) if amount is not None else None
+    
+    # Current stored balance and category of every edited account in one query
+    current = {}
+    if edits:
+        current = {
+            row.id: row
+            for row in db.session.query(
+                Account.id,
+                AccountType.category,
+                AccountBalance.id.label('balance_id'),
+                AccountBalance.balance
+            ).join(
+                AccountType, Account.account_type_id == AccountType.id
+            ).outerjoin(
+                AccountBalance, and_(
+                    AccountBalance.account_id == Account.id,
+                    AccountBalance.snapshot_id == draft_id
+                )
+            ).filter(
+                Account.id.in_(edits)
+            ).all()
+        }
+    
+    to_insert = []
+    to_update = []
+    to_delete = []
+    delta_assets = Decimal('0')
+    delta_liabilities = Decimal('0')
+    now = datetime.utcnow()
+    
+    for account_id, amount in edits.items():
+        row = current.get(account_id)
+        if row is None:
+            continue
+        
+        old_assets, old_liabilities = contribution(row.category, row.balance if row.balance_id is not None else Decimal('0'))
+        new_assets, new_liabilities = contribution(row.category, amount if amount is not None else Decimal('0'))
+        
+        if amount is None:
+            if row.balance_id is None:
+                continue
+            to_delete.append(row.balance_id)
+        elif row.balance_id is None:
+            to_insert.append({"snapshot_id": draft_id, "account_id": account_id, "balance": amount})
+        elif row.balance != amount.quantize(CENT):
+            to_update.append({"id": row.balance_id, "balance": amount, "updated_at": now})
+        else:
+            continue
+        
+        delta_assets += new_assets - old_assets
+        delta_liabilities += new_liabilities - old_liabilities
+    
+    # Claim the draft before writing any balance, so a stale save writes nothing
+    values = balance_columns(
+        (draft.total_assets or Decimal('0')) + delta_assets,
+        (draft.total_liabilities or Decimal('0')) + delta_liabilities
+    )
+    values["updated_at"] = now
+    if snapshot_date:
+        values["snapshot_date"] = snapshot_date
+    if not claim_version(draft, data.get('version'), **values):
+        return version_conflict(draft, "Draft")
+    
+    if to_insert:
+        db.session.execute(insert(AccountBalance), to_insert)
+    if to_update:
+        db.session.execute(update(AccountBalance), to_update)
+    if to_delete:
+        AccountBalance.query.filter(
+            AccountBalance.id.in_(to_delete)
+        ).delete(synchronize_session=False)
+    
+    return {
+        "success": True,
+        "draft_id": draft.id,
+        "version": draft.version,
+        "changes": {
+            "inserted": len(to_insert),
+            "updated": len(to_update),
+            "deleted": len(to_delete),
+            "skipped": len([a for a in edits if a not in current])
+        },
+        "summary": {
+            "total_assets": float(draft.total_assets),
+            "total_liabilities": float(draft.total_liabilities),
+            "net_position": float(draft.net_position)
+        }
+    }, 200
+
 @wizard_bp.route("/draft/<int:draft_id>", methods=["DELETE"])
 def delete_draft(draft_id):
     """Delete a draft"""
     try:
-        draft = Snapshot.query.get(draft_id)
-        if not draft or draft.status != 'draft':
-            return jsonify({"success": False, "error": "Draft not found"}), 404
-        
-        # Delete associated balances (cascade should handle this)
-        db.session.delete(draft)
-        db.session.commit()
-        
-        return jsonify({"success": True, "message": "Draft deleted"})
+        payload, status = write_queue.run(remove_draft, draft_id)
+        return jsonify(payload), status
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
 
+def remove_draft(draft_id):
+    """Delete a draft and its balances. Runs through the write queue."""
+    draft = Snapshot.query.get(draft_id)
+    if not draft or draft.status != 'draft':
+        return {"success": False, "error": "Draft not found"}, 404
+    
+    # Delete associated balances (cascade should handle this)
+    db.session.delete(draft)
+    db.session.flush()
+    
+    return {"success": True, "message": "Draft deleted"}, 200
+
 @wizard_bp.route("/add-account", methods=["POST"])
 def add_account():
     """Add a new account to a store"""
@@ -488,11 +774,9 @@ def add_account():
 def get_account_types():
     """Get all available account types"""
     try:
-        account_types = AccountType.query.order_by(AccountType.sort_order).all()
-        
         return jsonify({
             "success": True,
-            "account_types": [at.to_dict() for at in account_types]
+            "account_types": reference_cache.account_types()
         })
         
     except Exception as e:
@@ -515,14 +799,25 @@ def create_account_type():
         if existing:
             return jsonify({"success": False, "error": "Account type already exists"}), 400
         
+        classification = default_classification(data['name'], data['category'])
+        if data.get('section'):
+            classification = {"section": data['section'], "liquidity": default_liquidity(data['section'])}
+        if data.get('liquidity'):
+            classification["liquidity"] = data['liquidity']
+        error = validate_classification(data['category'], **classification)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
         account_type = AccountType(
             name=data['name'],
             category=data['category'],
-            sort_order=data.get('sort_order', 0)
+            sort_order=data.get('sort_order', 0),
+            **classification
         )
         
         db.session.add(account_type)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             "success": True,
@@ -535,7 +830,7 @@ def create_account_type():
 
 @wizard_bp.route("/account-type/<int:type_id>", methods=["PUT"])
 def update_account_type(type_id):
-    """Update an account type"""
+    """Update an account type, including its balance sheet ``section`` and ``liquidity``"""
     try:
         data = request.get_json()
         account_type = AccountType.query.get(type_id)
@@ -543,6 +838,8 @@ def update_account_type(type_id):
         if not account_type:
             return jsonify({"success": False, "error": "Account type not found"}), 404
         
+        section, liquidity = account_type.section, account_type.liquidity
+        
         # Update fields
         if data.get('name'):
             account_type.name = data['name']
@@ -550,8 +847,30 @@ def update_account_type(type_id):
             account_type.category = data['category']
         if 'sort_order' in data:
             account_type.sort_order = data['sort_order']
+        if data.get('section'):
+            account_type.section = data['section']
+        elif validate_classification(account_type.category, account_type.section, None):
+            # The category moved to the other side of the balance sheet
+            account_type.section = default_classification(account_type.name, account_type.category)["section"]
+        if data.get('liquidity'):
+            account_type.liquidity = data['liquidity']
+        elif account_type.section != section:
+            account_type.liquidity = default_liquidity(account_type.section)
+        
+        error = validate_classification(account_type.category, account_type.section, account_type.liquidity)
+        if error:
+            db.session.rollback()
+            return jsonify({"success": False, "error": error}), 400
+        
+        if account_type.section != section:
+            db.session.flush()
+            refresh_account_summaries(select(Account.id).where(Account.account_type_id == type_id))
         
         db.session.commit()
+        reference_cache.invalidate()
+        if (account_type.section, account_type.liquidity) != (section, liquidity):
+            # Completed balance sheets list accounts by section and liquidity
+            balance_sheet_cache.invalidate()
         
         return jsonify({
             "success": True,
@@ -578,6 +897,7 @@ def delete_account_type(type_id):
         
         db.session.delete(account_type)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             "success": True,
@@ -592,22 +912,36 @@ def update_account(account_id):
     """Update an account"""
     try:
         data = request.get_json()
+        if not valid_version(data.get('version')):
+            return jsonify({"success": False, "error": "Version must be an integer"}), 400
         account = Account.query.get(account_id)
         
         if not account:
             return jsonify({"success": False, "error": "Account not found"}), 404
         
         # Update fields
+        values = {}
         if data.get('account_name'):
-            account.account_name = data['account_name']
+            values['account_name'] = data['account_name']
         if data.get('account_type_id'):
-            account.account_type_id = data['account_type_id']
+            values['account_type_id'] = data['account_type_id']
         if 'bank_id' in data:
-            account.bank_id = data['bank_id']
+            values['bank_id'] = data['bank_id']
         if 'account_number' in data:
-            account.account_number = data['account_number']
+            values['account_number'] = data['account_number']
+        
+        section = reference_cache.account_type_section(account.account_type_id)
+        if not claim_version(account, data.get('version'), **values):
+            payload, status = version_conflict(account, "Account")
+            db.session.rollback()
+            return jsonify(payload), status
+        
+        if reference_cache.account_type_section(account.account_type_id) != section:
+            refresh_account_summaries([account.id])
         
         db.session.commit()
+        # Completed balance sheets show account names and types
+        balance_sheet_cache.invalidate()
         
         return jsonify({
             "success": True,
@@ -622,11 +956,9 @@ def update_account(account_id):
 def get_banks():
     """Get all available banks"""
     try:
-        banks = Bank.query.filter_by(is_active=True).order_by(Bank.name).all()
-        
         return jsonify({
             "success": True,
-            "banks": [bank.to_dict() for bank in banks]
+            "banks": reference_cache.banks(active_only=True)
         })
         
     except Exception as e:
@@ -647,6 +979,7 @@ def create_bank():
             if not existing.is_active:
                 existing.is_active = True
                 db.session.commit()
+                reference_cache.invalidate()
                 return jsonify({
                     "success": True,
                     "bank": existing.to_dict(),
@@ -662,6 +995,7 @@ def create_bank():
         
         db.session.add(bank)
         db.session.commit()
+        reference_cache.invalidate()
         
         return jsonify({
             "success": True,
@@ -676,6 +1010,9 @@ def create_bank():
 def delete_account(account_id):
     """Delete an account (soft delete by marking as inactive)"""
     try:
+        if not valid_version(request.args.get('version')):
+            return jsonify({"success": False, "error": "Version must be an integer"}), 400
+        
         # Get the account
         account = Account.query.get(account_id)
         
@@ -687,7 +1024,10 @@ def delete_account(account_id):
         
         if has_balances:
             # Soft delete - just mark as inactive
-            account.is_active = False
+            if not claim_version(account, request.args.get('version'), is_active=False):
+                payload, status = version_conflict(account, "Account")
+                db.session.rollback()
+                return jsonify(payload), status
             db.session.commit()
             
             return jsonify({
@@ -710,108 +1050,68 @@ def delete_account(account_id):
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Largest chunk a bulk import may ask to commit at once
+MAX_IMPORT_CHUNK_SIZE = 10000
+
 @wizard_bp.route("/bulk-import", methods=["POST"])
 def bulk_import_accounts():
-    """Bulk import multiple accounts at once"""
-    try:
-        data = request.get_json()
-        accounts_data = data.get('accounts', [])
-        
-        if not accounts_data:
-            return jsonify({"success": False, "error": "No accounts provided"}), 400
-        
-        # Get all stores for mapping
-        stores = {s.name: s for s in Store.query.all()}
-        
-        # Get all account types for mapping
-        account_types = {at.name: at for at in AccountType.query.all()}
-        
-        # Get all banks for mapping
-        banks = {b.name: b for b in Bank.query.all()}
-        
-        created_count = 0
-        skipped_count = 0
-        errors = []
+    """Bulk import accounts from a JSON, NDJSON or CSV body.
+    
+    Rows are committed in chunks of ``?chunk_size`` (default
+    IMPORT_CHUNK_SIZE). With ``?stream=true`` or ``?format=ndjson`` one
+    progress line is streamed per committed chunk, followed by the summary.
+    With ``?background=true`` the body is imported by a job and 202 is
+    returned with the job id.
+    """
+    chunk_size = parse_limit(
+        request.args.get('chunk_size', type=int),
+        default=current_app.config.get('IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+        maximum=MAX_IMPORT_CHUNK_SIZE
+    )
+    
+    if request.args.get('background', 'false').lower() == 'true':
+        try:
+            path = spool_to_file(request.stream, current_app.config.get('IMPORT_UPLOAD_DIR'))
+            job = job_runner.enqueue('account_import', {
+                "path": path,
+                "mimetype": request.mimetype,
+                "chunk_size": chunk_size
+            })
+            return jsonify({"success": True, "job": job.to_dict(), "job_url": f"/api/jobs/{job.id}"}), 202
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    if wants_stream():
+        dumps = current_app.json.dumps
         
-        for acc_data in accounts_data:
+        def generate():
+            importer = AccountImporter(chunk_size)
             try:
-                # Get or skip store
-                store_name = acc_data.get('storeName')
-                store = stores.get(store_name)
-                if not store:
-                    # Try partial match for stores like "Slice Yorktown"
-                    for sname, sobj in stores.items():
-                        if sname in store_name or store_name in sname:
-                            store = sobj
-                            break
-                    
-                    if not store:
-                        errors.append(f"Store not found: {store_name}")
-                        continue
-                
-                # Get account type
-                account_type_name = acc_data.get('accountType')
-                account_type = account_types.get(account_type_name)
-                if not account_type:
-                    errors.append(f"Account type not found: {account_type_name}")
-                    continue
-                
-                # Get bank (optional)
-                bank_name = acc_data.get('bank')
-                bank = None
-                if bank_name:
-                    bank = banks.get(bank_name)
-                    if not bank and bank_name not in ['', '-', None]:
-                        # Create the bank if it doesn't exist
-                        bank = Bank(name=bank_name, is_active=True)
-                        db.session.add(bank)
-                        db.session.flush()
-                        banks[bank_name] = bank
-                
-                # Check if account already exists
-                account_name = acc_data.get('accountName', '')
-                existing = Account.query.filter_by(
-                    store_id=store.id,
-                    account_name=account_name
-                ).first()
-                
-                if existing:
-                    # Reactivate if it was deactivated
-                    if not existing.is_active:
-                        existing.is_active = True
-                        created_count += 1
-                    else:
-                        skipped_count += 1
-                    continue
-                
-                # Create new account
-                account = Account(
-                    store_id=store.id,
-                    account_name=account_name,
-                    account_type_id=account_type.id,
-                    bank_id=bank.id if bank else None,
-                    account_number=acc_data.get('accountNumber'),
-                    is_active=True
-                )
-                db.session.add(account)
-                created_count += 1
-                
+                for progress in importer.import_rows(iter_request_rows(request)):
+                    yield dumps({"progress": progress}) + "\n"
+                yield dumps({"success": True, **importer.summary()}) + "\n"
             except Exception as e:
-                errors.append(f"Error processing {acc_data.get('accountName', 'unknown')}: {str(e)}")
+                db.session.rollback()
+                yield dumps({"success": False, "error": str(e), **importer.summary()}) + "\n"
         
-        db.session.commit()
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    
+    importer = None
+    try:
+        importer = AccountImporter(chunk_size)
+        summary = importer.run(iter_request_rows(request))
         
-        return jsonify({
-            "success": True,
-            "created": created_count,
-            "skipped": skipped_count,
-            "errors": errors,
-            "message": f"Imported {created_count} accounts, skipped {skipped_count} existing"
-        })
+        if not summary["rows"]:
+            return jsonify({"success": False, "error": "No accounts provided"}), 400
+        
+        return jsonify({"success": True, **summary})
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({"success": False, "error": str(e)}), 500
+        # Chunks committed before the failure stay imported
+        partial = importer.summary() if importer else {}
+        return jsonify({"success": False, "error": str(e), **partial}), 500
 
 @wizard_bp.route("/add-intercompany-accounts", methods=["POST"])
 def add_intercompany_accounts():
@@ -918,10 +1218,14 @@ def get_intercompany_pairs():
                 "pairs": []
             })
         
-        receivables = Account.query.filter_by(
+        receivables = with_relationships(Account.query.filter_by(
             account_type_id=receivable_type.id,
             is_active=True
-        ).all()
+        ), "intercompany_receivables").all()
+        
+        # Every payable candidate in one query instead of one LIKE per receivable;
+        # the first match by id stands in for the old per-row .first()
+        payables = Account.query.filter(Account.account_name.like("%Owed to %")).order_by(Account.id).all()
         
         pairs = []
         for receivable in receivables:
@@ -931,13 +1235,14 @@ def get_intercompany_pairs():
                 parts = receivable.account_name.split(" owes ")
                 if len(parts) == 2:
                     debtor_name = parts[0]
-                    creditor_store = Store.query.get(receivable.store_id)
+                    creditor_store = receivable.store
                     
                     # Try to find the corresponding payable
-                    payable_name_pattern = f"Owed to {creditor_store.name}"
-                    payable = Account.query.filter(
-                        Account.account_name.like(f"%{payable_name_pattern}%")
-                    ).first()
+                    payable_name_pattern = f"Owed to {creditor_store.name}".lower()
+                    payable = next(
+                        (account for account in payables if payable_name_pattern in account.account_name.lower()),
+                        None
+                    )
                     
                     pairs.append({
                         "creditor_store": creditor_store.name if creditor_store else "Unknown",
@@ -958,9 +1263,11 @@ def get_intercompany_pairs():
 
 @wizard_bp.route("/store-snapshots/<int:store_id>", methods=["GET"])
 def get_store_snapshots(store_id):
-    """Get all snapshots for a specific store with filtering"""
+    """Get snapshots for a specific store with filtering, newest first, one page at a time"""
     try:
         type_filter = request.args.get('type', 'all')
+        limit = parse_limit(request.args.get('limit', type=int), default=100, maximum=500)
+        cursor = request.args.get('cursor')
         
         # Build query
         query = Snapshot.query.filter_by(store_id=store_id)
@@ -971,145 +1278,65 @@ def get_store_snapshots(store_id):
         elif type_filter == 'draft':
             query = query.filter_by(status='draft')
         
-        # Order by date descending
-        snapshots = query.order_by(desc(Snapshot.snapshot_date), desc(Snapshot.id)).all()
+        # Order by date descending, continuing after the cursor if given
+        try:
+            query = keyset_order(query, Snapshot.snapshot_date, Snapshot.id, cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        snapshots_list = []
-        for snapshot in snapshots:
-            snapshots_list.append({
-                "id": snapshot.id,
-                "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
-                "status": snapshot.status,
-                "total_assets": float(snapshot.total_assets) if snapshot.total_assets else 0,
-                "total_liabilities": float(snapshot.total_liabilities) if snapshot.total_liabilities else 0,
-                "net_position": float(snapshot.net_position) if snapshot.net_position else 0,
-                "ytd_sales": float(snapshot.ytd_sales) if snapshot.ytd_sales else 0,
-                "ytd_profit": float(snapshot.ytd_profit) if snapshot.ytd_profit else 0,
-                "created_at": snapshot.created_at.isoformat() if snapshot.created_at else None,
-                "updated_at": snapshot.updated_at.isoformat() if snapshot.updated_at else None
-            })
+        if wants_stream():
+            if 'limit' in request.args:
+                query = query.limit(limit)
+            return stream_rows(query, "snapshots", store_snapshot_dict)
+        
+        snapshots, next_cursor = fetch_page(
+            query, limit, lambda s: s.snapshot_date, lambda s: s.id
+        )
         
         return jsonify({
             "success": True,
-            "snapshots": snapshots_list
+            "snapshots": [store_snapshot_dict(snapshot) for snapshot in snapshots],
+            "next_cursor": next_cursor
         })
         
     except Exception as e:
         print(f"Error getting store snapshots: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def store_snapshot_dict(snapshot):
+    return {
+        "id": snapshot.id,
+        "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
+        "status": snapshot.status,
+        "total_assets": float(snapshot.total_assets) if snapshot.total_assets else 0,
+        "total_liabilities": float(snapshot.total_liabilities) if snapshot.total_liabilities else 0,
+        "net_position": float(snapshot.net_position) if snapshot.net_position else 0,
+        "ytd_sales": float(snapshot.ytd_sales) if snapshot.ytd_sales else 0,
+        "ytd_profit": float(snapshot.ytd_profit) if snapshot.ytd_profit else 0,
+        "created_at": snapshot.created_at.isoformat() if snapshot.created_at else None,
+        "updated_at": snapshot.updated_at.isoformat() if snapshot.updated_at else None
+    }
+
 @wizard_bp.route("/balance-sheet/<int:snapshot_id>", methods=["GET"])
 def get_balance_sheet(snapshot_id):
     """Get complete balance sheet data for a snapshot"""
     try:
-        # Get snapshot with store info
-        snapshot = Snapshot.query.get(snapshot_id)
-        if not snapshot:
+        result = load_balance_sheet(snapshot_id)
+        if result is None:
             return jsonify({"success": False, "error": "Snapshot not found"}), 404
         
-        store = Store.query.get(snapshot.store_id)
-        
-        # Get all account balances with account details
-        balances = db.session.query(
-            AccountBalance,
-            Account,
-            AccountType,
-            Bank
-        ).join(
-            Account, AccountBalance.account_id == Account.id
-        ).join(
-            AccountType, Account.account_type_id == AccountType.id
-        ).outerjoin(
-            Bank, Account.bank_id == Bank.id
-        ).filter(
-            AccountBalance.snapshot_id == snapshot_id
-        ).order_by(
-            AccountType.sort_order,
-            Account.account_name
-        ).all()
-        
-        # Organize data for balance sheet
-        assets = {
-            "bank_accounts": [],
-            "merchant_accounts": [],
-            "inventory": [],
-            "other_assets": [],
-            "current_total": Decimal('0'),
-            "other_total": Decimal('0')
-        }
-        
-        liabilities = {
-            "current_liabilities": [],
-            "long_term": [],
-            "current_total": Decimal('0'),
-            "long_term_total": Decimal('0')
-        }
-        
-        for balance, account, account_type, bank in balances:
-            account_data = {
-                "account_id": account.id,
-                "account_name": account.account_name,
-                "account_number": account.account_number,
-                "balance": float(balance.balance),
-                "type": account_type.name,
-                "bank": bank.name if bank else None
-            }
-            
-            if account_type.category == 'Asset':
-                if account_type.name in ['Bank Checking', 'Bank Savings']:
-                    assets["bank_accounts"].append(account_data)
-                    assets["current_total"] += abs(balance.balance)
-                elif account_type.name in ['Merchant Account', 'Points']:
-                    assets["merchant_accounts"].append(account_data)
-                    assets["current_total"] += abs(balance.balance)
-                elif account_type.name == 'Inventory':
-                    assets["inventory"].append(account_data)
-                    assets["current_total"] += abs(balance.balance)
-                else:
-                    assets["other_assets"].append(account_data)
-                    assets["other_total"] += abs(balance.balance)
-            
-            elif account_type.category == 'Liability':
-                # Classify as current or long-term based on type
-                if account_type.name in ['Credit Card', 'Vendor Payable', 'Sales Tax Payable',
-                                        'Pending Refunds', 'Pending Shipments', 'Management Fee',
-                                        'Advertising Payable', 'Shipping Payable', 'Container Duties']:
-                    liabilities["current_liabilities"].append(account_data)
-                    liabilities["current_total"] += abs(balance.balance)
-                else:
-                    liabilities["long_term"].append(account_data)
-                    liabilities["long_term_total"] += abs(balance.balance)
-        
-        # Convert decimals to float for JSON serialization
-        assets["current_total"] = float(assets["current_total"])
-        assets["other_total"] = float(assets["other_total"])
-        liabilities["current_total"] = float(liabilities["current_total"])
-        liabilities["long_term_total"] = float(liabilities["long_term_total"])
-        
-        balance_sheet = {
-            "id": snapshot.id,
-            "store_id": snapshot.store_id,
-            "store_name": store.name if store else "Unknown",
-            "store_code": store.code if store else "N/A",
-            "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
-            "status": snapshot.status,
-            "assets": assets,
-            "liabilities": liabilities,
-            "total_assets": float(snapshot.total_assets) if snapshot.total_assets else 0,
-            "total_liabilities": float(snapshot.total_liabilities) if snapshot.total_liabilities else 0,
-            "net_position": float(snapshot.net_position) if snapshot.net_position else 0,
-            "ytd_sales": float(snapshot.ytd_sales) if snapshot.ytd_sales else 0,
-            "ytd_profit": float(snapshot.ytd_profit) if snapshot.ytd_profit else 0,
-            "profit_margin": float(snapshot.profit_margin) if snapshot.profit_margin else 0,
-            "created_by": snapshot.created_by,
-            "created_at": snapshot.created_at.isoformat() if snapshot.created_at else None,
-            "updated_at": snapshot.updated_at.isoformat() if snapshot.updated_at else None
-        }
+        etag, balance_sheet = result
+        if etag and etag in request.if_none_match:
+            return not_modified(etag)
         
-        return jsonify({
+        response = jsonify({
             "success": True,
             "balance_sheet": balance_sheet
         })
+        if etag:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         print(f"Error getting balance sheet: {str(e)}")
@@ -1117,6 +1344,297 @@ def get_balance_sheet(snapshot_id):
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+def load_balance_sheet(snapshot_id):
+    """Return (etag, balance_sheet) for a snapshot, or None if it does not exist.
+    
+    Completed snapshots never change, so their rendered balance sheet is kept
+    in the LRU cache and served without touching the database. Drafts are
+    always rebuilt and get no ETag.
+    """
+    cached = balance_sheet_cache.get(snapshot_id)
+    if cached is not None:
+        return cached
+    
+    snapshot = Snapshot.query.get(snapshot_id)
+    if not snapshot:
+        return None
+    
+    balance_sheet = build_balance_sheet(snapshot)
+    if snapshot.status != 'completed':
+        return None, balance_sheet
+    
+    result = (balance_sheet_etag(snapshot), balance_sheet)
+    balance_sheet_cache.put(snapshot_id, result)
+    return result
+
+def balance_sheet_etag(snapshot):
+    """Strong ETag from the snapshot id, its updated_at and the cache version"""
+    updated_at = snapshot.updated_at.isoformat() if snapshot.updated_at else ''
+    digest = hashlib.sha1(
+        f"{snapshot.id}:{updated_at}:{balance_sheet_cache.version()}".encode()
+    ).hexdigest()[:16]
+    return f"bs-{snapshot.id}-{digest}"
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def build_balance_sheet(snapshot):
+    """Categorize a snapshot's balances into the balance sheet layout"""
+    store = reference_cache.store(snapshot.store_id)
+    
+    # Get all account balances; type and bank details come from the reference cache
+    rows = db.session.query(
+        AccountBalance.balance,
+        Account.id,
+        Account.account_name,
+        Account.account_number,
+        Account.account_type_id,
+        Account.bank_id
+    ).join(
+        Account, AccountBalance.account_id == Account.id
+    ).filter(
+        AccountBalance.snapshot_id == snapshot.id
+    ).all()
+    
+    balances = []
+    for row in rows:
+        account_type = reference_cache.account_type(row.account_type_id)
+        if not account_type:
+            continue
+        bank = reference_cache.bank(row.bank_id) if row.bank_id else None
+        balances.append((row, account_type, bank))
+    balances.sort(key=lambda item: (item[1]["sort_order"] or 0, item[0].account_name))
+    
+    # Organize data for balance sheet
+    assets = {
+        "bank_accounts": [],
+        "merchant_accounts": [],
+        "inventory": [],
+        "other_assets": [],
+        "current_total": Decimal('0'),
+        "other_total": Decimal('0')
+    }
+    
+    liabilities = {
+        "current_liabilities": [],
+        "long_term": [],
+        "current_total": Decimal('0'),
+        "long_term_total": Decimal('0')
+    }
+    
+    for account, account_type, bank in balances:
+        account_data = {
+            "account_id": account.id,
+            "account_name": account.account_name,
+            "account_number": account.account_number,
+            "balance": float(account.balance),
+            "type": account_type["name"],
+            "bank": bank["name"] if bank else None
+        }
+        
+        section = account_type["section"]
+        if section is None:
+            continue
+        current = account_type["liquidity"] == 'current'
+        if SECTION_PARENTS[section] == 'assets':
+            assets[section].append(account_data)
+            assets["current_total" if current else "other_total"] += abs(account.balance)
+        else:
+            liabilities[section].append(account_data)
+            liabilities["current_total" if current else "long_term_total"] += abs(account.balance)
+    
+    # Convert decimals to float for JSON serialization
+    assets["current_total"] = float(assets["current_total"])
+    assets["other_total"] = float(assets["other_total"])
+    liabilities["current_total"] = float(liabilities["current_total"])
+    liabilities["long_term_total"] = float(liabilities["long_term_total"])
+    
+    balance_sheet = {
+        "id": snapshot.id,
+        "store_id": snapshot.store_id,
+        "store_name": store["name"] if store else "Unknown",
+        "store_code": store["code"] if store else "N/A",
+        "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
+        "status": snapshot.status,
+        "assets": assets,
+        "liabilities": liabilities,
+        "total_assets": float(snapshot.total_assets) if snapshot.total_assets else 0,
+        "total_liabilities": float(snapshot.total_liabilities) if snapshot.total_liabilities else 0,
+        "net_position": float(snapshot.net_position) if snapshot.net_position else 0,
+        "ytd_sales": float(snapshot.ytd_sales) if snapshot.ytd_sales else 0,
+        "ytd_profit": float(snapshot.ytd_profit) if snapshot.ytd_profit else 0,
+        "profit_margin": float(snapshot.profit_margin) if snapshot.profit_margin else 0,
+        "created_by": snapshot.created_by,
+        "created_at": snapshot.created_at.isoformat() if snapshot.created_at else None,
+        "updated_at": snapshot.updated_at.isoformat() if snapshot.updated_at else None
+    }
+    
+    return balance_sheet
+
+# Most snapshots a single comparison request may span
+MAX_COMPARE_SNAPSHOTS = 24
+
+@wizard_bp.route("/compare", methods=["GET"])
+def compare_snapshots():
+    """Compare the balance sheets of two or more snapshots.
+    
+    ``?base=<id>&target=<id>`` compares two snapshots, ``?ids=<id>,<id>,...``
+    compares a series (e.g. a quarter of month-end sheets). Every value is
+    returned per snapshot in request order, and deltas are taken against the
+    first snapshot. ``?accounts=false`` leaves out the per-account rows and
+    reads the sections from the stored snapshot summaries.
+    """
+    try:
+        if request.args.get('ids'):
+            snapshot_ids = [int(value) for value in request.args['ids'].split(',') if value.strip()]
+        else:
+            snapshot_ids = [request.args.get('base', type=int), request.args.get('target', type=int)]
+    except ValueError:
+        return jsonify({"success": False, "error": "Snapshot ids must be integers"}), 400
+    
+    if None in snapshot_ids or len(snapshot_ids) < 2:
+        return jsonify({"success": False, "error": "At least two snapshot ids are required"}), 400
+    if len(set(snapshot_ids)) != len(snapshot_ids):
+        return jsonify({"success": False, "error": "Snapshot ids must be distinct"}), 400
+    if len(snapshot_ids) > MAX_COMPARE_SNAPSHOTS:
+        return jsonify({
+            "success": False,
+            "error": f"At most {MAX_COMPARE_SNAPSHOTS} snapshots can be compared at once"
+        }), 400
+    
+    try:
+        snapshots = {s.id: s for s in Snapshot.query.filter(Snapshot.id.in_(snapshot_ids)).all()}
+        missing = [snapshot_id for snapshot_id in snapshot_ids if snapshot_id not in snapshots]
+        if missing:
+            return jsonify({
+                "success": False,
+                "error": f"Snapshot not found: {', '.join(str(m) for m in missing)}"
+            }), 404
+        
+        comparison = build_comparison(
+            [snapshots[snapshot_id] for snapshot_id in snapshot_ids],
+            include_accounts=request.args.get('accounts', 'true').lower() != 'false'
+        )
+        return jsonify({"success": True, **comparison})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def build_comparison(snapshots, include_accounts=True):
+    """Per-account, per-section and total values and deltas for a list of snapshots.
+    
+    One grouped query pivots the balances of every snapshot into a column per
+    snapshot; an account missing from a snapshot gets NULL there, and counts
+    as zero in the deltas and section totals. Without ``include_accounts``
+    only the snapshot summaries are read.
+    """
+    count = len(snapshots)
+    if include_accounts:
+        accounts, section_sums = compare_accounts(snapshots)
+    else:
+        summaries = load_summaries(snapshots)
+        accounts = []
+        section_sums = {
+            name: [summaries[snapshot.id][name] for snapshot in snapshots]
+            for name in SECTION_COLUMNS
+        }
+    
+    sections = {}
+    total_assets = [Decimal('0')] * count
+    total_liabilities = [Decimal('0')] * count
+    for name, parent in BALANCE_SHEET_SECTIONS:
+        sums = section_sums[name]
+        sections[name] = {
+            "parent": parent,
+            "values": [float(value) for value in sums],
+            "deltas": comparison_deltas(sums)
+        }
+        totals = total_assets if parent == 'assets' else total_liabilities
+        for index, value in enumerate(sums):
+            totals[index] += value
+    net_position = [assets - liabilities for assets, liabilities in zip(total_assets, total_liabilities)]
+    
+    return {
+        "snapshots": [
+            {
+                "id": snapshot.id,
+                "store_id": snapshot.store_id,
+                "store_name": (reference_cache.store(snapshot.store_id) or {}).get("name", "Unknown"),
+                "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
+                "status": snapshot.status
+            }
+            for snapshot in snapshots
+        ],
+        "accounts": accounts,
+        "sections": sections,
+        "totals": {
+            name: {"values": [float(value) for value in values], "deltas": comparison_deltas(values)}
+            for name, values in (
+                ("total_assets", total_assets),
+                ("total_liabilities", total_liabilities),
+                ("net_position", net_position)
+            )
+        }
+    }
+
+def compare_accounts(snapshots):
+    """Per-account values of the snapshots and the section sums built from them"""
+    columns = [
+        func.sum(case((AccountBalance.snapshot_id == snapshot.id, AccountBalance.balance)))
+        for snapshot in snapshots
+    ]
+    rows = db.session.query(
+        Account.id,
+        Account.account_name,
+        Account.account_number,
+        Account.store_id,
+        Account.account_type_id,
+        Account.bank_id,
+        *columns
+    ).join(
+        AccountBalance, AccountBalance.account_id == Account.id
+    ).filter(
+        AccountBalance.snapshot_id.in_([snapshot.id for snapshot in snapshots])
+    ).group_by(Account.id).all()
+    
+    count = len(snapshots)
+    section_order = {name: index for index, (name, _) in enumerate(BALANCE_SHEET_SECTIONS)}
+    section_sums = {name: [Decimal('0')] * count for name, _ in BALANCE_SHEET_SECTIONS}
+    
+    accounts = []
+    for row in rows:
+        account_type = reference_cache.account_type(row.account_type_id)
+        section = account_type["section"] if account_type else None
+        if section is None:
+            continue
+        
+        values = [Decimal(value) if value is not None else None for value in row[6:]]
+        for index, value in enumerate(values):
+            if value is not None:
+                section_sums[section][index] += abs(value)
+        
+        bank = reference_cache.bank(row.bank_id) if row.bank_id else None
+        accounts.append({
+            "account_id": row.id,
+            "account_name": row.account_name,
+            "account_number": row.account_number,
+            "store_id": row.store_id,
+            "type": account_type["name"],
+            "bank": bank["name"] if bank else None,
+            "section": section,
+            "values": [float(value) if value is not None else None for value in values],
+            "deltas": comparison_deltas([value or Decimal('0') for value in values]),
+            "_order": (section_order[section], account_type["sort_order"] or 0, row.account_name)
+        })
+    accounts.sort(key=lambda account: account.pop("_order"))
+    return accounts, section_sums
+
+def comparison_deltas(values):
+    """Change of each value against the first one"""
+    return [float(value - values[0]) for value in values]
+
 @wizard_bp.route("/export-balance-sheet/<int:snapshot_id>", methods=["GET"])
 def export_balance_sheet(snapshot_id):
     """Export balance sheet as CSV or JSON"""
@@ -1124,13 +1642,15 @@ def export_balance_sheet(snapshot_id):
         format_type = request.args.get('format', 'json')
         
         # Get balance sheet data
-        response = get_balance_sheet(snapshot_id)
-        data = response[0].get_json()
-        
-        if not data['success']:
-            return response
+        result = load_balance_sheet(snapshot_id)
+        if result is None:
+            return jsonify({"success": False, "error": "Snapshot not found"}), 404
         
-        balance_sheet = data['balance_sheet']
+        etag, balance_sheet = result
+        if etag:
+            etag = f"{etag}-{format_type}"
+            if etag in request.if_none_match:
+                return not_modified(etag)
         
         if format_type == 'csv':
             # Create CSV export
@@ -1210,12 +1730,10 @@ def export_balance_sheet(snapshot_id):
                     writer.writerow(["Profit Margin", f"{balance_sheet['profit_margin']:.2f}%"])
             
             # Create response
-            from flask import Response
-            
             csv_output = output.getvalue()
             filename = f"balance_sheet_{balance_sheet['store_code']}_{balance_sheet['snapshot_date']}.csv"
             
-            return Response(
+            response = Response(
                 csv_output,
                 mimetype='text/csv',
                 headers={'Content-Disposition': f'attachment; filename={filename}'}
@@ -1223,7 +1741,15 @@ def export_balance_sheet(snapshot_id):
         
         else:
             # Return JSON
-            return jsonify(data)
+            response = jsonify({
+                "success": True,
+                "balance_sheet": balance_sheet
+            })
+        
+        if etag:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
     
     except Exception as e:
         print(f"Error exporting balance sheet: {str(e)}")
@@ -0,0 +1,42 @@
+"""Relationship loading declared per list view.
+
+``to_dict`` on Account and Snapshot reaches into related rows (account type,
+bank, store). Each list view below names the relationships its serializer
+touches, and ``with_relationships`` adds the matching loader options so the
+related rows come back with the list in a fixed number of queries instead of
+being lazy loaded one row at a time.
+"""
+from sqlalchemy.orm import contains_eager, joinedload
+
+from src.models.balance_sheet import Account, Snapshot
+
+# view name -> callable returning the loader options for that view
+VIEWS = {
+    # Account.to_dict(): account_type and bank
+    "account_list": lambda: (
+        joinedload(Account.account_type),
+        joinedload(Account.bank),
+    ),
+    # Snapshot.to_dict(): store
+    "snapshot_list": lambda: (
+        joinedload(Snapshot.store),
+    ),
+    # Wizard account picker: already joins account_types for ordering
+    "store_accounts": lambda: (
+        contains_eager(Account.account_type),
+        joinedload(Account.bank),
+    ),
+    # Intercompany pairs: the creditor store of each receivable
+    "intercompany_receivables": lambda: (
+        joinedload(Account.store),
+    ),
+}
+
+
+def with_relationships(query, view):
+    """Apply the eager loading a list view needs to ``query``"""
+    return query.options(*VIEWS[view]())
+
+
+def serialize_all(objects):
+    return [obj.to_dict() for obj in objects]
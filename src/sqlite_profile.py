@@ -0,0 +1,125 @@
+"""SQLite connection settings applied to every pooled connection.
+
+``SQLITE_PROFILE`` picks a set of PRAGMAs that each new DBAPI connection
+runs before it is handed to SQLAlchemy:
+
+``tuned`` (default)
+    WAL journal, so readers no longer block the writer and vice versa;
+    ``synchronous=NORMAL``, which is durable with WAL except for the last
+    transactions on power loss; a busy timeout so concurrent saves wait
+    for the write lock instead of failing; a memory-mapped file, a larger
+    page cache and in-memory temp tables.
+``default``
+    SQLite's own defaults (rollback journal, FULL sync), kept for
+    benchmarking against. The journal mode is stored in the database file,
+    so it is reset explicitly.
+
+Individual PRAGMAs can be overridden with ``SQLITE_PRAGMAS``, e.g.
+``"cache_size=-32000,mmap_size=0"``. Connections are pooled
+(``SQLITE_POOL_SIZE`` + ``SQLITE_MAX_OVERFLOW`` per process), since opening
+a connection and running the PRAGMAs is not free.
+"""
+import sqlite3
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+
+PROFILES = {
+    "default": {
+        "journal_mode": "DELETE",
+    },
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # ms
+        "mmap_size": 268435456,  # 256 MB
+        "cache_size": -65536,  # negative = KiB, so 64 MB
+        "temp_store": "MEMORY",
+    },
+}
+
+# Reported at startup, in this order
+REPORTED_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "temp_store")
+
+SYNCHRONOUS_NAMES = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+TEMP_STORE_NAMES = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+
+def parse_pragmas(value):
+    """Parse a SQLITE_PRAGMAS setting such as "cache_size=-32000,mmap_size=0" """
+    pragmas = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, setting = item.split("=", 1)
+            name = name.strip().lower()
+            if not name.isidentifier():
+                raise ValueError(f"Invalid PRAGMA name: {name}")
+            setting = setting.strip()
+            pragmas[name] = int(setting) if setting.lstrip("-").isdigit() else setting
+    return pragmas
+
+
+class SQLiteProfile:
+    def __init__(self):
+        self.name = None
+        self.pragmas = {}
+        self._listening = False
+
+    def init_app(self, app):
+        """Configure pooling and PRAGMAs. Call before ``db.init_app(app)``."""
+        self.name = app.config.get("SQLITE_PROFILE") or "tuned"
+        if self.name not in PROFILES:
+            raise ValueError(f"Unknown SQLITE_PROFILE {self.name!r}; use one of {', '.join(PROFILES)}")
+        self.pragmas = {**PROFILES[self.name], **parse_pragmas(app.config.get("SQLITE_PRAGMAS"))}
+
+        url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        if not url.drivername.startswith("sqlite"):
+            return
+
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        if url.database not in (None, "", ":memory:"):
+            # In-memory databases get a StaticPool from Flask-SQLAlchemy instead
+            options.setdefault("pool_size", int(app.config.get("SQLITE_POOL_SIZE") or 10))
+            options.setdefault("max_overflow", int(app.config.get("SQLITE_MAX_OVERFLOW") or 20))
+            options.setdefault("pool_timeout", 30)
+        if "busy_timeout" in self.pragmas:
+            # The driver's own lock wait, kept in step with the PRAGMA
+            options.setdefault("connect_args", {}).setdefault("timeout", self.pragmas["busy_timeout"] / 1000)
+
+        if not self._listening:
+            event.listen(Engine, "connect", self._on_connect)
+            self._listening = True
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    def report(self, engine):
+        """Effective settings as seen by a pooled connection"""
+        settings = {"profile": self.name}
+        if engine.dialect.name != "sqlite":
+            return settings
+        with engine.connect() as connection:
+            for name in REPORTED_PRAGMAS:
+                settings[name] = connection.execute(text(f"PRAGMA {name}")).scalar()
+        settings["synchronous"] = SYNCHRONOUS_NAMES.get(settings["synchronous"], settings["synchronous"])
+        settings["temp_store"] = TEMP_STORE_NAMES.get(settings["temp_store"], settings["temp_store"])
+        pool = engine.pool
+        settings["pool"] = type(pool).__name__
+        if hasattr(pool, "size"):
+            settings["pool_size"] = pool.size()
+            settings["max_overflow"] = getattr(pool, "_max_overflow", None)
+        return settings
+
+
+def format_report(settings):
+    return ", ".join(f"{name}={value}" for name, value in settings.items())
+
+
+sqlite_profile = SQLiteProfile()
@@ -3,6 +3,7 @@ let sessionId = null;
 let currentStoreId = null;
 let storeAccounts = {};
 let currentDraftId = null;
+let currentDraftVersion = null;
 let allStores = [];
 let currentDraftBalances = {};
 let accountToMove = null;
@@ -17,6 +18,7 @@ let dashboardData = {
     stores: []
 };
 let chartInstances = {};
+let reportSnapshotsCursor = null;
 
 // Inventory Helper State
 let masterSKUData = null;
@@ -26,7 +28,7 @@ let currentInventoryAccountId = null;
 let currentBalanceSheet = null;
 let comparisonMode = false;
 let currentSnapshot = null;
-let compareSnapshot = null;
+let comparison = null;
 
 
 // Initialize on load
@@ -1582,6 +1584,12 @@ async function saveDraft() {
 
     const balances = collectBalances();
 
+    // Existing drafts only send the cells that changed since the last save
+    if (currentDraftId) {
+        await patchDraft(snapshotDate, balances);
+        return;
+    }
+
     showLoading(true);
     try {
         const response = await fetch('/api/wizard/save-draft', {
@@ -1599,6 +1607,7 @@ async function saveDraft() {
         
         if (data.success) {
             currentDraftId = data.draft_id;
+            currentDraftVersion = data.version;
             currentDraftBalances = {};
             balances.forEach(b => {
                 currentDraftBalances[b.account_id] = b.amount;
@@ -1615,6 +1624,60 @@ async function saveDraft() {
     }
 }
 
+// Send only changed balances of the current draft
+async function patchDraft(snapshotDate, balances) {
+    const submitted = {};
+    balances.forEach(b => {
+        submitted[b.account_id] = b.amount;
+    });
+
+    const changes = [];
+    for (const [accountId, amount] of Object.entries(submitted)) {
+        if (currentDraftBalances[accountId] !== amount) {
+            changes.push({account_id: parseInt(accountId), amount: amount});
+        }
+    }
+    for (const accountId of Object.keys(currentDraftBalances)) {
+        if (!(accountId in submitted)) {
+            changes.push({account_id: parseInt(accountId), amount: null});
+        }
+    }
+
+    showLoading(true);
+    try {
+        const response = await fetch(`/api/wizard/draft/${currentDraftId}/balances`, {
+            method: 'PATCH',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                snapshot_date: snapshotDate,
+                balances: changes,
+                version: currentDraftVersion
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.success) {
+            currentDraftBalances = submitted;
+            currentDraftVersion = data.version;
+            showMessage(`Draft saved! (${changes.length} changes)`, 'success');
+        } else if (response.status === 409) {
+            showDraftConflict();
+        } else {
+            showMessage('Failed to save draft: ' + data.error, 'error');
+        }
+    } catch (error) {
+        showMessage('Network error: ' + error.message, 'error');
+    } finally {
+        showLoading(false);
+    }
+}
+
+// Another tab or user saved the draft since it was loaded here
+function showDraftConflict() {
+    showMessage('This draft was changed elsewhere since you loaded it. Reload it from Drafts before saving again.', 'error');
+}
+
 // Publish snapshot
 async function publishSnapshot() {
     if (!currentStoreId) {
@@ -1648,7 +1711,8 @@ async function publishSnapshot() {
                 snapshot_date: snapshotDate,
                 balances: balances,
                 status: 'completed',
-                draft_id: currentDraftId
+                draft_id: currentDraftId,
+                version: currentDraftVersion
             })
         });
         
@@ -1658,7 +1722,10 @@ async function publishSnapshot() {
             showMessage('Snapshot published successfully!', 'success');
             clearAll();
             currentDraftId = null;
+            currentDraftVersion = null;
             currentDraftBalances = {};
+        } else if (response.status === 409) {
+            showDraftConflict();
         } else {
             showMessage('Failed to publish: ' + data.error, 'error');
         }
@@ -1740,6 +1807,7 @@ async function loadSpecificDraft(draftId) {
         
         if (data.success) {
             currentDraftId = draftId;
+            currentDraftVersion = data.draft.version;
             
             // Switch back to entry tab
             switchToEntryTab();
@@ -2018,7 +2086,7 @@ async function loadReportSnapshots() {
     
     showLoading(true);
     try {
-        // Get all snapshots for the store
+        // Get the most recent page of snapshots for the store
         const response = await fetch(`/api/wizard/store-snapshots/${storeId}?type=${typeFilter}`);
         const data = await response.json();
         
@@ -2029,19 +2097,69 @@ async function loadReportSnapshots() {
             snapshotSelect.innerHTML = '<option value="">Select Snapshot...</option>';
             compareSelect.innerHTML = '<option value="">Select Snapshot to Compare...</option>';
             
-            data.snapshots.forEach(snapshot => {
-                const status = snapshot.status === 'draft' ? ' [DRAFT]' : ' [PUBLISHED]';
-                const optionText = `${snapshot.snapshot_date}${status} - Net: ${formatCurrency(snapshot.net_position)}`;
-                
-                const option = document.createElement('option');
-                option.value = snapshot.id;
-                option.textContent = optionText;
-                option.dataset.snapshot = JSON.stringify(snapshot);
-                snapshotSelect.appendChild(option);
-                
-                const compareOption = option.cloneNode(true);
-                compareSelect.appendChild(compareOption);
-            });
+            appendReportSnapshots(data);
+        }
+    } catch (error) {
+        showMessage('Failed to load snapshots: ' + error.message, 'error');
+    } finally {
+        showLoading(false);
+    }
+}
+
+// Add a page of snapshots to both report selects, with a "load older" entry if more exist
+function appendReportSnapshots(data) {
+    const snapshotSelect = document.getElementById('reportSnapshotSelect');
+    const compareSelect = document.getElementById('compareSnapshotSelect');
+    
+    [snapshotSelect, compareSelect].forEach(select => {
+        const more = select.querySelector('option[value="more"]');
+        if (more) {
+            more.remove();
+        }
+    });
+    
+    data.snapshots.forEach(snapshot => {
+        const status = snapshot.status === 'draft' ? ' [DRAFT]' : ' [PUBLISHED]';
+        const optionText = `${snapshot.snapshot_date}${status} - Net: ${formatCurrency(snapshot.net_position)}`;
+        
+        const option = document.createElement('option');
+        option.value = snapshot.id;
+        option.textContent = optionText;
+        option.dataset.snapshot = JSON.stringify(snapshot);
+        snapshotSelect.appendChild(option);
+        
+        const compareOption = option.cloneNode(true);
+        compareSelect.appendChild(compareOption);
+    });
+    
+    reportSnapshotsCursor = data.next_cursor || null;
+    if (reportSnapshotsCursor) {
+        [snapshotSelect, compareSelect].forEach(select => {
+            const option = document.createElement('option');
+            option.value = 'more';
+            option.textContent = 'Load older snapshots...';
+            select.appendChild(option);
+        });
+    }
+}
+
+// Fetch the next page of snapshots when "load older" is picked
+async function loadOlderReportSnapshots(select) {
+    const storeId = document.getElementById('reportStoreSelect').value;
+    const typeFilter = document.getElementById('reportTypeFilter').value;
+    select.value = '';
+    
+    if (!storeId || !reportSnapshotsCursor) {
+        return;
+    }
+    
+    showLoading(true);
+    try {
+        const response = await fetch(`/api/wizard/store-snapshots/${storeId}?type=${typeFilter}&cursor=${encodeURIComponent(reportSnapshotsCursor)}`);
+        const data = await response.json();
+        
+        if (data.success) {
+            appendReportSnapshots(data);
         }
     } catch (error) {
         showMessage('Failed to load snapshots: ' + error.message, 'error');
@@ -2054,6 +2172,11 @@ async function loadReportSnapshots() {
 async function loadBalanceSheet() {
     const snapshotId = document.getElementById('reportSnapshotSelect').value;
     
+    if (snapshotId === 'more') {
+        await loadOlderReportSnapshots(document.getElementById('reportSnapshotSelect'));
+        return;
+    }
+    
     if (!snapshotId) {
         document.getElementById('balanceSheetDisplay').innerHTML = `
             <div class="balance-sheet-placeholder">
@@ -2070,7 +2193,11 @@ async function loadBalanceSheet() {
         
         if (data.success) {
             currentSnapshot = data.balance_sheet;
-            displayBalanceSheet(currentSnapshot, comparisonMode ? compareSnapshot : null);
+            const compareId = document.getElementById('compareSnapshotSelect').value;
+            comparison = comparisonMode && compareId && compareId !== 'more'
+                ? await fetchComparison(currentSnapshot.id, compareId)
+                : null;
+            displayBalanceSheet(currentSnapshot, comparison);
         } else {
             showMessage('Failed to load balance sheet: ' + data.error, 'error');
         }
@@ -2086,7 +2213,7 @@ function displayBalanceSheet(snapshot, compareWith = null) {
     const container = document.getElementById('balanceSheetDisplay');
     
     if (compareWith) {
-        container.innerHTML = generateComparisonView(snapshot, compareWith);
+        container.innerHTML = generateComparisonView(compareWith);
     } else {
         container.innerHTML = generateSingleBalanceSheet(snapshot);
     }
@@ -2233,42 +2360,129 @@ function generateAccountLines(accounts, label = null) {
     return html;
 }
 
-// Generate comparison view
-function generateComparisonView(snapshot1, snapshot2) {
-    let html = `
-        <div class="balance-sheet-comparison">
+// Balance sheet sections in display order, as returned by /api/wizard/compare
+const COMPARISON_SECTIONS = [
+    { key: 'bank_accounts', label: 'Bank Accounts' },
+    { key: 'merchant_accounts', label: 'Merchant Accounts' },
+    { key: 'inventory', label: 'Inventory' },
+    { key: 'other_assets', label: 'Other Assets' },
+    { key: 'current_liabilities', label: 'Current Liabilities' },
+    { key: 'long_term', label: 'Long-term Liabilities' }
+];
+
+// Generate comparison view from the server-side diff
+function generateComparisonView(data) {
+    let html = '<div class="balance-sheet-comparison">';
+    data.snapshots.forEach((snapshot, index) => {
+        html += `
             <div class="comparison-column">
                 <div class="comparison-header">
-                    <div class="comparison-label">Primary Snapshot</div>
-                    <div class="comparison-date">${formatDate(snapshot1.snapshot_date)}</div>
-                    <div class="statement-status ${snapshot1.status === 'draft' ? 'status-draft' : 'status-published'}">
-                        ${snapshot1.status === 'draft' ? 'DRAFT' : 'PUBLISHED'}
+                    <div class="comparison-label">${index === 0 ? 'Primary Snapshot' : 'Comparison Snapshot'}</div>
+                    <div class="comparison-date">${formatDate(snapshot.snapshot_date)}</div>
+                    <div class="statement-status ${snapshot.status === 'draft' ? 'status-draft' : 'status-published'}">
+                        ${snapshot.status === 'draft' ? 'DRAFT' : 'PUBLISHED'}
                     </div>
                 </div>
-                ${generateComparisonContent(snapshot1, snapshot2, false)}
+                ${generateComparisonContent(data, index)}
             </div>
-            
-            <div class="comparison-column">
-                <div class="comparison-header">
-                    <div class="comparison-label">Comparison Snapshot</div>
-                    <div class="comparison-date">${formatDate(snapshot2.snapshot_date)}</div>
-                    <div class="statement-status ${snapshot2.status === 'draft' ? 'status-draft' : 'status-published'}">
-                        ${snapshot2.status === 'draft' ? 'DRAFT' : 'PUBLISHED'}
-                    </div>
+        `;
+    });
+    html += '</div>';
+    
+    return html;
+}
+
+// Generate one column of the comparison; differences are shown against the first snapshot
+function generateComparisonContent(data, index) {
+    const showDifference = index > 0;
+    let html = '<div class="comparison-sheet">';
+    let parent = null;
+    
+    COMPARISON_SECTIONS.forEach(section => {
+        const accounts = data.accounts.filter(account => account.section === section.key);
+        if (accounts.length === 0) return;
+        
+        const sectionParent = data.sections[section.key].parent;
+        if (sectionParent !== parent) {
+            if (parent) {
+                html += generateComparisonTotal(data.totals.total_assets, 'TOTAL ASSETS', index, showDifference);
+            }
+            html += `<h3 class="section-title">${sectionParent === 'assets' ? 'ASSETS' : 'LIABILITIES'}</h3>`;
+            parent = sectionParent;
+        }
+        
+        html += `<div class="subsection"><h4 class="subsection-title">${section.label}</h4>`;
+        accounts.forEach(account => {
+            const value = account.values[index];
+            html += `
+                <div class="account-line">
+                    <span class="account-name">${account.account_name}</span>
+                    <span class="account-value">
+                        ${value === null ? '—' : formatCurrency(Math.abs(value))}
+                        ${showDifference ? formatDifference(account.deltas[index]) : ''}
+                    </span>
+                </div>
+            `;
+        });
+        html += `
+                <div class="subtotal-line">
+                    <span class="subtotal-label">Total ${section.label}</span>
+                    <span class="subtotal-value">
+                        ${formatCurrency(data.sections[section.key].values[index])}
+                        ${showDifference ? formatDifference(data.sections[section.key].deltas[index]) : ''}
+                    </span>
                 </div>
-                ${generateComparisonContent(snapshot2, snapshot1, true)}
             </div>
+        `;
+    });
+    
+    if (parent === 'assets') {
+        html += generateComparisonTotal(data.totals.total_assets, 'TOTAL ASSETS', index, showDifference);
+    } else if (parent === 'liabilities') {
+        html += generateComparisonTotal(data.totals.total_liabilities, 'TOTAL LIABILITIES', index, showDifference);
+    }
+    
+    html += `
+        <div class="net-position-line">
+            <span>NET POSITION (EQUITY)</span>
+            <span>
+                ${formatCurrency(data.totals.net_position.values[index])}
+                ${showDifference ? formatDifference(data.totals.net_position.deltas[index]) : ''}
+            </span>
         </div>
-    `;
+    </div>`;
     
     return html;
 }
 
-// Generate comparison content
-function generateComparisonContent(primary, compare, isSecondColumn) {
-    // This would generate the comparison content with differences highlighted
-    // For brevity, returning simplified version
-    return generateSingleBalanceSheet(primary).replace('balance-sheet', 'comparison-sheet');
+function generateComparisonTotal(total, label, index, showDifference) {
+    return `
+        <div class="total-line">
+            <span>${label}</span>
+            <span>
+                ${formatCurrency(total.values[index])}
+                ${showDifference ? formatDifference(total.deltas[index]) : ''}
+            </span>
+        </div>
+    `;
+}
+
+function formatDifference(delta) {
+    if (!delta) return '<span class="comparison-difference">—</span>';
+    const cssClass = delta > 0 ? 'difference-positive' : 'difference-negative';
+    return `<span class="comparison-difference ${cssClass}">${delta > 0 ? '+' : '−'}${formatCurrency(Math.abs(delta))}</span>`;
+}
+
+// Fetch the diff of two snapshots from the server
+async function fetchComparison(baseId, targetId) {
+    const response = await fetch(`/api/wizard/compare?base=${baseId}&target=${targetId}`);
+    const data = await response.json();
+    
+    if (!data.success) {
+        showMessage('Failed to compare snapshots: ' + data.error, 'error');
+        return null;
+    }
+    return data;
 }
 
 // Toggle comparison mode
@@ -2283,7 +2497,7 @@ function toggleComparison() {
     } else {
         comparisonControls.style.display = 'none';
         toggleText.textContent = 'Enable Comparison';
-        compareSnapshot = null;
+        comparison = null;
         if (currentSnapshot) {
             displayBalanceSheet(currentSnapshot);
         }
@@ -2294,8 +2508,13 @@ function toggleComparison() {
 async function loadComparison() {
     const compareId = document.getElementById('compareSnapshotSelect').value;
     
+    if (compareId === 'more') {
+        await loadOlderReportSnapshots(document.getElementById('compareSnapshotSelect'));
+        return;
+    }
+    
     if (!compareId) {
-        compareSnapshot = null;
+        comparison = null;
         if (currentSnapshot) {
             displayBalanceSheet(currentSnapshot);
         }
@@ -2304,14 +2523,9 @@ async function loadComparison() {
     
     showLoading(true);
     try {
-        const response = await fetch(`/api/wizard/balance-sheet/${compareId}`);
-        const data = await response.json();
-        
-        if (data.success) {
-            compareSnapshot = data.balance_sheet;
-            if (currentSnapshot) {
-                displayBalanceSheet(currentSnapshot, compareSnapshot);
-            }
+        if (currentSnapshot) {
+            comparison = await fetchComparison(currentSnapshot.id, compareId);
+            displayBalanceSheet(currentSnapshot, comparison);
         }
     } catch (error) {
         showMessage('Failed to load comparison snapshot: ' + error.message, 'error');
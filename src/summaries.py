@@ -0,0 +1,169 @@
+"""Balance sheet section subtotals, stored once per completed snapshot.
+
+A balance sheet lists its accounts in six sections (bank accounts, merchant
+accounts, inventory, other assets, current and long-term liabilities), each
+the sum of the absolute balances of the accounts whose type is classified
+in it (``AccountType.section``, see ``src/classification.py``).
+``snapshot_summaries`` keeps those sums, plus the number of balances, for
+every completed snapshot, so dashboards, comparisons and exports read one
+row per snapshot instead of aggregating ``account_balances``.
+
+``refresh_summaries()`` recomputes the rows of given snapshots with one
+``INSERT ... SELECT`` grouped by snapshot. It runs when a snapshot is
+completed (save-snapshot, wizard sessions, historical imports) and when an
+account or account type moves to another section. Drafts change with every
+autosave and are not stored; ``load_summaries()`` computes theirs on the fly.
+After editing balances directly in the database, rebuild the rows with:
+
+    python -m src.summaries                  # every completed snapshot
+    python -m src.summaries --store 3
+"""
+import argparse
+import sys
+from decimal import Decimal
+
+from sqlalchemy import case, delete, func, insert, select
+
+from src.classification import BALANCE_SHEET_SECTIONS, SECTION_COLUMNS
+from src.database import db
+from src.models.balance_sheet import Account, AccountBalance, AccountType, Snapshot, SnapshotSummary
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def section_condition(section):
+    """AccountType rows classified in the section"""
+    return AccountType.section == section
+
+
+def summary_query(*filters):
+    """One row per snapshot matching ``filters`` with its section sums and balance count"""
+    amount = func.abs(AccountBalance.balance)
+    return select(
+        Snapshot.id.label('snapshot_id'),
+        *(
+            func.round(func.sum(case((section_condition(section), amount), else_=0)), 2).label(section)
+            for section in SECTION_COLUMNS
+        ),
+        func.count(AccountBalance.id).label('balance_count'),
+    ).select_from(Snapshot).outerjoin(
+        AccountBalance, AccountBalance.snapshot_id == Snapshot.id
+    ).outerjoin(
+        Account, AccountBalance.account_id == Account.id
+    ).outerjoin(
+        AccountType, Account.account_type_id == AccountType.id
+    ).where(*filters).group_by(Snapshot.id)
+
+
+def refresh_summaries(snapshot_ids, connection=None):
+    """Recompute the stored summaries of the given snapshots (a list or a SELECT of ids).
+
+    Only completed snapshots get a row; runs on ``connection`` if given,
+    otherwise in the current session without committing.
+    """
+    if isinstance(snapshot_ids, (list, tuple, set)):
+        snapshot_ids = list(snapshot_ids)
+        if not snapshot_ids:
+            return
+    executor = connection if connection is not None else db.session
+    table = SnapshotSummary.__table__
+    executor.execute(delete(table).where(table.c.snapshot_id.in_(snapshot_ids)))
+    executor.execute(insert(table).from_select(
+        ['snapshot_id', *SECTION_COLUMNS, 'balance_count'],
+        summary_query(Snapshot.id.in_(snapshot_ids), Snapshot.status == 'completed')
+    ))
+
+
+def refresh_account_summaries(account_ids):
+    """Refresh the completed snapshots holding a balance of any of these accounts (a list or a SELECT)"""
+    refresh_summaries(
+        select(AccountBalance.snapshot_id).where(AccountBalance.account_id.in_(account_ids)).distinct()
+    )
+
+
+def load_summaries(snapshots):
+    """Map snapshot id -> {section: Decimal, "balance_count": int} for Snapshot rows.
+
+    Stored rows are read in one query; snapshots without one (drafts, or rows
+    not built yet) are computed from their balances in a second.
+    """
+    ids = [snapshot.id for snapshot in snapshots]
+    if not ids:
+        return {}
+    summaries = {
+        row.snapshot_id: summary_values(row)
+        for row in db.session.execute(
+            select(SnapshotSummary.__table__).where(SnapshotSummary.snapshot_id.in_(ids))
+        )
+    }
+    missing = [snapshot_id for snapshot_id in ids if snapshot_id not in summaries]
+    if missing:
+        for row in db.session.execute(summary_query(Snapshot.id.in_(missing))):
+            summaries[row.snapshot_id] = summary_values(row)
+    return summaries
+
+
+def summary_values(row):
+    values = {section: to_decimal(getattr(row, section)) for section in SECTION_COLUMNS}
+    values["balance_count"] = row.balance_count or 0
+    return values
+
+
+def summary_dict(values):
+    """JSON form of load_summaries() values, with the asset and liability subtotals"""
+    sections = {section: float(values[section]) for section in SECTION_COLUMNS}
+    for parent in ('assets', 'liabilities'):
+        sections[f"{parent}_total"] = float(sum(
+            values[section] for section, section_parent in BALANCE_SHEET_SECTIONS if section_parent == parent
+        ))
+    sections["balance_count"] = values["balance_count"]
+    return sections
+
+
+def to_decimal(value):
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def rebuild_summaries(store_id=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Rebuild the stored summaries of every completed snapshot, committing per batch"""
+    batch_size = max(1, int(batch_size))
+    filters = [Snapshot.status == 'completed']
+    if store_id is not None:
+        filters.append(Snapshot.store_id == store_id)
+
+    total = db.session.query(func.count(Snapshot.id)).filter(*filters).scalar()
+    rebuilt = 0
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            select(Snapshot.id).where(Snapshot.id > last_id, *filters).order_by(Snapshot.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+        refresh_summaries(ids)
+        db.session.commit()
+        rebuilt += len(ids)
+        if progress:
+            progress(rebuilt / total if total else 1, f"{rebuilt} snapshot summaries rebuilt")
+    return rebuilt
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Rebuild the stored section subtotals of completed snapshots.")
+    parser.add_argument("--store", type=int, help="only this store id")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from src.main import app
+
+    with app.app_context():
+        rebuilt = rebuild_summaries(args.store, args.batch_size)
+    print(f"✓ Rebuilt {rebuilt} snapshot summaries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
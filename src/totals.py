@@ -0,0 +1,265 @@
+"""Snapshot totals, defined once.
+
+``total_assets`` and ``total_liabilities`` are the sums of the absolute
+balances of a snapshot's Asset and Liability accounts, and ``net_position``
+is their difference. ``ytd_sales`` and ``ytd_profit`` are the sums of the
+per-balance ``sales`` and ``profit`` columns when any balance has them;
+snapshots whose balances carry none (the wizard and historical imports enter
+YTD figures for the whole store) keep their stored values. ``profit_margin``
+is ``ytd_profit / ytd_sales * 100``, or 0 without positive sales.
+
+``compute_totals()`` evaluates this for any number of snapshots with one
+``SUM(CASE ...) GROUP BY snapshot_id`` query. Write paths that already hold
+the balances use ``contribution()``, ``balance_columns()`` and
+``ytd_columns()`` instead of querying them back. ``recompute_totals()``
+compares stored totals with computed ones in batches, reports the drift and
+optionally corrects it, invalidating the cached balance sheets; it is also
+available as the ``recompute_totals`` job and from the command line:
+
+    python -m src.totals                       # report drift
+    python -m src.totals --fix                 # and correct it
+    python -m src.totals --store 3 --fix --batch-size 1000
+"""
+import argparse
+import json
+import sys
+from decimal import Decimal
+
+from sqlalchemy import case, func, select, update
+
+from src.cache import balance_sheet_cache
+from src.database import db
+from src.jobs import job_runner
+from src.models.balance_sheet import Account, AccountBalance, AccountType, Snapshot
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+TOTAL_COLUMNS = ("total_assets", "total_liabilities", "net_position", "ytd_sales", "ytd_profit", "profit_margin")
+
+DEFAULT_BATCH_SIZE = 500
+
+# Drifted snapshots listed in a report; the rest are only counted
+MAX_REPORTED_DRIFT = 100
+
+
+def contribution(category, amount):
+    """(assets, liabilities) that one balance adds to its snapshot's totals"""
+    if category == 'Asset':
+        return abs(amount), ZERO
+    if category == 'Liability':
+        return ZERO, abs(amount)
+    return ZERO, ZERO
+
+
+def balance_columns(total_assets, total_liabilities):
+    return {
+        "total_assets": total_assets,
+        "total_liabilities": total_liabilities,
+        "net_position": total_assets - total_liabilities,
+    }
+
+
+def ytd_columns(ytd_sales, ytd_profit):
+    """YTD columns to store; a figure of None is left out so the stored one is kept"""
+    columns = {}
+    if ytd_sales is not None:
+        columns["ytd_sales"] = ytd_sales
+    if ytd_profit is not None:
+        columns["ytd_profit"] = ytd_profit
+    columns["profit_margin"] = (
+        ytd_profit / ytd_sales * 100 if ytd_profit is not None and ytd_sales and ytd_sales > 0 else ZERO
+    )
+    return columns
+
+
+def totals_query(snapshot_ids):
+    amount = func.abs(AccountBalance.balance)
+    return select(
+        AccountBalance.snapshot_id,
+        func.sum(case((AccountType.category == 'Asset', amount), else_=0)).label('total_assets'),
+        func.sum(case((AccountType.category == 'Liability', amount), else_=0)).label('total_liabilities'),
+        func.sum(AccountBalance.sales).label('ytd_sales'),
+        func.sum(AccountBalance.profit).label('ytd_profit'),
+    ).join(
+        Account, AccountBalance.account_id == Account.id
+    ).join(
+        AccountType, Account.account_type_id == AccountType.id
+    ).where(
+        AccountBalance.snapshot_id.in_(snapshot_ids)
+    ).group_by(
+        AccountBalance.snapshot_id
+    )
+
+
+def compute_totals(snapshots):
+    """Map snapshot id -> column values for the given Snapshot rows (or row tuples).
+
+    Each snapshot needs ``id``, ``ytd_sales`` and ``ytd_profit``; the stored
+    YTD figures are used where no balance has sales or profit.
+    """
+    snapshots = list(snapshots)
+    sums = {
+        row.snapshot_id: row
+        for row in db.session.execute(totals_query([s.id for s in snapshots]))
+    } if snapshots else {}
+
+    totals = {}
+    for snapshot in snapshots:
+        row = sums.get(snapshot.id)
+        total_assets = to_decimal(row.total_assets) if row else ZERO
+        total_liabilities = to_decimal(row.total_liabilities) if row else ZERO
+        ytd_sales = row.ytd_sales if row and row.ytd_sales is not None else snapshot.ytd_sales
+        ytd_profit = row.ytd_profit if row and row.ytd_profit is not None else snapshot.ytd_profit
+        totals[snapshot.id] = {
+            **balance_columns(total_assets, total_liabilities),
+            **ytd_columns(to_decimal(ytd_sales), to_decimal(ytd_profit)),
+        }
+    return totals
+
+
+def apply_totals(snapshot):
+    """Recompute a Snapshot's totals from its balances (flushing pending ones first)"""
+    for column, value in compute_totals([snapshot])[snapshot.id].items():
+        setattr(snapshot, column, value)
+
+
+def to_decimal(value):
+    if value is None or isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def cents(value):
+    return to_decimal(value).quantize(CENT) if value is not None else None
+
+
+def recompute_totals(store_id=None, status=None, fix=False, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Compare stored snapshot totals with the computed ones, in id order.
+
+    Each batch of ``batch_size`` snapshots costs one aggregate query and, with
+    ``fix``, one executemany UPDATE of the drifted rows, committed per batch so
+    the wizard's writers are not held up. Returns a report with the number of
+    snapshots checked and drifted, drift counts per column and the first
+    drifted snapshots with their stored and computed values.
+    """
+    batch_size = max(1, int(batch_size))
+    filters = []
+    if store_id is not None:
+        filters.append(Snapshot.store_id == store_id)
+    if status is not None:
+        filters.append(Snapshot.status == status)
+
+    total = db.session.query(func.count(Snapshot.id)).filter(*filters).scalar()
+    report = {
+        "checked": 0,
+        "drifted": 0,
+        "fixed": 0,
+        "columns": {column: 0 for column in TOTAL_COLUMNS},
+        "drift": [],
+    }
+
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(
+                Snapshot.id, Snapshot.store_id, Snapshot.snapshot_date,
+                *(getattr(Snapshot, column) for column in TOTAL_COLUMNS)
+            ).where(
+                Snapshot.id > last_id, *filters
+            ).order_by(Snapshot.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        computed = compute_totals(batch)
+        fixes = []
+        for snapshot in batch:
+            changed = {}
+            for column, value in computed[snapshot.id].items():
+                stored = getattr(snapshot, column)
+                if cents(stored) != cents(value):
+                    changed[column] = (stored, value)
+            if not changed:
+                continue
+
+            report["drifted"] += 1
+            for column in changed:
+                report["columns"][column] += 1
+            if len(report["drift"]) < MAX_REPORTED_DRIFT:
+                report["drift"].append({
+                    "snapshot_id": snapshot.id,
+                    "store_id": snapshot.store_id,
+                    "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot.snapshot_date else None,
+                    "columns": {
+                        column: {
+                            "stored": float(cents(stored)) if stored is not None else None,
+                            "computed": float(cents(value))
+                        }
+                        for column, (stored, value) in changed.items()
+                    },
+                })
+            fixes.append({"id": snapshot.id, **{column: value for column, (_, value) in changed.items()}})
+
+        if fix and fixes:
+            # Rows with different key sets are grouped by SQLAlchemy into separate executemany calls
+            db.session.execute(update(Snapshot), fixes)
+            report["fixed"] += len(fixes)
+        db.session.commit()
+        if fix and fixes:
+            # The bulk UPDATE leaves updated_at alone, so cached sheets (and their
+            # ETags) would not change. Invalidating bumps the stamp file, which reaches
+            # the web workers too when this runs from the CLI.
+            balance_sheet_cache.invalidate()
+
+        report["checked"] += len(batch)
+        if progress:
+            progress(
+                report["checked"] / total if total else 1,
+                f"{report['checked']} snapshots checked, {report['drifted']} drifted"
+            )
+
+    report["columns"] = {column: count for column, count in report["columns"].items() if count}
+    return report
+
+
+@job_runner.task("recompute_totals", pool="heavy")
+def recompute_totals_task(context, store_id=None, status=None, fix=False, batch_size=DEFAULT_BATCH_SIZE):
+    return recompute_totals(store_id, status, fix, batch_size, progress=context.progress)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Check (and fix) stored snapshot totals against their balances.")
+    parser.add_argument("--fix", action="store_true", help="write the computed totals where they drifted")
+    parser.add_argument("--store", type=int, help="only this store id")
+    parser.add_argument("--status", choices=("completed", "draft"), help="only snapshots with this status")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    from src.main import app
+
+    with app.app_context():
+        report = recompute_totals(args.store, args.status, args.fix, args.batch_size)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"✓ Checked {report['checked']} snapshots")
+    if not report["drifted"]:
+        print("✓ No drift")
+        return 0
+    columns = ", ".join(f"{column} {count}" for column, count in report["columns"].items())
+    print(f"{'✓ Fixed' if args.fix else '✗ Drift in'} {report['drifted']} snapshots ({columns})")
+    for entry in report["drift"][:20]:
+        changes = ", ".join(
+            f"{column} {values['stored']} -> {values['computed']}" for column, values in entry["columns"].items()
+        )
+        print(f"  snapshot {entry['snapshot_id']} (store {entry['store_id']}, {entry['snapshot_date']}): {changes}")
+    return 0 if args.fix else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
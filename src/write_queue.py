@@ -0,0 +1,137 @@
+"""Optional single-writer queue for the wizard's write endpoints.
+
+SQLite allows one writer at a time. When several requests autosave drafts
+at once, each opens its own transaction and they queue on the database
+lock, or give up when the busy timeout runs out. With ``WRITE_QUEUE``
+enabled, those endpoints hand their mutation to one writer thread per
+process instead. The writer takes whatever is queued (up to
+``WRITE_QUEUE_MAX_BATCH``, waiting at most ``WRITE_QUEUE_MAX_WAIT_MS`` for
+more), runs every mutation in its own SAVEPOINT inside one
+``BEGIN IMMEDIATE`` transaction and commits once. A mutation that raises
+only rolls back its savepoint and fails its own request; the others still
+commit together.
+
+A mutation is ``fn(*args) -> result``. It runs with the writer's session,
+must not commit, and must return plain data (not ORM objects), since the
+result is handed back to the request thread after the commit. With the
+queue disabled, ``run()`` calls it in the request and commits as before.
+A request gives up on a write the writer has not started within
+``WRITE_QUEUE_TIMEOUT`` seconds; once started, it waits for the commit.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from sqlalchemy import text
+
+from src.database import db
+
+
+class WriteQueue:
+    def __init__(self):
+        self.enabled = False
+        self.max_batch = 32
+        self.max_wait = 0.002
+        self.timeout = 30.0
+        self.app = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer_pid = None
+        self.batches = 0
+        self.writes = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = bool(app.config.get("WRITE_QUEUE"))
+        self.max_batch = max(1, int(app.config.get("WRITE_QUEUE_MAX_BATCH") or 32))
+        self.max_wait = float(app.config.get("WRITE_QUEUE_MAX_WAIT_MS", 2)) / 1000
+        self.timeout = float(app.config.get("WRITE_QUEUE_TIMEOUT") or 30)
+
+    def run(self, fn, *args):
+        """Run a mutation and commit it, returning its result or raising its error"""
+        if not self.enabled:
+            try:
+                result = fn(*args)
+                db.session.commit()
+                return result
+            except Exception:
+                db.session.rollback()
+                raise
+
+        self._ensure_writer()
+        future = Future()
+        self._queue.put((fn, args, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Drop it if the writer has not picked it up yet
+            if future.cancel():
+                raise TimeoutError(f"Write not started within {self.timeout:g}s")
+        # The writer is already running it and it may still commit: report the
+        # outcome, since a client retrying after an error would write it twice
+        return future.result()
+
+    def _ensure_writer(self):
+        """Start the writer thread once per process (also after a fork)"""
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._lock:
+            if self._writer_pid == pid:
+                return
+            self._writer_pid = pid
+            threading.Thread(target=self._write_loop, name="write-queue", daemon=True).start()
+
+    def _write_loop(self):
+        with self.app.app_context():
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        succeeded = []
+        try:
+            if db.engine.dialect.name == "sqlite":
+                # Take the write lock up front; a deferred transaction could fail to upgrade later
+                db.session.execute(text("BEGIN IMMEDIATE"))
+
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        result = fn(*args)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    succeeded.append((future, result))
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.error("Write queue batch of %s failed: %s", len(batch), e)
+            for _, _, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        finally:
+            db.session.remove()
+
+        self.batches += 1
+        self.writes += len(succeeded)
+        for future, result in succeeded:
+            future.set_result(result)
+
+
+write_queue = WriteQueue()
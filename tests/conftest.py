@@ -0,0 +1,102 @@
+"""Shared fixtures: the app on a scratch SQLite database holding the seed data.
+
+The environment is set before ``src.main`` is imported, since the app reads
+its settings at import time.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="balance-sheet-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'test.db')}"
+os.environ["CACHE_STAMP_DIR"] = TMP_DIR
+os.environ["METRICS_DIR"] = os.path.join(TMP_DIR, "metrics")
+# Tests call JobRunner.recover() themselves
+os.environ["JOB_HEARTBEAT_INTERVAL"] = "3600"
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event, text  # noqa: E402
+
+from src.cache import reference_cache, balance_sheet_cache  # noqa: E402
+from src.database import db  # noqa: E402
+from src.main import app as flask_app  # noqa: E402
+from src.migrations import run_migrations  # noqa: E402
+from src.routes.data_import import seed_database  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """The app on a freshly created, migrated and seeded database"""
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.execute(text("PRAGMA user_version = 0"))
+        db.create_all()
+        run_migrations(db.engine)
+        seed_database()
+        reference_cache.invalidate()
+        balance_sheet_cache.invalidate()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def store_accounts(client):
+    """Active accounts of the first seeded store, as returned by the wizard"""
+    accounts = client.get("/api/wizard/accounts/1").get_json()["accounts"]
+    return [account for group in accounts.values() for account in group]
+
+
+@pytest.fixture
+def completed_snapshots(client, store_accounts):
+    """Ids of three completed snapshots of store 1, oldest first"""
+    ids = []
+    for day in (1, 2, 3):
+        response = client.post("/api/wizard/save-snapshot", json={
+            "store_id": 1,
+            "snapshot_date": f"2025-01-0{day}",
+            "balances": [
+                {"account_id": account["id"], "amount": 100 * day + index}
+                for index, account in enumerate(store_accounts)
+            ],
+        })
+        assert response.status_code == 200, response.get_json()
+        ids.append(response.get_json()["snapshot_id"])
+    return ids
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on the app's engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    return lambda: QueryCounter(db.engine)
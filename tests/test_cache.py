@@ -0,0 +1,19 @@
+import os
+
+from src.cache import VersionStamp
+
+from conftest import TMP_DIR
+
+
+def test_stamp_changes_even_when_file_metadata_repeats():
+    stamp = VersionStamp("test_stamp")
+    stamp.configure(TMP_DIR)
+    assert stamp.current() is None
+
+    stamp.bump()
+    before, stat = stamp.current(), os.stat(stamp.path)
+    stamp.bump()
+    # Same size, and a coarse clock may give the same mtime
+    os.utime(stamp.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.stat(stamp.path).st_size == stat.st_size
+    assert stamp.current() != before
@@ -0,0 +1,130 @@
+import csv
+
+import pytest
+
+from src.database import db
+from src.importers import MAX_RECORDED_ERRORS, HistoricalSnapshotImporter
+from src.models.balance_sheet import AccountBalance, HistoricalImport, Snapshot
+from src.totals import recompute_totals
+
+from conftest import TMP_DIR
+
+
+def run_import(rows, chunk_size=2, progress=None):
+    path = f"{TMP_DIR}/historical.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["store", "snapshot_date", "account_name", "balance", "ytd_sales", "ytd_profit"])
+        writer.writeheader()
+        writer.writerows(rows)
+    record = HistoricalImport(filename="historical.csv", status="pending")
+    db.session.add(record)
+    db.session.commit()
+    importer = HistoricalSnapshotImporter(record.id, chunk_size, progress=progress)
+    importer.run(path)
+    return importer.record
+
+
+def row(store, day, account, balance, **ytd):
+    return {"store": store, "snapshot_date": f"2024-06-0{day}", "account_name": account["name"],
+            "balance": balance, **ytd}
+
+
+def test_interleaved_rows_and_duplicates_across_chunks(client, store_accounts):
+    store = client.get("/api/stores").get_json()["stores"][0]["name"]
+    first, second, third = store_accounts[:3]
+    record = run_import([
+        row(store, 1, first, "100"),
+        row(store, 2, first, "10"),
+        row(store, 1, second, "50", ytd_sales="1000"),
+        row(store, 2, second, "5"),
+        # Both snapshots already got this account in an earlier chunk
+        row(store, 1, first, "999"),
+        row(store, 2, second, "999"),
+        row(store, 1, third, "25", ytd_profit="100"),
+    ])
+
+    assert record.status == "completed"
+    assert record.snapshots_created == 2
+    assert record.balances_created == 5
+    assert record.error_count == 2
+    assert "Row 5: Duplicate balance" in record.notes and "Row 6: Duplicate balance" in record.notes
+
+    snapshot = Snapshot.query.filter_by(created_by="historical_import").order_by(Snapshot.snapshot_date).first()
+    balances = {b.account_id: float(b.balance) for b in AccountBalance.query.filter_by(snapshot_id=snapshot.id)}
+    assert balances == {first["id"]: 100, second["id"]: 50, third["id"]: 25}
+    assert float(snapshot.ytd_sales) == 1000 and float(snapshot.ytd_profit) == 100
+    assert float(snapshot.profit_margin) == 10
+    # Stored totals match the balances however the rows were spread over chunks
+    assert recompute_totals()["drifted"] == 0
+
+
+def test_existing_completed_snapshots_are_skipped(client, store_accounts, completed_snapshots):
+    store = client.get("/api/stores").get_json()["stores"][0]["name"]
+    record = run_import([
+        {"store": store, "snapshot_date": "2025-01-01", "account_name": store_accounts[0]["name"], "balance": "1"},
+        {"store": store, "snapshot_date": "2025-01-01", "account_name": store_accounts[1]["name"], "balance": "1"},
+        row(store, 1, store_accounts[0], "1"),
+    ])
+
+    assert record.snapshots_created == 1
+    assert record.balances_created == 1
+    assert record.error_count == 1
+    assert "Completed snapshot already exists" in record.notes
+
+
+def test_balance_sheets_are_published_when_the_import_completes(client, store_accounts):
+    store = client.get("/api/stores").get_json()["stores"][0]["name"]
+    seen = []
+
+    def progress(fraction, message):
+        # Between chunks the snapshot is neither completed nor cached
+        snapshot = Snapshot.query.filter(Snapshot.notes == "Imported from historical.csv").one_or_none()
+        if snapshot is not None and not seen:
+            seen.append(snapshot.id)
+            assert snapshot.status == "importing"
+            assert client.get(f"/api/wizard/balance-sheet/{snapshot.id}").headers.get("ETag") is None
+            assert client.get("/api/snapshots/summaries").get_json()["summaries"] == []
+
+    record = run_import([
+        row(store, 1, store_accounts[0], "100"),
+        row(store, 1, store_accounts[1], "50"),
+    ], chunk_size=1, progress=progress)
+
+    assert record.status == "completed" and seen
+    snapshot = db.session.get(Snapshot, seen[0])
+    assert (snapshot.status, snapshot.created_by) == ("completed", "historical_import")
+    response = client.get(f"/api/wizard/balance-sheet/{snapshot.id}")
+    assert response.headers["ETag"]
+    assert response.get_json()["balance_sheet"]["total_assets"] == float(snapshot.total_assets)
+    assert len(client.get("/api/snapshots/summaries").get_json()["summaries"]) == 1
+
+
+def test_failed_import_deletes_its_snapshots(client, store_accounts):
+    store = client.get("/api/stores").get_json()["stores"][0]["name"]
+    calls = []
+
+    def progress(fraction, message):
+        calls.append(fraction)
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        run_import([row(store, day, store_accounts[0], "1") for day in (1, 2, 3)], chunk_size=1, progress=progress)
+
+    record = HistoricalImport.query.one()
+    assert (record.status, record.snapshots_created, record.balances_created) == ("failed", 0, 0)
+    assert Snapshot.query.filter(Snapshot.notes == "Imported from historical.csv").count() == 0
+    assert AccountBalance.query.count() == 0
+
+
+def test_account_import_caps_recorded_errors(client):
+    accounts = [
+        {"storeName": "No such store", "accountType": "Cash", "accountName": f"Account {index}"}
+        for index in range(MAX_RECORDED_ERRORS + 5)
+    ]
+    response = client.post("/api/wizard/bulk-import", json={"accounts": accounts})
+    summary = response.get_json()
+    assert response.status_code == 200
+    assert summary["error_count"] == MAX_RECORDED_ERRORS + 5
+    assert len(summary["errors"]) == MAX_RECORDED_ERRORS
+    assert summary["errors"][0] == "Row 1: Store not found: No such store"
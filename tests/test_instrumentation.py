@@ -0,0 +1,26 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.database import db
+from src.instrumentation import request_instrumentation
+
+
+def test_failed_statement_does_not_leave_its_start_time(app):
+    with app.test_request_context("/api/stores"):
+        request_instrumentation._start()
+        with db.engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+            assert connection.info.get("query_start") == []
+
+            connection.execute(text("SELECT 1"))
+            assert connection.info.get("query_start") == []
+        assert g.request_timing["queries"] == 2
+
+
+def test_server_timing_header(client):
+    response = client.get("/api/snapshots")
+    assert 'db;dur=' in response.headers["Server-Timing"]
+    assert '1 queries' in response.headers["Server-Timing"]
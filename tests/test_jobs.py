@@ -0,0 +1,93 @@
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from src.database import db
+from src.jobs import INTERRUPTED, job_runner
+from src.models.balance_sheet import Job
+
+
+def add_job(status, worker, heartbeat_age=None, kind="recompute_totals"):
+    heartbeat_at = datetime.utcnow() - timedelta(seconds=heartbeat_age) if heartbeat_age is not None else None
+    job = Job(kind=kind, pool="heavy", status=status, params=json.dumps({}), worker=worker, heartbeat_at=heartbeat_at)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def other_worker(pid=None):
+    """Worker id of another process; by default one that reused this process's pid"""
+    return f"{socket.gethostname()}:{pid or os.getpid()}:previousboot"
+
+
+def wait_for(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        if job.status in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} still {job.status}")
+
+
+def test_recover_settles_jobs_without_heartbeat(app):
+    stale = job_runner.heartbeat_timeout + 1
+    running = add_job("running", other_worker(), stale)
+    queued = add_job("queued", other_worker(), stale)
+    legacy = add_job("running", None)
+    alive = add_job("running", other_worker(12345), 1)
+
+    failed, rescheduled = job_runner.recover()
+
+    assert sorted(failed) == sorted([running, legacy])
+    assert rescheduled == [queued]
+    for job_id in (running, legacy):
+        job = db.session.get(Job, job_id)
+        assert job.status == "failed" and job.error == INTERRUPTED and job.finished_at
+    assert wait_for(queued).status == "completed"
+    assert db.session.get(Job, queued).worker == job_runner.worker
+    # Jobs of workers that still send heartbeats are left alone
+    assert db.session.get(Job, alive).status == "running"
+    # A second recovery finds nothing left to do
+    assert job_runner.recover() == ([], [])
+
+
+def test_job_of_a_reused_pid_is_recovered(app):
+    # Same host and pid as this live process, but an earlier boot
+    job_id = add_job("running", other_worker(), job_runner.heartbeat_timeout + 1)
+    assert other_worker() != job_runner.worker
+
+    assert job_runner.recover() == ([job_id], [])
+
+
+def test_heartbeat_keeps_own_jobs_alive(app):
+    job_id = add_job("running", job_runner.worker, job_runner.heartbeat_timeout + 1)
+    job_runner._active.add(job_id)
+    try:
+        job_runner.heartbeat()
+    finally:
+        job_runner._active.discard(job_id)
+
+    later = datetime.utcnow() + timedelta(seconds=job_runner.heartbeat_timeout / 2)
+    assert job_runner.recover(now=later) == ([], [])
+    db.session.expire_all()
+    assert db.session.get(Job, job_id).status == "running"
+
+
+def test_queued_job_of_unknown_kind_fails(app):
+    job_id = add_job("queued", other_worker(), job_runner.heartbeat_timeout + 1, kind="no_such_task")
+
+    assert job_runner.recover() == ([job_id], [])
+    assert db.session.get(Job, job_id).status == "failed"
+
+
+def test_enqueued_jobs_record_worker_and_heartbeat(client):
+    response = client.post("/api/snapshots/recompute-totals?background=true")
+    job_id = response.get_json()["job"]["id"]
+
+    job = wait_for(job_id)
+    assert job.status == "completed"
+    assert job.worker == job_runner.worker and job.heartbeat_at
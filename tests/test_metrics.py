@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from src.metrics import REQUEST_BUCKETS, MetricsRegistry
+
+from conftest import TMP_DIR
+
+
+def exited_pid():
+    """Pid of a process that has already exited"""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def registry(name):
+    metrics = MetricsRegistry()
+    metrics.directory = os.path.join(TMP_DIR, name)
+    os.makedirs(metrics.directory, exist_ok=True)
+    return metrics
+
+
+def test_histogram_lines_in_bound_order_per_label_set():
+    metrics = registry("metrics-render")
+    for route, value in (("/b", 3.0), ("/a", 0.02), ("/a", 7.0)):
+        metrics.observe("http_request_duration_seconds", value, REQUEST_BUCKETS, {"method": "GET", "route": route})
+
+    lines = [line for line in metrics.render().splitlines() if line.startswith("http_request_duration_seconds")]
+    per_route = len(REQUEST_BUCKETS) + 3
+    assert len(lines) == 2 * per_route
+    for block, route in ((lines[:per_route], "/a"), (lines[per_route:], "/b")):
+        assert all(f'route="{route}"' in line for line in block)
+        bounds = [line.split('le="')[1].split('"')[0] for line in block[:len(REQUEST_BUCKETS) + 1]]
+        assert bounds == [str(bound) for bound in REQUEST_BUCKETS] + ["+Inf"]
+        assert block[-2].startswith("http_request_duration_seconds_sum")
+        assert block[-1].startswith("http_request_duration_seconds_count")
+    assert lines[per_route - 1].endswith(" 2") and lines[-1].endswith(" 1")
+
+
+def test_files_of_exited_processes_are_removed():
+    metrics = registry("metrics-processes")
+    dead = exited_pid()
+    path = metrics.path_for(dead)
+    with open(path, "w") as f:
+        json.dump({"pid": dead, "counters": [["http_requests_total", {}, 5]], "gauges": [], "histograms": []}, f)
+
+    metrics.inc("http_requests_total")
+    assert "http_requests_total 1\n" in metrics.render()
+    assert not os.path.exists(path)
+
+
+def test_metrics_endpoint(client):
+    client.get("/api/stores")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert "# TYPE http_requests_total counter" in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+
+
+def test_locked_errors_are_counted():
+    metrics = registry("metrics-locked")
+    for message in ("database is locked", "no such table: x"):
+        metrics._handle_error(SimpleNamespace(connection=None, original_exception=Exception(message)))
+
+    assert "sqlite_locked_errors_total 1\n" in metrics.render()
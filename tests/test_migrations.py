@@ -0,0 +1,74 @@
+import os
+import shutil
+
+from sqlalchemy import create_engine, text
+
+from src.database import db
+from src.migrations import MIGRATIONS, check_query_plans, get_schema_version, plan_uses_index, run_migrations
+
+from conftest import ROOT, TMP_DIR
+
+SHIPPED_DATABASE = os.path.join(ROOT, "src", "database", "app.db")
+
+
+def assert_plans_use_indexes(engine):
+    failures = [(name, detail) for name, _, detail, ok in check_query_plans(engine) if not ok]
+    assert failures == []
+
+
+def planner_statistics(engine):
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first() is None:
+            return 0
+        return connection.execute(text("SELECT COUNT(*) FROM sqlite_stat1")).scalar()
+
+
+def test_hot_queries_use_indexes_on_fresh_database(app, completed_snapshots):
+    assert get_schema_version(db.session.connection()) == MIGRATIONS[-1][0]
+    assert planner_statistics(db.engine) == 0
+    assert_plans_use_indexes(db.engine)
+
+
+def test_hot_queries_use_indexes_on_shipped_database():
+    path = os.path.join(TMP_DIR, "shipped.db")
+    shutil.copyfile(SHIPPED_DATABASE, path)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        # As python -m src.migrations does: create missing tables, then migrate
+        db.metadata.create_all(engine)
+        run_migrations(engine)
+        with engine.connect() as connection:
+            assert get_schema_version(connection) == MIGRATIONS[-1][0]
+        assert planner_statistics(engine) == 0
+        assert_plans_use_indexes(engine)
+    finally:
+        engine.dispose()
+
+
+def test_stale_planner_statistics_are_dropped(app):
+    with db.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+        connection.execute(text("PRAGMA user_version = 6"))
+    assert planner_statistics(db.engine) > 0
+
+    assert (7, "Drop planner statistics gathered by earlier migrations") in run_migrations(db.engine)
+    assert planner_statistics(db.engine) == 0
+
+
+def test_plan_check_requires_a_search_of_the_table():
+    index = "ix_account_balances_account_snapshot"
+    assert plan_uses_index(
+        [f"SEARCH b USING COVERING INDEX {index} (account_id=?)", "SEARCH s USING INTEGER PRIMARY KEY (rowid=?)"],
+        "b", "SEARCH", index,
+    )
+    # The index is used, but only after scanning every snapshot
+    assert not plan_uses_index(
+        ["SCAN s USING COVERING INDEX ix_snapshots_store_status_date", f"SEARCH b USING COVERING INDEX {index} (account_id=?)"],
+        "b", "SEARCH", index,
+    )
+    # A full scan of the index is not a lookup
+    assert not plan_uses_index([f"SCAN account_balances USING COVERING INDEX {index}"], "account_balances", "SEARCH", index)
+    # Right index name, wrong table
+    assert not plan_uses_index([f"SEARCH s USING INDEX {index} (account_id=?)"], "b", "SEARCH", index)
+    # Index names are matched whole
+    assert not plan_uses_index([f"SEARCH b USING INDEX {index}_old (account_id=?)"], "b", "SEARCH", index)
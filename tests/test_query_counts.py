@@ -0,0 +1,81 @@
+"""Every list endpoint issues a fixed number of statements, however many rows it returns.
+
+Each endpoint is requested once to warm the reference cache, then counted;
+the count must not change after more snapshots and drafts are added.
+"""
+import pytest
+
+from src.cache import balance_sheet_cache
+from src.database import db
+from src.models.balance_sheet import Account, AccountType
+
+# (url, statements); {first}, {second} and {draft} are filled in from the fixtures
+ENDPOINTS = [
+    ("/api/stores", 0),
+    ("/api/accounts", 1),
+    ("/api/accounts?store_id=1", 1),
+    ("/api/accounts/{account}/history", 2),
+    ("/api/accounts/history?ids={account},{account2}", 2),
+    ("/api/snapshots", 1),
+    ("/api/snapshots?store_id=1", 1),
+    ("/api/snapshots/summaries", 1),
+    ("/api/dashboard/summary", 3),
+    ("/api/dashboard/timeline", 2),
+    ("/api/wizard/accounts/1", 2),
+    ("/api/wizard/drafts", 1),
+    ("/api/wizard/draft/{draft}", 3),
+    ("/api/wizard/latest-snapshot/1", 2),
+    ("/api/wizard/account-types", 0),
+    ("/api/wizard/banks", 0),
+    ("/api/wizard/intercompany-pairs", 3),
+    ("/api/wizard/store-snapshots/1", 1),
+    ("/api/wizard/balance-sheet/{first}", 2),
+    ("/api/wizard/compare?ids={first},{second}", 2),
+    ("/api/wizard/compare?ids={first},{second}&accounts=false", 2),
+    ("/api/jobs", 1),
+    ("/import/historical", 1),
+]
+
+
+def save(client, path, store_id, snapshot_date, accounts):
+    response = client.post(path, json={
+        "store_id": store_id,
+        "snapshot_date": snapshot_date,
+        "balances": [{"account_id": account["id"], "amount": 10 + index} for index, account in enumerate(accounts)],
+    })
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def count_statements(client, count_queries, url):
+    assert client.get(url).status_code == 200
+    # The balance sheet is cached per snapshot; count the build, not the cache hit
+    balance_sheet_cache.invalidate()
+    with count_queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return counter.count
+
+
+@pytest.mark.parametrize("url, expected", ENDPOINTS, ids=[url for url, _ in ENDPOINTS])
+def test_list_endpoint_query_count(client, count_queries, store_accounts, completed_snapshots, url, expected):
+    draft = save(client, "/api/wizard/save-draft", 1, "2025-02-01", store_accounts[:2])["draft_id"]
+    url = url.format(
+        first=completed_snapshots[0], second=completed_snapshots[1], draft=draft,
+        account=store_accounts[0]["id"], account2=store_accounts[1]["id"],
+    )
+    assert count_statements(client, count_queries, url) == expected
+
+    other_store = [
+        account for group in client.get("/api/wizard/accounts/2").get_json()["accounts"].values() for account in group
+    ]
+    for day in (2, 3, 4):
+        save(client, "/api/wizard/save-snapshot", 1, f"2025-02-0{day}", store_accounts)
+        save(client, "/api/wizard/save-snapshot", 2, f"2025-02-0{day}", other_store)
+    save(client, "/api/wizard/save-draft", 2, "2025-02-05", other_store[:3])
+    # A payable for the intercompany pairs to find
+    payable_type = AccountType.query.filter_by(name="Vendor Payable").one()
+    db.session.add(Account(store_id=2, account_type_id=payable_type.id, account_name="Owed to Seal Skin"))
+    db.session.commit()
+
+    assert count_statements(client, count_queries, url) == expected
@@ -0,0 +1,36 @@
+from sqlalchemy import update
+
+from src.database import db
+from src.models.balance_sheet import Snapshot
+
+
+def balance_sheet(client, snapshot_id, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get(f"/api/wizard/balance-sheet/{snapshot_id}", headers=headers)
+
+
+def test_fixed_totals_reach_cached_balance_sheets(client, completed_snapshots):
+    snapshot_id = completed_snapshots[0]
+    response = balance_sheet(client, snapshot_id)
+    etag, correct = response.headers["ETag"], response.get_json()["balance_sheet"]["total_assets"]
+
+    # Drift that bypasses the write paths (and the cache)
+    db.session.execute(update(Snapshot).where(Snapshot.id == snapshot_id).values(total_assets=1))
+    db.session.commit()
+    assert balance_sheet(client, snapshot_id, etag).status_code == 304
+
+    report = client.post("/api/snapshots/recompute-totals?fix=true").get_json()["report"]
+    assert report["fixed"] == 1
+
+    response = balance_sheet(client, snapshot_id, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["balance_sheet"]["total_assets"] == correct
+
+
+def test_report_without_fix_leaves_cache(client, completed_snapshots):
+    etag = balance_sheet(client, completed_snapshots[0]).headers["ETag"]
+
+    report = client.post("/api/snapshots/recompute-totals").get_json()["report"]
+    assert report["drifted"] == 0
+    assert balance_sheet(client, completed_snapshots[0], etag).status_code == 304
@@ -0,0 +1,77 @@
+import pytest
+
+from src.database import db
+from src.models.balance_sheet import Account
+
+
+def save_draft(client, accounts, amount, **fields):
+    return client.post("/api/wizard/save-draft", json={
+        "store_id": 1,
+        "snapshot_date": "2025-02-01",
+        "balances": [{"account_id": account["id"], "amount": amount} for account in accounts],
+        **fields,
+    })
+
+
+@pytest.fixture
+def draft(client, store_accounts):
+    """A draft saved twice: its id and the version the first save returned"""
+    first = save_draft(client, store_accounts, 100).get_json()
+    second = save_draft(client, store_accounts, 200, draft_id=first["draft_id"], version=first["version"]).get_json()
+    assert second["version"] == first["version"] + 1
+    return first["draft_id"], first["version"]
+
+
+def test_non_integer_versions_are_rejected(client, store_accounts, draft):
+    draft_id, _ = draft
+    responses = [
+        save_draft(client, store_accounts, 300, draft_id=draft_id, version="abc"),
+        client.patch(f"/api/wizard/draft/{draft_id}/balances", json={"version": "abc", "balances": []}),
+        client.put(f"/api/wizard/account/{store_accounts[0]['id']}", json={"version": 1.5}),
+        client.delete(f"/api/wizard/delete-account/{store_accounts[0]['id']}?version=abc"),
+    ]
+    for response in responses:
+        assert response.status_code == 400
+        assert response.get_json()["error"] == "Version must be an integer"
+
+
+def test_stale_draft_save_conflicts(client, store_accounts, draft):
+    draft_id, stale = draft
+    response = save_draft(client, store_accounts, 300, draft_id=draft_id, version=stale)
+    assert response.status_code == 409
+    assert response.get_json()["version"] == stale + 1
+
+
+def test_stale_draft_patch_conflicts(client, store_accounts, draft):
+    draft_id, stale = draft
+    response = client.patch(f"/api/wizard/draft/{draft_id}/balances", json={
+        "version": stale,
+        "balances": [{"account_id": store_accounts[0]["id"], "amount": 999}],
+    })
+    assert response.status_code == 409
+    assert response.get_json()["conflict"] is True
+
+    # The string form sent by some clients is accepted
+    response = client.patch(f"/api/wizard/draft/{draft_id}/balances", json={
+        "version": str(stale + 1),
+        "balances": [{"account_id": store_accounts[0]["id"], "amount": 999}],
+    })
+    assert response.status_code == 200
+
+
+def test_stale_account_delete_conflicts(client, store_accounts, completed_snapshots):
+    account_id = store_accounts[0]["id"]
+    stale = db.session.get(Account, account_id).version
+    response = client.put(f"/api/wizard/account/{account_id}", json={"account_name": "Renamed", "version": stale})
+    assert response.status_code == 200
+
+    response = client.delete(f"/api/wizard/delete-account/{account_id}?version={stale}")
+    assert response.status_code == 409
+    assert response.get_json()["version"] == stale + 1
+    db.session.expire_all()
+    assert db.session.get(Account, account_id).is_active
+
+    response = client.delete(f"/api/wizard/delete-account/{account_id}?version={stale + 1}")
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert not db.session.get(Account, account_id).is_active
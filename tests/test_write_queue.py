@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from src.write_queue import WriteQueue
+
+
+@pytest.fixture
+def queue(app):
+    write_queue = WriteQueue()
+    write_queue.app = app
+    write_queue.enabled = True
+    write_queue.max_batch = 1
+    write_queue.timeout = 0.2
+    return write_queue
+
+
+def test_started_write_is_awaited_past_the_timeout(queue):
+    release = threading.Event()
+
+    def slow_write():
+        release.wait(5)
+        return "committed"
+
+    threading.Timer(0.5, release.set).start()
+    assert queue.run(slow_write) == "committed"
+    assert queue.writes == 1
+
+
+def test_write_not_started_in_time_is_dropped(queue):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def blocking_write():
+        started.set()
+        release.wait(5)
+
+    first = threading.Thread(target=queue.run, args=(blocking_write,))
+    first.start()
+    assert started.wait(5)
+    with pytest.raises(TimeoutError):
+        queue.run(ran.append, "second")
+    release.set()
+    first.join(5)
+
+    assert queue.run(lambda: "after") == "after"
+    assert ran == []